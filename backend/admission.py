@@ -0,0 +1,206 @@
+"""
+Admission control for CPU-heavy requests.
+
+Requests are sorted into route classes: password hashing (login, register,
+password reset, account deletion) and vault crypto (the /vault and /teams
+routes, which encrypt, decrypt and sign). Listings that only read metadata
+are not limited. Each class runs at most ADMISSION_<CLASS>_CONCURRENCY
+requests at once; the next ADMISSION_<CLASS>_QUEUE wait up to
+ADMISSION_MAX_WAIT_SECONDS for a slot, and anything beyond that is shed
+with 503 and a Retry-After header, so a burst in one class can't take
+every core from the other.
+
+File downloads and ZIP archives decrypt as their body streams, so they
+keep their slot until the last byte is sent. Every other response has
+done its work once it starts, and releases its slot then.
+
+Meant to be used from a single event loop; no locking is needed.
+"""
+import asyncio
+import os
+import re
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+load_dotenv()
+
+_CORES = os.cpu_count() or 1
+
+# Concurrency 0 disables admission control for a class
+ADMISSION_AUTH_CONCURRENCY = int(os.getenv("ADMISSION_AUTH_CONCURRENCY", str(max(_CORES // 2, 1))))
+ADMISSION_AUTH_QUEUE = int(os.getenv("ADMISSION_AUTH_QUEUE", "32"))
+ADMISSION_VAULT_CONCURRENCY = int(os.getenv("ADMISSION_VAULT_CONCURRENCY", str(_CORES * 4)))
+ADMISSION_VAULT_QUEUE = int(os.getenv("ADMISSION_VAULT_QUEUE", "128"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+
+# Routes that hash a password
+PASSWORD_HASH_ROUTES = {"/auth/login", "/auth/register", "/auth/reset-password", "/auth/delete-account"}
+
+# /vault and /teams routes that only read metadata
+UNLIMITED_VAULT_ROUTES = [
+    ("GET", re.compile(r"/vault/(files|items|items/\d+/versions|uploads/\d+)/?")),
+    ("GET", re.compile(r"/teams(/\d+/(members|shared))?/?"))
+]
+
+# Routes that decrypt while the response body streams
+STREAMED_CRYPTO_ROUTES = [
+    ("GET", re.compile(r"/vault/files/\d+/download/?")),
+    ("POST", re.compile(r"/vault/files/archive/?")),
+    ("GET", re.compile(r"/teams/\d+/shared/\d+/download/?")),
+    ("POST", re.compile(r"/teams/\d+/shared/archive/?"))
+]
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO queue for one route class.
+    
+    Keeps admitted, queued and shed counters so callers can expose them as metrics.
+    """
+    
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._waiters = deque()
+    
+    async def acquire(self) -> bool:
+        """
+        Wait for a slot.
+        
+        Returns:
+            True once admitted (call release() when done), False if the
+            queue is full or the wait timed out
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # A slot was handed over just as the wait ended
+            else:
+                self._waiters.remove(waiter)
+            if isinstance(error, asyncio.TimeoutError):
+                self.timed_out += 1
+                return False
+            raise
+        
+        # release() handed its slot over, so active is unchanged
+        self.admitted += 1
+        self.queued += 1
+        return True
+    
+    def release(self):
+        """Give the slot to the longest waiting request, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+    
+    def stats(self) -> dict:
+        """Return load and admission counters."""
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timed_out": self.timed_out
+        }
+
+
+admission_controllers = {
+    "auth": AdmissionController(ADMISSION_AUTH_CONCURRENCY, ADMISSION_AUTH_QUEUE, ADMISSION_MAX_WAIT_SECONDS),
+    "vault": AdmissionController(ADMISSION_VAULT_CONCURRENCY, ADMISSION_VAULT_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+}
+
+
+def _matches(routes: list, method: str, path: str) -> bool:
+    return any(method == route_method and pattern.fullmatch(path) for route_method, pattern in routes)
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Get the admission class of a request, or None if it isn't limited."""
+    if method == "POST" and path in PASSWORD_HASH_ROUTES:
+        return "auth"
+    if not path.startswith(("/vault/", "/teams")) or method == "OPTIONS":
+        return None
+    if _matches(UNLIMITED_VAULT_ROUTES, method, path):
+        return None
+    return "vault"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits limited requests through their class's controller."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        controller = admission_controllers.get(route_class(scope["method"], scope["path"]))
+        if controller is None or controller.limit <= 0:
+            await self.app(scope, receive, send)
+            return
+        
+        if not await controller.acquire():
+            response = JSONResponse(
+                {"detail": "Server is busy, please try again later"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        streams_crypto = _matches(STREAMED_CRYPTO_ROUTES, scope["method"], scope["path"])
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                controller.release()
+        
+        async def send_and_release(message):
+            # Downloads decrypt until their last body message; other responses are done once they start
+            if streams_crypto:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    release()
+            elif message["type"] == "http.response.start":
+                release()
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            release()
+
+
+def admission_stats() -> dict:
+    """Counters of every route class, for the metrics endpoint."""
+    return {name: controller.stats() for name, controller in admission_controllers.items()}
@@ -2,6 +2,8 @@
 JWT token utilities for session management.
 """
 import os
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -12,6 +14,8 @@ from dotenv import load_dotenv
 
 from database import get_db
 from models import User
+from auth.revocation import RevocationList
+from auth.sessions import AUTH_MODE, SESSION, session_store
 
 # Load environment variables
 load_dotenv()
@@ -24,10 +28,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES"))
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Logged out tokens and "sign out everywhere" cutoffs
+revocation_list = RevocationList(ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
+    
+    Each token gets a unique jti so it can be revoked, and a fractional iat
+    so a token issued right after a "sign out everywhere" isn't caught by it.
     """
     to_encode = data.copy()
     
@@ -36,7 +46,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     print(f"[JWT] Created token for user_id: {data.get('sub')}, token: {encoded_jwt[:50]}...")
@@ -62,7 +72,9 @@ async def get_current_user(
     db: Session = Depends(get_db)
 ) -> User:
     """
-    Dependency to get the current authenticated user from JWT token.
+    Dependency to get the current authenticated user from the bearer token.
+    
+    The token is a JWT, or an opaque session token when AUTH_MODE=session.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,13 +85,20 @@ async def get_current_user(
     token = credentials.credentials
     print(f"[JWT] Received token: {token[:50] if token else 'None'}...")
     
-    payload = decode_token(token)
-    
-    if payload is None:
-        print("[JWT] Payload is None, raising 401")
-        raise credentials_exception
-    
-    user_id = payload.get("sub")
+    if AUTH_MODE == SESSION:
+        user_id = session_store.validate(token)
+    else:
+        payload = decode_token(token)
+        
+        if payload is None:
+            print("[JWT] Payload is None, raising 401")
+            raise credentials_exception
+        
+        if revocation_list.is_revoked(payload):
+            print("[JWT] Token has been revoked, raising 401")
+            raise credentials_exception
+        
+        user_id = payload.get("sub")
     print(f"[JWT] User ID from token: {user_id}, type: {type(user_id)}")
     
     if user_id is None:
@@ -96,6 +115,24 @@ async def get_current_user(
     return user
 
 
+def revoke_token(token: str):
+    """Sign out one bearer token: revoke its session, or its jti in JWT mode."""
+    if AUTH_MODE == SESSION:
+        session_store.revoke(token)
+        return
+    
+    payload = decode_token(token)
+    if payload is not None:
+        revocation_list.revoke(payload)
+
+
+def revoke_user_tokens(user_id: int):
+    """Sign out every session and JWT of a user issued until now."""
+    session_store.revoke_user(user_id)
+    if AUTH_MODE != SESSION:
+        revocation_list.revoke_user(user_id)
+
+
 def require_role(required_role: str):
     """
     Dependency factory for role-based access control.
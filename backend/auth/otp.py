@@ -1,9 +1,10 @@
 """
 OTP (One-Time Password) utilities for multi-factor authentication.
 """
-import random
+import secrets
 import string
-from datetime import datetime, timedelta
+
+from notifications import notifier
 
 # OTP Configuration
 OTP_LENGTH = 6
@@ -17,51 +18,41 @@ def generate_otp() -> str:
     Returns:
         6-digit numeric string
     """
-    return ''.join(random.choices(string.digits, k=OTP_LENGTH))
+    return ''.join(secrets.choice(string.digits) for _ in range(OTP_LENGTH))
 
 
-def get_otp_expiry() -> datetime:
+def send_otp(username: str, otp: str) -> bool:
     """
-    Get the expiry time for a new OTP.
-    
-    Returns:
-        Datetime when OTP expires
-    """
-    return datetime.utcnow() + timedelta(minutes=OTP_EXPIRY_MINUTES)
-
-
-def verify_otp(user_otp: str, stored_otp: str, expiry: datetime) -> bool:
-    """
-    Verify an OTP against stored value and check expiry.
+    Queue the registration OTP for delivery to the user.
     
     Args:
-        user_otp: OTP entered by user
-        stored_otp: OTP stored in database
-        expiry: Expiry datetime of the OTP
-        
+        username: User to send OTP to
+        otp: The OTP code
+    
     Returns:
-        True if OTP is valid and not expired, False otherwise
+        True if queued, False if the notification queue is full
     """
-    if stored_otp is None or expiry is None:
-        return False
-    
-    # Check if OTP has expired
-    if datetime.utcnow() > expiry:
-        return False
-    
-    # Check if OTP matches
-    return user_otp == stored_otp
+    return notifier.enqueue(
+        username,
+        "Your SecureVault verification code",
+        f"Your verification code is {otp}. It expires in {OTP_EXPIRY_MINUTES} minutes."
+    )
 
 
-def simulate_send_otp(username: str, otp: str):
+def send_reset_token(username: str, reset_token: str) -> bool:
     """
-    Simulate sending OTP via email/SMS.
-    In production, this would integrate with an email/SMS service.
+    Queue a password reset code for delivery to the user.
     
     Args:
-        username: User to send OTP to
-        otp: The OTP code
-    """
-    print(f"\n{'='*50}")
-    print(f"📧 OTP for user '{username}': {otp}")
-    print(f"{'='*50}\n")
+        username: User to send the code to
+        reset_token: The reset code
+    
+    Returns:
+        True if queued, False if the notification queue is full
+    """
+    return notifier.enqueue(
+        username,
+        "Your SecureVault password reset code",
+        f"Your password reset code is {reset_token}. It expires in {OTP_EXPIRY_MINUTES} minutes.\n"
+        "If you did not ask to reset your password, ignore this message."
+    )
@@ -0,0 +1,258 @@
+"""
+Revocation of stateless JWTs (logout and "sign out everywhere").
+
+Every JWT carries a jti. Logging out records the token's jti in the
+revoked_tokens table; signing out everywhere records a per-user cutoff
+that rejects every token the user was issued up to that moment.
+
+The table is the exact list. Each worker keeps revoked jtis in Bloom
+filters, one per generation of JWT_EXPIRE_MINUTES by token expiry, so
+checking a token that was never revoked takes a few dict lookups and bit
+tests with no database access. Only filter positives are confirmed
+against the table. A generation is dropped once all of its tokens have
+expired, so the filters shrink as revocations stop mattering; expired
+rows are deleted whenever a token is revoked.
+
+Each worker reads revocations made by the others every
+REVOCATION_SYNC_SECONDS, so another worker may accept a revoked token for
+up to that long. Rows are found by revoked_at rather than by id, and each
+sync reads the last REVOCATION_SYNC_OVERLAP_SECONDS again, so rows that
+commit late or come from a worker with a slightly slow clock are not
+missed.
+"""
+import hashlib
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+load_dotenv()
+
+# Revoked jtis per filter generation before the false positive rate exceeds the target
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+# How far before the previous sync each sync looks for revocations
+REVOCATION_SYNC_OVERLAP_SECONDS = float(os.getenv("REVOCATION_SYNC_OVERLAP_SECONDS", "60"))
+
+
+def _timestamp(value: datetime) -> float:
+    # Columns hold naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings.
+    
+    Sized for capacity keys at error_rate false positives; more keys still
+    work but raise the false positive rate. There are no false negatives.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+    
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, key: str) -> bool:
+        # Stops at the first clear bit, so most misses test one or two bits
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """
+    Revoked JWTs: an exact list in the revoked_tokens table, with rotating
+    Bloom filters and per-user cutoffs in memory.
+    
+    Each call uses its own database session, so it never commits the
+    caller's transaction. Keeps checked, filter_hits, false_positives and
+    rejected counters so callers can expose them as metrics.
+    """
+    
+    def __init__(
+        self,
+        token_lifetime: float,
+        capacity: int = REVOCATION_FILTER_CAPACITY,
+        error_rate: float = REVOCATION_FILTER_ERROR_RATE,
+        sync_interval: float = REVOCATION_SYNC_SECONDS,
+        sync_overlap: float = REVOCATION_SYNC_OVERLAP_SECONDS,
+        session_factory=None
+    ):
+        if session_factory is None:
+            from database import SessionLocal as session_factory
+        self.session_factory = session_factory
+        self.generation_seconds = max(token_lifetime, 1.0)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.checked = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+        self.rejected = 0
+        self._filters = {}  # generation -> BloomFilter of jtis whose tokens expire in it
+        self._user_cutoffs = {}  # user id (str) -> (revoked at, expires at) timestamps
+        self._seen = {}  # id -> revoked at, of rows that a later sync may read again
+        self._synced_at = None  # When the last sync started
+        self._next_sync = 0.0
+    
+    def _generation(self, expires_at: float) -> int:
+        return int(expires_at // self.generation_seconds)
+    
+    def _remember(self, jti: Optional[str], user_id: int, revoked_at: float, expires_at: float):
+        if jti is not None:
+            generation = self._generation(expires_at)
+            bloom = self._filters.get(generation)
+            if bloom is None:
+                bloom = self._filters[generation] = BloomFilter(self.capacity, self.error_rate)
+            bloom.add(jti)
+        else:
+            cutoff = self._user_cutoffs.get(str(user_id))
+            if cutoff is None or cutoff[0] < revoked_at:
+                self._user_cutoffs[str(user_id)] = (revoked_at, expires_at)
+    
+    def _prune(self, now: float):
+        # A generation ends before the current one once all its tokens have expired
+        current = self._generation(now)
+        for generation in [generation for generation in self._filters if generation < current]:
+            del self._filters[generation]
+        for user_id in [user_id for user_id, cutoff in self._user_cutoffs.items() if cutoff[1] <= now]:
+            del self._user_cutoffs[user_id]
+    
+    def sync(self):
+        """Load revocations recorded since the last sync, by any worker."""
+        from models import RevokedToken
+        
+        now = time.time()
+        db = self.session_factory()
+        try:
+            query = db.query(
+                RevokedToken.id, RevokedToken.jti, RevokedToken.user_id,
+                RevokedToken.revoked_at, RevokedToken.expires_at
+            ).filter(RevokedToken.expires_at > datetime.utcfromtimestamp(now))
+            if self._synced_at is not None:
+                query = query.filter(
+                    RevokedToken.revoked_at > datetime.utcfromtimestamp(self._synced_at - self.sync_overlap)
+                )
+            rows = query.all()
+        finally:
+            db.close()
+        
+        for row in rows:
+            if row.id in self._seen:
+                continue
+            revoked_at = _timestamp(row.revoked_at)
+            self._seen[row.id] = revoked_at
+            self._remember(row.jti, row.user_id, revoked_at, _timestamp(row.expires_at))
+        
+        # The next sync won't read rows revoked before its window again
+        self._synced_at = now
+        window_start = now - self.sync_overlap
+        for row_id in [row_id for row_id, revoked_at in self._seen.items() if revoked_at <= window_start]:
+            del self._seen[row_id]
+        self._prune(now)
+        self._next_sync = time.monotonic() + self.sync_interval
+    
+    def _record(self, jti: Optional[str], user_id: int, expires_at: float):
+        from models import RevokedToken
+        
+        now = time.time()
+        db = self.session_factory()
+        try:
+            # Rows whose tokens have all expired can't reject anything any more
+            db.query(RevokedToken).filter(
+                RevokedToken.expires_at <= datetime.utcfromtimestamp(now)
+            ).delete(synchronize_session=False)
+            row = RevokedToken(
+                jti=jti,
+                user_id=user_id,
+                revoked_at=datetime.utcfromtimestamp(now),
+                expires_at=datetime.utcfromtimestamp(expires_at)
+            )
+            db.add(row)
+            try:
+                db.commit()
+                self._seen[row.id] = now  # Already remembered below
+            except IntegrityError:
+                db.rollback()  # The token was already revoked
+        finally:
+            db.close()
+        
+        self._remember(jti, user_id, now, expires_at)
+    
+    def revoke(self, payload: dict):
+        """Revoke one decoded token by its jti (tokens without one can't be revoked singly)."""
+        if payload.get("jti") is not None:
+            self._record(payload["jti"], int(payload["sub"]), float(payload["exp"]))
+    
+    def revoke_user(self, user_id: int):
+        """Revoke every token issued to a user until now."""
+        self._record(None, user_id, time.time() + self.generation_seconds)
+    
+    def _confirm(self, jti: str) -> bool:
+        from models import RevokedToken
+        
+        db = self.session_factory()
+        try:
+            return db.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is not None
+        finally:
+            db.close()
+    
+    def is_revoked(self, payload: dict) -> bool:
+        """
+        Check a decoded, unexpired token against the revocations.
+        
+        Returns:
+            True if its jti was revoked or it was issued before its user's
+            last "sign out everywhere"
+        """
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        self.checked += 1
+        
+        cutoff = self._user_cutoffs.get(str(payload.get("sub")))
+        if cutoff is not None and payload.get("iat", 0) <= cutoff[0]:
+            self.rejected += 1
+            return True
+        
+        jti = payload.get("jti")
+        bloom = self._filters.get(self._generation(payload.get("exp", 0)))
+        if jti is None or bloom is None or jti not in bloom:
+            return False
+        
+        self.filter_hits += 1
+        if not self._confirm(jti):
+            self.false_positives += 1
+            return False
+        self.rejected += 1
+        return True
+    
+    def stats(self) -> dict:
+        """Return filter sizes and check counters."""
+        return {
+            "generations": len(self._filters),
+            "revoked_tokens": sum(bloom.count for bloom in self._filters.values()),
+            "filter_bytes": sum(len(bloom._bits) for bloom in self._filters.values()),
+            "user_cutoffs": len(self._user_cutoffs),
+            "checked": self.checked,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives,
+            "rejected": self.rejected
+        }
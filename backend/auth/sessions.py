@@ -0,0 +1,227 @@
+"""
+Opaque session tokens, the alternative to JWTs when AUTH_MODE=session.
+
+Login issues a random access token and refresh token. Both are stored as
+SHA-256 digests in the auth_sessions table, and the access tokens this
+worker has seen are cached in a sharded LRU. Validating a request is
+therefore one digest and one cache lookup; the database is only read on a
+cache miss. Unknown and revoked tokens are cached too, so a flood of bad
+tokens doesn't reach the database either.
+
+Unlike a JWT, a session can be revoked at once: logout removes it, and a
+password reset removes every session of the user. Refreshing rotates the
+pair, so each refresh token works once. Another worker may keep accepting
+a revoked token for up to SESSION_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import os
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+
+from cache import ShardedTTLCache
+
+load_dotenv()
+
+JWT = "jwt"
+SESSION = "session"
+
+# Bearer tokens the API issues: jwt (stateless, default) or session (opaque, revocable)
+AUTH_MODE = os.getenv("AUTH_MODE", JWT).lower()
+if AUTH_MODE not in (JWT, SESSION):
+    print(f"[Sessions] Unknown auth mode {AUTH_MODE}, falling back to {JWT}")
+    AUTH_MODE = JWT
+
+SESSION_EXPIRE_MINUTES = int(os.getenv("SESSION_EXPIRE_MINUTES", "15"))
+SESSION_REFRESH_EXPIRE_DAYS = int(os.getenv("SESSION_REFRESH_EXPIRE_DAYS", "14"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "100000"))
+SESSION_CACHE_SHARDS = int(os.getenv("SESSION_CACHE_SHARDS", "16"))
+# Seconds another worker's revocation may take to reach this worker's cache
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "30"))
+
+TOKEN_BYTES = 32
+
+# Cached for unknown and revoked tokens; its expiry is always in the past
+INVALID = (None, 0.0)
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _timestamp(value: datetime) -> float:
+    # Columns hold naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SessionStore:
+    """
+    Session records in the auth_sessions table with a sharded cache in front.
+    
+    Each call uses its own database session, so it never commits the
+    caller's transaction. Keeps created, refreshed and revoked counters so
+    callers can expose them as metrics; they cover this process only.
+    """
+    
+    def __init__(self, session_factory=None, cache: Optional[ShardedTTLCache] = None):
+        if session_factory is None:
+            from database import SessionLocal as session_factory
+        self.session_factory = session_factory
+        self.cache = cache or ShardedTTLCache(
+            maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL_SECONDS, shards=SESSION_CACHE_SHARDS
+        )
+        self.created = 0
+        self.refreshed = 0
+        self.revoked = 0
+    
+    def create(self, user_id: int) -> dict:
+        """
+        Start a session for a user.
+        
+        Returns:
+            {"access_token", "refresh_token", "expires_in"} (expires_in in seconds)
+        """
+        from models import AuthSession
+        
+        access_token = secrets.token_urlsafe(TOKEN_BYTES)
+        refresh_token = secrets.token_urlsafe(TOKEN_BYTES)
+        now = datetime.utcnow()
+        expires_at = now + timedelta(minutes=SESSION_EXPIRE_MINUTES)
+        
+        db = self.session_factory()
+        try:
+            # Sessions past their refresh window can never be used again
+            db.query(AuthSession).filter(AuthSession.refresh_expires_at <= now).delete(synchronize_session=False)
+            db.add(AuthSession(
+                user_id=user_id,
+                token_hash=_digest(access_token),
+                refresh_hash=_digest(refresh_token),
+                expires_at=expires_at,
+                refresh_expires_at=now + timedelta(days=SESSION_REFRESH_EXPIRE_DAYS)
+            ))
+            db.commit()
+        finally:
+            db.close()
+        
+        self.cache.set(_digest(access_token), (user_id, _timestamp(expires_at)))
+        self.created += 1
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": SESSION_EXPIRE_MINUTES * 60
+        }
+    
+    def validate(self, access_token: str) -> Optional[int]:
+        """
+        Look up the user of an access token.
+        
+        Returns:
+            The user id, or None if the token is unknown, revoked or expired
+        """
+        token_hash = _digest(access_token)
+        entry = self.cache.get(token_hash)
+        if entry is None:
+            entry = self._load(token_hash)
+            self.cache.set(token_hash, entry)
+        
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            return None
+        return user_id
+    
+    def _load(self, token_hash: str) -> tuple:
+        from models import AuthSession
+        
+        db = self.session_factory()
+        try:
+            row = db.query(AuthSession.user_id, AuthSession.expires_at).filter(
+                AuthSession.token_hash == token_hash
+            ).first()
+        finally:
+            db.close()
+        
+        if row is None:
+            return INVALID
+        return row.user_id, _timestamp(row.expires_at)
+    
+    def refresh(self, refresh_token: str) -> Optional[dict]:
+        """
+        Replace a session with a new one (refresh token rotation).
+        
+        The old access and refresh tokens stop working.
+        
+        Returns:
+            The new tokens as returned by create(), or None if the refresh
+            token is unknown, already used or expired
+        """
+        from models import AuthSession
+        
+        db = self.session_factory()
+        try:
+            row = db.query(AuthSession.id, AuthSession.user_id, AuthSession.token_hash).filter(
+                AuthSession.refresh_hash == _digest(refresh_token),
+                AuthSession.refresh_expires_at > datetime.utcnow()
+            ).first()
+            if row is None:
+                return None
+            
+            # Only one concurrent refresh can delete the row
+            rotated = db.query(AuthSession).filter(AuthSession.id == row.id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        
+        self.cache.set(row.token_hash, INVALID)
+        if not rotated:
+            return None
+        
+        self.refreshed += 1
+        return self.create(row.user_id)
+    
+    def revoke(self, access_token: str):
+        """End the session of an access token."""
+        from models import AuthSession
+        
+        token_hash = _digest(access_token)
+        db = self.session_factory()
+        try:
+            self.revoked += db.query(AuthSession).filter(
+                AuthSession.token_hash == token_hash
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self.cache.set(token_hash, INVALID)
+    
+    def revoke_user(self, user_id: int):
+        """End every session of a user."""
+        from models import AuthSession
+        
+        db = self.session_factory()
+        try:
+            token_hashes = [token_hash for (token_hash,) in db.query(AuthSession.token_hash).filter(
+                AuthSession.user_id == user_id
+            )]
+            db.query(AuthSession).filter(AuthSession.user_id == user_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        
+        for token_hash in token_hashes:
+            self.cache.set(token_hash, INVALID)
+        self.revoked += len(token_hashes)
+    
+    def stats(self) -> dict:
+        """Return session counters and cache statistics."""
+        return {
+            "mode": AUTH_MODE,
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "revoked": self.revoked,
+            "cache": self.cache.stats()
+        }
+
+
+session_store = SessionStore()
@@ -0,0 +1,272 @@
+"""
+Ephemeral token store for one-time codes (registration OTPs, password reset tokens).
+
+Codes are kept outside the users table: each (purpose, subject) pair holds
+one code with an expiry time and a failed-attempt counter. A code is
+consumed by the first successful verification and discarded once it
+expires or after TOKEN_MAX_ATTEMPTS wrong guesses.
+
+TOKEN_STORE selects the implementation:
+- memory (default): in-process dict with a heap of expiry times; only
+  suitable for a single worker process
+- database: the ephemeral_tokens table of the app database, shared by
+  every worker
+"""
+import hashlib
+import heapq
+import hmac
+import itertools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+load_dotenv()
+
+MEMORY = "memory"
+DATABASE = "database"
+
+TOKEN_STORE = os.getenv("TOKEN_STORE", MEMORY).lower()
+TOKEN_MAX_ATTEMPTS = int(os.getenv("TOKEN_MAX_ATTEMPTS", "5"))
+
+
+class TokenStore(ABC):
+    """
+    Short-lived codes, one per (purpose, subject), with an attempt limit.
+    
+    Keeps issued, verified, failed, exhausted and expired counters so
+    callers can expose them as metrics.
+    """
+    
+    def __init__(self, max_attempts: int = TOKEN_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.issued = 0
+        self.verified = 0
+        self.failed = 0
+        self.exhausted = 0
+        self.expired = 0
+    
+    @abstractmethod
+    def put(self, purpose: str, subject: str, code: str, ttl: float):
+        """Store a code for ttl seconds, replacing the subject's previous one."""
+    
+    @abstractmethod
+    def verify(self, purpose: str, subject: str, code: str) -> bool:
+        """
+        Check a code and consume it if it matches.
+        
+        A wrong code counts as a failed attempt; the code is discarded when
+        the attempts run out.
+        
+        Returns:
+            True if the code matched and had not expired, False otherwise
+        """
+    
+    @abstractmethod
+    def discard(self, purpose: str, subject: str):
+        """Remove the subject's code if present."""
+    
+    @abstractmethod
+    def active(self) -> int:
+        """Number of unexpired codes."""
+    
+    def stats(self) -> dict:
+        """Return the active code count and outcome counters."""
+        return {
+            "active": self.active(),
+            "issued": self.issued,
+            "verified": self.verified,
+            "failed": self.failed,
+            "exhausted": self.exhausted,
+            "expired": self.expired
+        }
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Thread-safe in-memory token store.
+    
+    Expiry times are kept in a min-heap, so every call removes the codes
+    that have expired since the last one in O(log n) each instead of
+    scanning every code.
+    """
+    
+    def __init__(self, max_attempts: int = TOKEN_MAX_ATTEMPTS):
+        super().__init__(max_attempts)
+        self._entries = {}  # (purpose, subject) -> [code, expires_at, attempts, sequence]
+        self._expiry_heap = []  # (expires_at, sequence, key)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+    
+    def _expire(self, now: float):
+        # Heap entries of replaced or consumed codes no longer match by sequence
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, sequence, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == sequence:
+                del self._entries[key]
+                self.expired += 1
+    
+    def put(self, purpose: str, subject: str, code: str, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            sequence = next(self._sequence)
+            key = (purpose, subject)
+            self._entries[key] = [code, now + ttl, 0, sequence]
+            heapq.heappush(self._expiry_heap, (now + ttl, sequence, key))
+            self.issued += 1
+    
+    def verify(self, purpose: str, subject: str, code: str) -> bool:
+        key = (purpose, subject)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                self.failed += 1
+                return False
+            
+            if hmac.compare_digest(entry[0].encode(), code.encode()):
+                del self._entries[key]
+                self.verified += 1
+                return True
+            
+            self.failed += 1
+            entry[2] += 1
+            if entry[2] >= self.max_attempts:
+                del self._entries[key]
+                self.exhausted += 1
+            return False
+    
+    def discard(self, purpose: str, subject: str):
+        with self._lock:
+            self._entries.pop((purpose, subject), None)
+    
+    def active(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._entries)
+
+
+class DatabaseTokenStore(TokenStore):
+    """
+    Token store in the ephemeral_tokens table, shared by all worker processes.
+    
+    Codes are stored as SHA-256 digests. Each call uses its own session, so
+    it never commits the caller's transaction. Expired rows are deleted
+    whenever a code is issued. The counters cover this process only.
+    """
+    
+    def __init__(self, max_attempts: int = TOKEN_MAX_ATTEMPTS, session_factory=None):
+        super().__init__(max_attempts)
+        if session_factory is None:
+            from database import SessionLocal as session_factory
+        self.session_factory = session_factory
+    
+    @staticmethod
+    def _digest(code: str) -> str:
+        return hashlib.sha256(code.encode()).hexdigest()
+    
+    def put(self, purpose: str, subject: str, code: str, ttl: float):
+        from models import EphemeralToken
+        
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            self.expired += db.query(EphemeralToken).filter(
+                EphemeralToken.expires_at <= now
+            ).delete(synchronize_session=False)
+            db.query(EphemeralToken).filter(
+                EphemeralToken.purpose == purpose,
+                EphemeralToken.subject == subject
+            ).delete(synchronize_session=False)
+            db.add(EphemeralToken(
+                purpose=purpose,
+                subject=subject,
+                code_hash=self._digest(code),
+                attempts=0,
+                expires_at=now + timedelta(seconds=ttl)
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker issued a code for the same subject at the same moment
+                db.rollback()
+                return self.put(purpose, subject, code, ttl)
+            self.issued += 1
+        finally:
+            db.close()
+    
+    def verify(self, purpose: str, subject: str, code: str) -> bool:
+        from models import EphemeralToken
+        
+        db = self.session_factory()
+        try:
+            row = db.query(EphemeralToken).filter(
+                EphemeralToken.purpose == purpose,
+                EphemeralToken.subject == subject,
+                EphemeralToken.expires_at > datetime.utcnow()
+            ).first()
+            if row is None:
+                self.failed += 1
+                return False
+            
+            if hmac.compare_digest(row.code_hash, self._digest(code)):
+                # Only one concurrent verification can delete the row
+                consumed = db.query(EphemeralToken).filter(
+                    EphemeralToken.id == row.id
+                ).delete(synchronize_session=False)
+                db.commit()
+                if consumed:
+                    self.verified += 1
+                    return True
+                self.failed += 1
+                return False
+            
+            self.failed += 1
+            db.query(EphemeralToken).filter(EphemeralToken.id == row.id).update(
+                {EphemeralToken.attempts: EphemeralToken.attempts + 1},
+                synchronize_session=False
+            )
+            exhausted = db.query(EphemeralToken).filter(
+                EphemeralToken.id == row.id,
+                EphemeralToken.attempts >= self.max_attempts
+            ).delete(synchronize_session=False)
+            db.commit()
+            self.exhausted += exhausted
+            return False
+        finally:
+            db.close()
+    
+    def discard(self, purpose: str, subject: str):
+        from models import EphemeralToken
+        
+        db = self.session_factory()
+        try:
+            db.query(EphemeralToken).filter(
+                EphemeralToken.purpose == purpose,
+                EphemeralToken.subject == subject
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    
+    def active(self) -> int:
+        from models import EphemeralToken
+        
+        db = self.session_factory()
+        try:
+            return db.query(EphemeralToken).filter(EphemeralToken.expires_at > datetime.utcnow()).count()
+        finally:
+            db.close()
+
+
+if TOKEN_STORE == DATABASE:
+    token_store = DatabaseTokenStore()
+else:
+    if TOKEN_STORE != MEMORY:
+        print(f"[Tokens] Unknown token store {TOKEN_STORE}, falling back to {MEMORY}")
+    token_store = MemoryTokenStore()
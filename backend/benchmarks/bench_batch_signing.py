@@ -0,0 +1,90 @@
+"""
+Benchmark batch (Merkle root) signing against signing every item.
+
+Run from the backend directory:
+    python -m benchmarks.bench_batch_signing [--items 1000]
+
+Encrypts and signs a batch of password items the way the import route
+does, once with one RSA signature per item and once with one signature
+over the Merkle root of the batch, then times verifying a page of each
+with decrypt_and_verify_many and with check_signatures alone.
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+
+
+def build_items(count: int) -> list:
+    """Create in-memory password items with their payloads (not yet stored)."""
+    from models import VaultItem, VaultItemType
+
+    items = []
+    for i in range(count):
+        data = json.dumps({
+            "website": f"site{i}.example.com",
+            "username": f"user{i}",
+            "password": f"correct-horse-battery-{i}"
+        }).encode()
+        items.append((VaultItem(id=i, type=VaultItemType.PASSWORD.value, name=f"item{i}"), data))
+    return items
+
+
+def write(count: int, dek: bytes, batch: bool) -> tuple:
+    """Encrypt and sign count items; returns (items, seconds)."""
+    from routes.vault import encrypt_and_store, sign_items
+
+    pending = build_items(count)
+    start = time.perf_counter()
+    for item, data in pending:
+        encrypt_and_store(item, data, dek, sign=not batch)
+    items = [item for item, _ in pending]
+    if batch:
+        sign_items(items)
+    return items, time.perf_counter() - start
+
+
+def best_of(rounds: int, function) -> float:
+    """Run function rounds times; returns the fastest time in seconds."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    from crypto.envelope import generate_dek
+    from routes.vault import check_signatures, decrypt_and_verify_many
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    dek = generate_dek()
+    decrypt_and_verify_many(write(10, dek, False)[0], dek)  # Warm up keys and pool
+
+    print(f"Writing {args.items} items, verifying pages of {args.page}")
+    for label, batch in (("per-item", False), ("batch", True)):
+        items, seconds = write(args.items, dek, batch)
+        page = items[:args.page]
+        assert not check_signatures(items)
+
+        signatures_ms = best_of(args.rounds, lambda: check_signatures(page)) * 1000
+        page_ms = best_of(args.rounds, lambda: decrypt_and_verify_many(page, dek)) * 1000
+        print(
+            f"  {label:>8} signatures: write {args.items / seconds:.0f} items/s, "
+            f"verify page signatures {signatures_ms:.1f} ms, "
+            f"decrypt and verify page {page_ms:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
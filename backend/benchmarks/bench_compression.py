@@ -0,0 +1,106 @@
+"""
+Benchmark compression before encryption on a synthetic sample corpus.
+
+Run from the backend directory:
+    python -m benchmarks.bench_compression
+
+Reports stored (Base64) size and store/read throughput for each
+algorithm over text notes, JSON, CSV, logs and incompressible binaries.
+"""
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+
+WORDS = (
+    "meeting project vault secure review budget quarter team update release "
+    "customer invoice server login report schedule action follow owner status"
+).split()
+
+
+def build_corpus(seed: int = 42) -> dict:
+    """Create deterministic sample documents of each kind."""
+    rng = random.Random(seed)
+
+    note = " ".join(rng.choice(WORDS) for _ in range(40000)).encode()
+    records = [
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com",
+         "active": rng.random() > 0.5, "score": rng.randint(0, 1000)}
+        for i in range(5000)
+    ]
+    export = json.dumps(records, indent=2).encode()
+    csv = "\n".join(
+        f"{i},{rng.choice(WORDS)},{rng.randint(1, 9999)},{rng.random():.4f}"
+        for i in range(20000)
+    ).encode()
+    log = "\n".join(
+        f"2024-01-20T10:{i // 60 % 60:02d}:{i % 60:02d} INFO [api] GET /vault/items "
+        f"user={rng.randint(1, 50)} status=200 duration_ms={rng.randint(1, 300)}"
+        for i in range(10000)
+    ).encode()
+    # Random bytes behave like JPEG, PDF streams and zip archives
+    binary = rng.randbytes(1024 * 1024)
+
+    return {"note": note, "json": export, "csv": csv, "log": log, "binary": binary}
+
+
+def run(algorithm: str, corpus: dict, rounds: int = 3) -> dict:
+    """Store and read back the corpus with one compression algorithm."""
+    import crypto.compression as compression
+    from crypto.envelope import generate_dek
+    from models import VaultItem
+    from routes.vault import encrypt_and_store, decrypt_and_verify
+
+    compression.COMPRESSION_ALGORITHM = algorithm
+    dek = generate_dek()
+    raw_bytes = sum(len(data) for data in corpus.values())
+
+    store_time = read_time = 0.0
+    stored = {}
+    for _ in range(rounds):
+        for index, (kind, data) in enumerate(corpus.items()):
+            item = VaultItem(id=index)
+            start = time.perf_counter()
+            encrypt_and_store(item, data, dek)
+            store_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            assert decrypt_and_verify(item, dek) == data
+            read_time += time.perf_counter() - start
+            stored[kind] = len(item.encrypted_data)
+
+    mb = raw_bytes * rounds / (1024 * 1024)
+    return {
+        "stored": stored,
+        "stored_total": sum(stored.values()),
+        "store_mb_s": mb / store_time,
+        "read_mb_s": mb / read_time,
+    }
+
+
+def main():
+    from crypto.compression import zstandard
+
+    corpus = build_corpus()
+    algorithms = ["none", "zlib"] + (["zstd"] if zstandard is not None else [])
+
+    print("Corpus: " + ", ".join(f"{kind} {len(data) / 1024:.0f} KiB" for kind, data in corpus.items()))
+    baseline = None
+    for algorithm in algorithms:
+        result = run(algorithm, corpus)
+        baseline = baseline or result["stored_total"]
+        per_kind = ", ".join(f"{kind} {size / 1024:.0f} KiB" for kind, size in result["stored"].items())
+        print(
+            f"{algorithm:>5}: stored {result['stored_total'] / 1024:.0f} KiB "
+            f"({result['stored_total'] / baseline:.0%} of uncompressed), "
+            f"store {result['store_mb_s']:.1f} MB/s, read {result['read_mb_s']:.1f} MB/s"
+        )
+        print(f"       {per_kind}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark chunked, deduplicated file storage against inline storage.
+
+Run from the backend directory:
+    python -m benchmarks.bench_dedup
+
+Stores a synthetic versioned corpus (edited CSVs, a growing log, a binary
+with a small in-place change and an exact duplicate) once with chunking
+and once without, and reports stored size, dedup ratio and store/read
+throughput. Uses a temporary SQLite database.
+"""
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+WORDS = (
+    "meeting project vault secure review budget quarter team update release "
+    "customer invoice server login report schedule action follow owner status"
+).split()
+
+
+def build_corpus(seed: int = 42) -> dict:
+    """Create deterministic files and later versions of them."""
+    rng = random.Random(seed)
+
+    csv = "".join(
+        f"{i},{rng.choice(WORDS)},{rng.randint(1, 9999)},{rng.random():.4f}\n"
+        for i in range(150000)
+    ).encode()
+    csv_insert = csv[:100000] + b"0,inserted,1,0.5\n" + csv[100000:]
+    csv_edit = csv_insert[:2000000] + b"9" * 40 + csv_insert[2000040:]
+    csv_append = csv_edit + b"150000,appended,2,0.25\n" * 500
+
+    log = "".join(
+        f"2024-01-20T10:{i // 60 % 60:02d}:{i % 60:02d} INFO [api] GET /vault/items "
+        f"user={rng.randint(1, 50)} status=200 duration_ms={rng.randint(1, 300)}\n"
+        for i in range(40000)
+    ).encode()
+    log_grown = log + log[:len(log) // 4]
+
+    # Random bytes behave like photos, PDFs and archives
+    binary = rng.randbytes(4 * 1024 * 1024)
+    binary_edit = binary[:3000000] + bytes(100) + binary[3000100:]
+
+    return {
+        "data.csv v1": csv,
+        "data.csv v2 (line inserted)": csv_insert,
+        "data.csv v3 (bytes edited)": csv_edit,
+        "data.csv v4 (rows appended)": csv_append,
+        "app.log v1": log,
+        "app.log v2 (grown)": log_grown,
+        "photo.raw": binary,
+        "photo.raw (edited)": binary_edit,
+        "photo copy.raw": binary
+    }
+
+
+def run(username: str, chunking: bool, corpus: dict) -> dict:
+    """Store and read back the corpus as one user's files."""
+    import chunkstore
+    from chunkstore import chunk_store_stats
+    from database import Base, SessionLocal, engine
+    from models import FileChunk, User, VaultItemType
+    from routes.vault import create_vault_item, decrypt_and_verify, get_user_dek
+
+    Base.metadata.create_all(bind=engine)
+    chunkstore.FILE_CHUNKING = chunking
+    db = SessionLocal()
+    user = User(username=username, password_hash="-")
+    db.add(user)
+    db.commit()
+    dek = get_user_dek(db, user)
+
+    start = time.perf_counter()
+    items = []
+    for name, data in corpus.items():
+        items.append(create_vault_item(db, user, dek, VaultItemType.FILE.value, name, data, file_name=name))
+        db.commit()
+    store_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item, data in zip(items, corpus.values()):
+        assert decrypt_and_verify(item, dek) == data
+    read_time = time.perf_counter() - start
+
+    stored_chars = sum(len(item.encrypted_data) for item in items)
+    stored_chars += sum(len(data) for (data,) in db.query(FileChunk.data).filter(FileChunk.user_id == user.id))
+    dedup_ratio = chunk_store_stats(db)["dedup_ratio"]
+    db.close()
+
+    raw_bytes = sum(len(data) for data in corpus.values())
+    stored_bytes = stored_chars * 3 // 4  # Base64 to ciphertext bytes
+    mb = raw_bytes / (1024 * 1024)
+    return {
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "dedup_ratio": dedup_ratio,
+        "store_mb_s": mb / store_time,
+        "read_mb_s": mb / read_time
+    }
+
+
+def main():
+    from crypto.chunking import chunk_boundaries
+
+    corpus = build_corpus()
+    raw_bytes = sum(len(data) for data in corpus.values())
+    print(f"Corpus: {len(corpus)} files, {raw_bytes / (1024 * 1024):.1f} MiB")
+
+    start = time.perf_counter()
+    chunks = sum(1 for data in corpus.values() for _ in chunk_boundaries(data))
+    elapsed = time.perf_counter() - start
+    print(f"Chunker alone: {raw_bytes / (1024 * 1024) / elapsed:.1f} MB/s, "
+          f"{chunks} chunks, {raw_bytes / chunks / 1024:.0f} KiB average")
+
+    baseline = None
+    for label, chunking in (("inline", False), ("chunked", True)):
+        result = run(f"bench-{label}", chunking, corpus)
+        baseline = baseline or result["stored_bytes"]
+        print(
+            f"{label:>8}: stored {result['stored_bytes'] / (1024 * 1024):.1f} MiB "
+            f"({result['stored_bytes'] / result['raw_bytes']:.0%} of raw, {result['stored_bytes'] / baseline:.0%} of inline), "
+            f"dedup ratio {result['dedup_ratio'] or 1.0:.2f}, "
+            f"store {result['store_mb_s']:.1f} MB/s, read {result['read_mb_s']:.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark list-endpoint decryption latency on 1, 4 and 8 cores.
+
+Run from the backend directory:
+    python -m benchmarks.bench_list_decrypt [--items 1000]
+
+Each core count runs in a subprocess pinned to that many CPUs
+(Linux only) with CRYPTO_WORKERS set to match.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+
+
+def build_items(count: int, dek: bytes) -> list:
+    """Create in-memory password items the way store_password does."""
+    from models import VaultItem, VaultItemType
+    from routes.vault import encrypt_and_store
+
+    items = []
+    for i in range(count):
+        data = json.dumps({
+            "website": f"site{i}.example.com",
+            "username": f"user{i}",
+            "password": f"correct-horse-battery-{i}"
+        }).encode()
+        item = VaultItem(id=i, type=VaultItemType.PASSWORD.value, name=f"item{i}")
+        encrypt_and_store(item, data, dek)
+        items.append(item)
+    return items
+
+
+def run_worker(count: int, rounds: int):
+    """Measure decrypt_and_verify_many in this process and print JSON."""
+    from crypto.envelope import generate_dek
+    from routes.vault import decrypt_and_verify_many
+
+    dek = generate_dek()
+    items = build_items(count, dek)
+    decrypt_and_verify_many(items[:10], dek)  # Warm up keys and pool
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        decrypt_and_verify_many(items, dek)
+        timings.append(time.perf_counter() - start)
+
+    print(json.dumps({"best_ms": min(timings) * 1000, "mean_ms": sum(timings) / len(timings) * 1000}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.items, args.rounds)
+        return
+
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+    print(f"Listing {args.items} items, {len(available or [])} cores available")
+
+    for cores in args.cores:
+        env = dict(os.environ, CRYPTO_WORKERS=str(cores))
+        preexec = None
+        if available:
+            cpus = set(available[:cores])
+            preexec = lambda: os.sched_setaffinity(0, cpus)
+            if cores > len(available):
+                print(f"  note: only {len(available)} cores available for {cores}-core run")
+
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_list_decrypt", "--worker",
+             "--items", str(args.items), "--rounds", str(args.rounds)],
+            env=env, preexec_fn=preexec, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"  {cores} core(s): best {result['best_ms']:.1f} ms, mean {result['mean_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
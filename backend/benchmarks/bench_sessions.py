@@ -0,0 +1,88 @@
+"""
+Benchmark bearer token validation: JWT decoding against session lookups.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sessions [--seconds 1] [--sessions 10000] [--revoked 100000]
+
+Creates the sessions in a temporary SQLite database, then measures a JWT
+decode (HS256 signature check and claims parsing), the revocation check
+of a valid JWT against --revoked revoked jtis, a session lookup that hits
+the sharded cache, and one that misses it and reads auth_sessions. The
+user row load that follows in get_current_user is the same for both modes
+and is left out.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+
+def throughput(seconds: float, function) -> float:
+    """Call function repeatedly for about seconds; returns calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(20):
+            function()
+        calls += 20
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def main():
+    from jose import jwt
+    from auth.jwt import ALGORITHM, SECRET_KEY, create_access_token
+    from auth.revocation import RevocationList
+    from auth.sessions import SessionStore
+    from database import Base, SessionLocal, engine
+    from models import User
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--revoked", type=int, default=100000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(User(username="benchmark", password_hash="-"))
+    db.commit()
+    user_id = db.query(User.id).scalar()
+    db.close()
+
+    store = SessionStore()
+    tokens = [store.create(user_id)["access_token"] for _ in range(args.sessions)]
+    token = tokens[-1]
+    jwt_token = create_access_token(data={"sub": str(user_id)})
+    payload = jwt.decode(jwt_token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    revocations = RevocationList(token_lifetime=payload["exp"] - payload["iat"])
+    revocations.sync()
+    for _ in range(args.revoked):
+        revocations._remember(uuid.uuid4().hex, user_id, time.time(), payload["exp"])
+    print(f"{args.sessions} sessions, {args.revoked} revoked JWTs, {args.seconds:g} s per measurement")
+
+    def cache_miss():
+        store.cache.clear()
+        store.validate(token)
+
+    for label, function in (
+        ("JWT decode", lambda: jwt.decode(jwt_token, SECRET_KEY, algorithms=[ALGORITHM])),
+        ("JWT revocation", lambda: revocations.is_revoked(payload)),
+        ("session, cached", lambda: store.validate(token)),
+        ("session, database", cache_miss)
+    ):
+        rate = throughput(args.seconds, function)
+        print(f"  {label:>17}: {rate:9.0f}/s ({1e6 / rate:7.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
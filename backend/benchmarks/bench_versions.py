@@ -0,0 +1,151 @@
+"""
+Benchmark version history storage for items that are edited repeatedly.
+
+Run from the backend directory:
+    python -m benchmarks.bench_versions
+
+Applies a series of small edits to a note, a small file and a large
+(chunked) file and reports what their previous versions cost to store,
+compared with keeping every version as a full compressed copy, plus the
+update and restore times. Uses a temporary SQLite database.
+"""
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRE_MINUTES", "30")
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+WORDS = (
+    "meeting project vault secure review budget quarter team update release "
+    "customer invoice server login report schedule action follow owner status"
+).split()
+
+EDITS = 40
+
+
+def build_edits(seed: int = 7) -> dict:
+    """Create deterministic items and a series of edited versions of each."""
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))) + ".\n"
+
+    def edit(data: bytes) -> bytes:
+        # Insert, replace or delete a line somewhere in the content
+        position = data.find(b"\n", rng.randrange(len(data))) + 1
+        line = sentence().encode()
+        action = rng.random()
+        if action < 0.5:
+            return data[:position] + line + data[position:]
+        end = data.find(b"\n", position) + 1 or len(data)
+        return data[:position] + (line if action < 0.8 else b"") + data[end:]
+
+    def history(data: bytes) -> list:
+        versions = [data]
+        for _ in range(EDITS):
+            versions.append(edit(versions[-1]))
+        return versions
+
+    note = "".join(sentence() for _ in range(2500)).encode()
+    config = "".join(f"{rng.choice(WORDS)}_{i} = {rng.randint(1, 9999)}\n" for i in range(2000)).encode()
+    csv = "".join(
+        f"{i},{rng.choice(WORDS)},{rng.randint(1, 9999)},{rng.random():.4f}\n"
+        for i in range(100000)
+    ).encode()
+
+    return {
+        "note": ("note", history(note)),
+        "settings.ini": ("file", history(config)),
+        "data.csv": ("file", history(csv))
+    }
+
+
+def run(edits: dict) -> dict:
+    """Store every item, apply its edits and restore its oldest version."""
+    import json
+
+    from chunkstore import load_refs
+    from crypto.compression import compress
+    from database import Base, SessionLocal, engine
+    from models import FileChunk, User, VaultItemType, VaultItemVersion
+    from routes.vault import create_vault_item, get_user_dek, update_item_content, version_content
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    results = {}
+    for name, (kind, versions) in edits.items():
+        def payload(data: bytes) -> bytes:
+            if kind == "note":
+                return json.dumps({"title": name, "content": data.decode()}).encode()
+            return data
+
+        # One user per item, so the user's chunks are this item's chunks
+        user = User(username=f"bench-{name}", password_hash="-")
+        db.add(user)
+        db.commit()
+        dek = get_user_dek(db, user)
+
+        item_type = VaultItemType.NOTE.value if kind == "note" else VaultItemType.FILE.value
+        item = create_vault_item(db, user, dek, item_type, name, payload(versions[0]), file_name=name)
+        db.commit()
+
+        start = time.perf_counter()
+        for data in versions[1:]:
+            update_item_content(db, item, dek, payload(data))
+            db.commit()
+        update_time = (time.perf_counter() - start) / EDITS
+
+        start = time.perf_counter()
+        _, oldest = version_content(db, item, dek, 1)
+        restore_time = time.perf_counter() - start
+        assert oldest == payload(versions[0])
+
+        # Version rows plus the chunks only previous versions still reference
+        stored_chars = sum(
+            len(data) for (data,) in db.query(VaultItemVersion.encrypted_data).filter(VaultItemVersion.item_id == item.id)
+        )
+        current_chunks = set(load_refs(item.chunk_refs))
+        stored_chars += sum(
+            len(data)
+            for chunk_id, data in db.query(FileChunk.id, FileChunk.data).filter(FileChunk.user_id == user.id)
+            if chunk_id not in current_chunks
+        )
+
+        results[name] = {
+            "kind": kind,
+            "size": len(versions[0]),
+            "raw_bytes": sum(len(payload(data)) for data in versions[:-1]),
+            # Each previous version compressed and encrypted whole (28 bytes of IV and tag)
+            "full_bytes": sum(len(compress(payload(data))[0]) + 28 for data in versions[:-1]),
+            "stored_bytes": stored_chars * 3 // 4,  # Base64 to ciphertext bytes
+            "update_ms": update_time * 1000,
+            "restore_ms": restore_time * 1000
+        }
+    db.close()
+    return results
+
+
+def main():
+    from routes.vault import VERSION_SNAPSHOT_INTERVAL
+
+    results = run(build_edits())
+    print(f"{EDITS} edits per item (a line inserted, replaced or deleted), "
+          f"snapshot every {VERSION_SNAPSHOT_INTERVAL} versions")
+
+    for name, result in results.items():
+        print(
+            f"{name:>12} ({result['size'] / 1024:.0f} KiB {result['kind']}): "
+            f"previous versions {result['raw_bytes'] / (1024 * 1024):.1f} MiB raw, "
+            f"{result['full_bytes'] / 1024:.0f} KiB as full copies, "
+            f"{result['stored_bytes'] / 1024:.0f} KiB stored ({result['stored_bytes'] / result['full_bytes']:.1%}), "
+            f"update {result['update_ms']:.1f} ms, restore oldest {result['restore_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Small in-memory caches shared by the API.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed time-to-live.
+    
+    Keeps hit and miss counters so callers can expose them as metrics.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def stats(self) -> dict:
+        """Return size and hit-rate counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class ShardedTTLCache:
+    """
+    TTLCache split into independently locked shards by key hash.
+    
+    Concurrent lookups of different keys rarely wait on the same lock, and
+    each shard evicts its own least recently used entries once it holds
+    maxsize / shards of them.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, shards: int = 16):
+        self._shards = [TTLCache(maxsize=max(maxsize // shards, 1), ttl=ttl) for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> TTLCache:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        return self._shard(key).get(key, default)
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value in the key's shard."""
+        self._shard(key).set(key, value)
+
+    def delete(self, key: Hashable):
+        """Remove a key if present."""
+        self._shard(key).delete(key)
+
+    def clear(self):
+        """Remove every entry."""
+        for shard in self._shards:
+            shard.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._shard(key)
+
+    def stats(self) -> dict:
+        """Return size and hit-rate counters summed over the shards."""
+        shard_stats = [shard.stats() for shard in self._shards]
+        hits = sum(stats["hits"] for stats in shard_stats)
+        misses = sum(stats["misses"] for stats in shard_stats)
+        return {
+            "shards": len(self._shards),
+            "size": sum(stats["size"] for stats in shard_stats),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
@@ -0,0 +1,361 @@
+"""
+Deduplicated chunk storage for file and large note content.
+
+Files are split with content-defined chunking (crypto/chunking.py). Each
+chunk is compressed and encrypted under a key that is an HMAC of its
+content with the owner's convergence key, so identical chunks anywhere in
+one user's vault have the same key and digest and are stored once. The
+item's own ciphertext becomes a manifest of chunk ids and keys, encrypted
+with the item key like any other content.
+
+Keys never repeat across users, so chunks are never shared between vaults
+and the server can't tell whether two users store the same data.
+
+Large notes keep their content (without the title) as chunks too. Their
+hash is a Merkle root over the chunk keys instead of a hash of the whole
+note, so an edit only rewrites and re-hashes the chunks it touches.
+"""
+import hashlib
+import hmac
+import json
+import os
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from sqlalchemy import func, insert as sql_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import FileChunk, VaultItemType
+from crypto.aes import decrypt_data, encrypt_data
+from crypto.chunking import chunk_boundaries
+from crypto.compression import DECOMPRESSION_ERRORS, compress, decompress
+from crypto.encoding import decode_base64, encode_base64
+from crypto.envelope import derive_convergence_key
+from crypto.merkle import merkle_root
+
+# Files at least this large are stored as deduplicated chunks; "off" disables chunking
+FILE_CHUNKING = os.getenv("FILE_CHUNKING", "on").lower() != "off"
+FILE_CHUNKING_MIN_SIZE = int(os.getenv("FILE_CHUNKING_MIN_SIZE", str(64 * 1024)))
+# Notes at least this large are stored as chunks, so they can be patched in place
+NOTE_CHUNKING_MIN_SIZE = int(os.getenv("NOTE_CHUNKING_MIN_SIZE", str(64 * 1024)))
+# Note chunks are smaller (about 16 KiB), so a patch rewrites less
+NOTE_CHUNK_MIN_SIZE = int(os.getenv("NOTE_CHUNK_MIN_SIZE", str(16 * 1024)))
+NOTE_CHUNK_MAX_SIZE = int(os.getenv("NOTE_CHUNK_MAX_SIZE", str(64 * 1024)))
+NOTE_CUT_PATTERN = b"\x00"
+
+MANIFEST_VERSION = 1
+
+# Ids per IN (...) lookup or update
+CHUNK_QUERY_BATCH = 500
+# Chunks fetched per query when reading (about 1-2 MiB of Base64)
+CHUNK_READ_BATCH = 16
+# New chunks kept in the session before they are flushed and let go
+CHUNK_FLUSH_BATCH = 64
+
+# Raised when a chunk is missing, was tampered with or doesn't decompress
+CHUNK_ERRORS = (InvalidTag, ValueError) + DECOMPRESSION_ERRORS
+
+
+def should_chunk(item_type: Optional[str], data: bytes) -> bool:
+    """Check whether content is stored as chunks rather than inline."""
+    if not FILE_CHUNKING:
+        return False
+    if item_type == VaultItemType.FILE.value:
+        return len(data) >= FILE_CHUNKING_MIN_SIZE
+    if item_type == VaultItemType.NOTE.value:
+        return len(data) >= NOTE_CHUNKING_MIN_SIZE
+    return False
+
+
+def _batches(values: list, size: int) -> Iterator[list]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def dump_refs(chunk_ids: List[int]) -> str:
+    """Serialize the chunk ids a manifest references (repeats included)."""
+    return json.dumps(chunk_ids)
+
+
+def load_refs(chunk_refs: Optional[str]) -> List[int]:
+    """Parse a chunk_refs column; NULL means no references."""
+    return json.loads(chunk_refs) if chunk_refs else []
+
+
+def store_chunks(db: Session, user_id: int, dek: bytes, data: bytes) -> Tuple[bytes, List[int]]:
+    """
+    Split content into chunks and store the ones the user doesn't have yet.
+    
+    Args:
+        db: Session of the transaction storing the item
+        user_id: Owner of the content
+        dek: Owner's data-encryption key
+        data: Plain file content
+    
+    Returns:
+        Tuple of (manifest, chunk ids in content order). The manifest holds
+        the chunk keys and must be encrypted before it is stored; a reference
+        to every chunk id has already been added.
+    """
+    entries = store_chunk_entries(db, user_id, dek, data)
+    return dump_manifest(entries), [entry[0] for entry in entries]
+
+
+def store_chunk_entries(db: Session, user_id: int, dek: bytes, data: bytes, note: bool = False) -> list:
+    """
+    Store content as chunks like store_chunks, without building a manifest.
+    
+    Args:
+        note: Cut the content into the smaller chunks used for notes
+    
+    Returns:
+        Manifest entries (see parse_manifest) of the content's chunks; a
+        reference to every chunk has already been added
+    """
+    convergence_key = derive_convergence_key(dek)
+    view = memoryview(data)
+    
+    pieces = []
+    if note:
+        boundaries = chunk_boundaries(data, NOTE_CHUNK_MIN_SIZE, NOTE_CHUNK_MAX_SIZE, NOTE_CUT_PATTERN)
+    else:
+        boundaries = chunk_boundaries(data)
+    for start, end in boundaries:
+        key = hmac.new(convergence_key, view[start:end], hashlib.sha256).digest()
+        pieces.append((hashlib.sha256(key).hexdigest(), key, start, end))
+    
+    # digest -> (id, compression) of chunks already in the vault or added below
+    stored = {}
+    digests = list({digest for digest, _, _, _ in pieces})
+    for batch in _batches(digests, CHUNK_QUERY_BATCH):
+        rows = db.query(FileChunk.id, FileChunk.digest, FileChunk.compression).filter(
+            FileChunk.user_id == user_id,
+            FileChunk.digest.in_(batch)
+        )
+        for row in rows:
+            stored[row.digest] = (row.id, row.compression)
+    
+    pending = {}
+    for digest, key, start, end in pieces:
+        if digest in stored or digest in pending:
+            continue
+        
+        payload, compression = compress(bytes(view[start:end]))
+        encrypted, iv = encrypt_data(payload, key)
+        pending[digest] = {
+            "user_id": user_id,
+            "digest": digest,
+            "data": encode_base64(encrypted),
+            "iv": encode_base64(iv),
+            "compression": compression,
+            "size": end - start,
+            "ref_count": 0
+        }
+        
+        if len(pending) >= CHUNK_FLUSH_BATCH:
+            _flush_chunks(db, user_id, pending, stored)
+    _flush_chunks(db, user_id, pending, stored)
+    
+    add_chunk_references(db, [stored[digest][0] for digest, _, _, _ in pieces])
+    
+    return [
+        [stored[digest][0], encode_base64(key), end - start, stored[digest][1]]
+        for digest, key, start, end in pieces
+    ]
+
+
+def _insert_new_chunks(db: Session):
+    # A concurrent upload may insert the same chunk between our lookup and
+    # this insert; skipping the conflicting row keeps the transaction alive
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return sql_insert(FileChunk)
+    return insert(FileChunk).on_conflict_do_nothing(index_elements=["user_id", "digest"])
+
+
+def _flush_chunks(db: Session, user_id: int, pending: dict, stored: dict):
+    # Write new chunks in one statement rather than through the session, so
+    # a large file's ciphertext isn't held until commit. Ids are read back
+    # afterwards, which also picks up chunks another upload inserted first;
+    # their references are added by the caller like any other chunk's.
+    if not pending:
+        return
+    db.execute(_insert_new_chunks(db), list(pending.values()))
+    for batch in _batches(list(pending), CHUNK_QUERY_BATCH):
+        rows = db.query(FileChunk.id, FileChunk.digest, FileChunk.compression).filter(
+            FileChunk.user_id == user_id,
+            FileChunk.digest.in_(batch)
+        )
+        for row in rows:
+            stored[row.digest] = (row.id, row.compression)
+    pending.clear()
+
+
+def _update_ref_counts(db: Session, chunk_ids: List[int], sign: int):
+    counts = Counter(chunk_ids)
+    by_count = {}
+    for chunk_id, count in counts.items():
+        by_count.setdefault(count, []).append(chunk_id)
+    
+    # Most chunks appear once per file, so this is usually one statement per batch
+    for count, ids in by_count.items():
+        for batch in _batches(ids, CHUNK_QUERY_BATCH):
+            db.query(FileChunk).filter(FileChunk.id.in_(batch)).update(
+                {FileChunk.ref_count: FileChunk.ref_count + sign * count},
+                synchronize_session=False
+            )
+
+
+def add_chunk_references(db: Session, chunk_ids: List[int]):
+    """Add one reference per entry in chunk_ids."""
+    _update_ref_counts(db, chunk_ids, 1)
+
+
+def release_chunks(db: Session, chunk_ids: List[int]):
+    """
+    Drop one reference per entry in chunk_ids and delete unreferenced chunks.
+    
+    The manifest that referenced them must already be deleted or replaced.
+    """
+    _update_ref_counts(db, chunk_ids, -1)
+    for batch in _batches(list(set(chunk_ids)), CHUNK_QUERY_BATCH):
+        db.query(FileChunk).filter(
+            FileChunk.id.in_(batch),
+            FileChunk.ref_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def dump_manifest(entries: list) -> bytes:
+    """Serialize manifest entries for encryption."""
+    return json.dumps({"version": MANIFEST_VERSION, "chunks": entries}).encode()
+
+
+def parse_manifest(manifest: bytes) -> list:
+    """
+    Parse a decrypted manifest.
+    
+    Returns:
+        List of [chunk id, Base64 chunk key, size, compression] in content order
+    
+    Raises:
+        ValueError: If the manifest is malformed or of an unknown version
+    """
+    data = json.loads(manifest.decode())
+    if data.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported chunk manifest version: {data.get('version')}")
+    return data["chunks"]
+
+
+def manifest_size(manifest: bytes) -> int:
+    """Plaintext size of chunked content."""
+    return sum(size for _, _, size, _ in parse_manifest(manifest))
+
+
+def chunk_merkle_root(entries: list) -> str:
+    """
+    Merkle root over the keys of manifest entries, as hex.
+    
+    A chunk key is an HMAC of the chunk's content, so the root commits to
+    the whole content and can be recomputed from the manifest alone.
+    """
+    return merkle_root([decode_base64(key_b64) for _, key_b64, _, _ in entries]).hex()
+
+
+def manifest_compressed(manifest: bytes) -> bool:
+    """Whether most of chunked content shrank when it was stored."""
+    entries = parse_manifest(manifest)
+    compressed = sum(size for _, _, size, compression in entries if compression is not None)
+    return compressed * 2 > sum(size for _, _, size, _ in entries)
+
+
+def iter_chunks(manifest: bytes, db: Optional[Session] = None) -> Iterator[bytes]:
+    """
+    Decrypt chunked content in order, a few chunks per query.
+    
+    Args:
+        manifest: Decrypted manifest
+        db: Session to read with. Without one, the iterator opens its own,
+            e.g. for responses that stream after the request's session closed
+    
+    Raises:
+        One of CHUNK_ERRORS: If a chunk is missing or fails authentication
+    """
+    yield from iter_chunk_entries(parse_manifest(manifest), db)
+
+
+def iter_chunk_entries(
+    entries: list,
+    db: Optional[Session] = None,
+    convergence_key: Optional[bytes] = None
+) -> Iterator[bytes]:
+    """
+    Decrypt the chunks of manifest entries in order, like iter_chunks.
+    
+    Args:
+        entries: Manifest entries, e.g. the part of a manifest an edit touches
+        db: Session to read with, or None for the iterator's own
+        convergence_key: Owner's convergence key. When given, each chunk's
+            key is recomputed from its content and must match the manifest
+    
+    Raises:
+        One of CHUNK_ERRORS: If a chunk is missing or fails authentication
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    
+    try:
+        for batch in _batches(entries, CHUNK_READ_BATCH):
+            rows = {
+                row.id: row
+                for row in db.query(FileChunk).filter(FileChunk.id.in_({entry[0] for entry in batch}))
+            }
+            for chunk_id, key_b64, size, _ in batch:
+                row = rows.get(chunk_id)
+                if row is None:
+                    raise ValueError(f"File chunk {chunk_id} is missing")
+                
+                # The key is derived from the content, so a swapped row fails the tag
+                payload = decrypt_data(decode_base64(row.data), decode_base64(key_b64), decode_base64(row.iv))
+                chunk = decompress(payload, row.compression)
+                if len(chunk) != size:
+                    raise ValueError(f"File chunk {chunk_id} has the wrong size")
+                if convergence_key is not None and not hmac.compare_digest(
+                    hmac.new(convergence_key, chunk, hashlib.sha256).digest(), decode_base64(key_b64)
+                ):
+                    raise ValueError(f"File chunk {chunk_id} doesn't match its key")
+                yield chunk
+            
+            # Chunks already sent shouldn't stay in the session's identity map
+            for row in rows.values():
+                db.expunge(row)
+    finally:
+        if own_session:
+            db.close()
+
+
+def chunk_store_stats(db: Session) -> dict:
+    """
+    Report deduplication across all vaults.
+    
+    Referenced bytes count every stored file version (a file shared with
+    teams counts once); unique bytes are what is actually stored.
+    """
+    chunks, unique_bytes, referenced_bytes = db.query(
+        func.count(FileChunk.id),
+        func.coalesce(func.sum(FileChunk.size), 0),
+        func.coalesce(func.sum(FileChunk.size * FileChunk.ref_count), 0)
+    ).one()
+    
+    return {
+        "chunks": chunks,
+        "unique_bytes": unique_bytes,
+        "referenced_bytes": referenced_bytes,
+        "dedup_ratio": round(referenced_bytes / unique_bytes, 4) if unique_bytes else 0.0
+    }
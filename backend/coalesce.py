@@ -0,0 +1,174 @@
+"""
+Single-flight coalescing for concurrent downloads.
+
+The first request for a key (the leader) decrypts the object once; requests
+that arrive while it is still being produced join the same flight and read
+its chunks from a shared buffer. Buffers are bounded by a global byte
+budget; objects that do not fit are served uncoalesced.
+"""
+import asyncio
+from typing import AsyncIterator, Hashable, Iterator, Optional
+
+from starlette.concurrency import iterate_in_threadpool
+
+
+class Flight:
+    """One in-progress production of an object, shared by its readers."""
+    
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.size: Optional[int] = None
+        self.shared = False
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.chunks = []
+        self.readers = 0
+        self.released = False
+        self._ready = asyncio.Event()
+        self._changed = asyncio.Condition()
+    
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+
+class SingleFlight:
+    """
+    Registry of in-flight downloads keyed by object identity and version.
+    
+    Meant to be used from a single event loop; no locking is needed.
+    """
+    
+    def __init__(self, max_buffer_bytes: int):
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffered_bytes = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self._flights = {}
+        self._producers = set()
+    
+    def join(self, key: Hashable) -> tuple[Flight, bool]:
+        """
+        Join the flight for key, starting one if none is in progress.
+        
+        Returns:
+            Tuple of (flight, is_leader)
+        """
+        self.requests += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            return flight, False
+        
+        flight = Flight(key)
+        self._flights[key] = flight
+        return flight, True
+    
+    async def follow(self, flight: Flight) -> bool:
+        """
+        Wait until a flight's leader knows whether the flight can be shared.
+        
+        Returns:
+            True if the flight's output can be read with stream(), False if
+            the caller must produce the object itself
+        
+        Raises:
+            Exception: The leader's error, if opening the object failed
+        """
+        await flight._ready.wait()
+        # A cancelled leader is not the followers' failure; they retry alone
+        if isinstance(flight.error, Exception) and not flight.shared:
+            raise flight.error
+        if flight.shared:
+            self.coalesced += 1
+        return flight.shared
+    
+    def fail(self, flight: Flight, error: BaseException):
+        """Abort a flight whose leader could not open the object."""
+        flight.error = error
+        flight.done = True
+        self._forget(flight)
+        flight._ready.set()
+    
+    def start(self, flight: Flight, chunks: Iterator[bytes], size: int) -> bool:
+        """
+        Start producing a flight's chunks in the background.
+        
+        The producer runs as its own task, so readers keep receiving data
+        even if the leader's client disconnects.
+        
+        Returns:
+            True if the flight is shared, False if it did not fit in the
+            buffer budget and the leader must stream chunks itself
+        """
+        flight.size = size
+        if self.buffered_bytes + size > self.max_buffer_bytes:
+            self.bypassed += 1
+            flight.done = True
+            self._forget(flight)
+            flight._ready.set()
+            return False
+        
+        self.buffered_bytes += size
+        flight.shared = True
+        flight._ready.set()
+        # Keep a reference so the task is not garbage collected mid-flight
+        task = asyncio.create_task(self._produce(flight, chunks))
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+        return True
+    
+    async def stream(self, flight: Flight) -> AsyncIterator[bytes]:
+        """Yield a shared flight's chunks from the start, waiting for new ones."""
+        flight.readers += 1
+        index = 0
+        try:
+            while True:
+                async with flight._changed:
+                    await flight._changed.wait_for(lambda: index < len(flight.chunks) or flight.done)
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done and index >= len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.readers -= 1
+            self._release(flight)
+    
+    def stats(self) -> dict:
+        """Return coalescing counters."""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "in_flight": len(self._flights),
+            "buffered_bytes": self.buffered_bytes,
+            "coalescing_ratio": round(self.coalesced / self.requests, 4) if self.requests else 0.0
+        }
+    
+    async def _produce(self, flight: Flight, chunks: Iterator[bytes]):
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                flight.chunks.append(chunk)
+                await flight._notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(flight)
+            await flight._notify()
+            self._release(flight)
+    
+    def _forget(self, flight: Flight):
+        # Later requests start a new flight once this one stops accepting readers
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+    
+    def _release(self, flight: Flight):
+        # The buffer stops counting against the budget once production is over
+        # and every reader is done; the chunks go when the last reference does
+        if flight.shared and flight.done and flight.readers == 0 and not flight.released:
+            flight.released = True
+            self.buffered_bytes -= flight.size
@@ -3,8 +3,14 @@ AES encryption utilities for file and data encryption.
 Uses AES-256-GCM for authenticated encryption.
 """
 import os
+from typing import Iterable, Iterator
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+# AESGCM appends a 16-byte authentication tag to the ciphertext
+GCM_TAG_SIZE = 16
+
 
 def generate_aes_key() -> bytes:
     """
@@ -26,7 +32,7 @@ def generate_iv() -> bytes:
     return os.urandom(12)
 
 
-def encrypt_data(data: bytes, key: bytes, iv: bytes = None) -> tuple[bytes, bytes]:
+def encrypt_data(data: bytes, key: bytes, iv: bytes = None, associated_data: bytes = None) -> tuple[bytes, bytes]:
     """
     Encrypt data using AES-256-GCM.
     
@@ -34,6 +40,7 @@ def encrypt_data(data: bytes, key: bytes, iv: bytes = None) -> tuple[bytes, byte
         data: Plain bytes to encrypt
         key: 32-byte AES key
         iv: Optional 12-byte IV (generated if not provided)
+        associated_data: Optional bytes authenticated but not encrypted
         
     Returns:
         Tuple of (encrypted_data, iv)
@@ -42,12 +49,12 @@ def encrypt_data(data: bytes, key: bytes, iv: bytes = None) -> tuple[bytes, byte
         iv = generate_iv()
     
     aesgcm = AESGCM(key)
-    encrypted = aesgcm.encrypt(iv, data, None)
+    encrypted = aesgcm.encrypt(iv, data, associated_data)
     
     return encrypted, iv
 
 
-def decrypt_data(encrypted_data: bytes, key: bytes, iv: bytes) -> bytes:
+def decrypt_data(encrypted_data: bytes, key: bytes, iv: bytes, associated_data: bytes = None) -> bytes:
     """
     Decrypt data using AES-256-GCM.
     
@@ -55,6 +62,7 @@ def decrypt_data(encrypted_data: bytes, key: bytes, iv: bytes) -> bytes:
         encrypted_data: Encrypted bytes (includes auth tag)
         key: 32-byte AES key
         iv: 12-byte IV used during encryption
+        associated_data: Associated data given at encryption time, if any
         
     Returns:
         Decrypted plain bytes
@@ -63,4 +71,39 @@ def decrypt_data(encrypted_data: bytes, key: bytes, iv: bytes) -> bytes:
         cryptography.exceptions.InvalidTag: If data was tampered with
     """
     aesgcm = AESGCM(key)
-    return aesgcm.decrypt(iv, encrypted_data, None)
+    return aesgcm.decrypt(iv, encrypted_data, associated_data)
+
+
+def decrypt_stream(encrypted_chunks: Iterable[bytes], key: bytes, iv: bytes) -> Iterator[bytes]:
+    """
+    Decrypt AES-256-GCM data produced by encrypt_data, one chunk at a time.
+    
+    The trailing tag is held back and checked once the last chunk is in.
+    Plaintext is yielded before that check, so callers must discard what
+    they received if the stream raises.
+    
+    Args:
+        encrypted_chunks: Pieces of the ciphertext (with its tag at the end)
+        key: 32-byte AES key
+        iv: 12-byte IV used during encryption
+        
+    Yields:
+        Decrypted plain bytes
+        
+    Raises:
+        cryptography.exceptions.InvalidTag: If data was tampered with
+    """
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+    pending = b""
+    
+    for chunk in encrypted_chunks:
+        pending += chunk
+        if len(pending) > GCM_TAG_SIZE:
+            plaintext = decryptor.update(pending[:-GCM_TAG_SIZE])
+            pending = pending[-GCM_TAG_SIZE:]
+            if plaintext:
+                yield plaintext
+    
+    if len(pending) < GCM_TAG_SIZE:
+        raise InvalidTag()
+    decryptor.finalize_with_tag(pending)
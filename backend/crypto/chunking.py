@@ -0,0 +1,111 @@
+"""
+Content-defined chunking for file deduplication.
+
+Chunk boundaries depend on the bytes around them, not on their offset, so
+an insert or edit only changes the chunks it touches and the rest of the
+file still matches chunks that are already stored.
+
+The boundary hash is a windowed tabulation hash (buzhash-style): every
+position's hash is the XOR of a per-offset table lookup of each byte in a
+16-byte window ending there. Instead of rolling it byte by byte in Python,
+the hash of a whole segment is computed at once with bytes.translate and
+big-integer XOR, and candidate cut points are found with bytes.find, so
+the scan runs at C speed. A position is a cut point when its hash and the
+next one are both zero (probability 1/65536).
+"""
+import hashlib
+import os
+from typing import Iterator
+
+WINDOW_SIZE = 16
+
+# Chunk size bounds; the average is about MIN_CHUNK_SIZE + 64 KiB
+MIN_CHUNK_SIZE = int(os.getenv("CHUNK_MIN_SIZE", str(16 * 1024)))
+MAX_CHUNK_SIZE = int(os.getenv("CHUNK_MAX_SIZE", str(256 * 1024)))
+
+# Bytes hashed per pass; bounds the temporary big integers
+SEGMENT_SIZE = 4 * 1024 * 1024
+
+CUT_PATTERN = b"\x00\x00"
+
+
+def _table(offset: int) -> bytes:
+    # Fixed pseudo-random byte table for one window offset. Boundaries must
+    # be identical across processes and releases, or stored chunks stop matching.
+    table = b""
+    counter = 0
+    while len(table) < 256:
+        table += hashlib.sha256(b"securevault-cdc:%d:%d" % (offset, counter)).digest()
+        counter += 1
+    return table[:256]
+
+
+TABLES = [_table(offset) for offset in range(WINDOW_SIZE)]
+
+
+def _window_hashes(data: bytes, start: int, end: int) -> bytes:
+    """
+    Hash the window ending at every position in data[start:end].
+    
+    Returns:
+        One hash byte per position
+    """
+    context = max(start - (WINDOW_SIZE - 1), 0)
+    segment = data[context:end]
+    
+    # Byte i of table j's translation, shifted right by j bytes, lines up
+    # with position i + j, so XORing the shifted copies hashes every window
+    value = 0
+    for offset, table in enumerate(TABLES):
+        value ^= int.from_bytes(segment.translate(table), "big") >> (8 * offset)
+    
+    return value.to_bytes(len(segment), "big")[start - context:]
+
+
+def chunk_boundaries(
+    data: bytes,
+    min_size: int = MIN_CHUNK_SIZE,
+    max_size: int = MAX_CHUNK_SIZE,
+    cut_pattern: bytes = CUT_PATTERN
+) -> Iterator[tuple]:
+    """
+    Split data into content-defined chunks.
+    
+    Args:
+        data: Bytes to split
+        min_size: Smallest chunk, except for the last one
+        max_size: Largest chunk; a cut is forced when no boundary is found
+        cut_pattern: Run of zero hash bytes that marks a boundary; each byte
+            makes boundaries 256 times rarer
+    
+    Yields:
+        (start, end) offsets of each chunk, covering data in order
+    """
+    size = len(data)
+    start = 0
+    hashes = b""
+    hashes_start = 0
+    
+    while start < size:
+        limit = min(start + max_size, size)
+        if limit - start <= min_size:
+            yield start, limit
+            return
+        
+        # Boundaries are never searched before min_size, so hashing starts there
+        search_start = start + min_size
+        if search_start < hashes_start or limit > hashes_start + len(hashes):
+            hashes_start = search_start
+            hashes = _window_hashes(data, search_start, min(search_start + max(SEGMENT_SIZE, max_size), size))
+        
+        index = hashes.find(cut_pattern, search_start - hashes_start, limit - hashes_start)
+        end = hashes_start + index + len(cut_pattern) if index >= 0 else limit
+        yield start, end
+        start = end
+
+
+def split_chunks(data: bytes) -> Iterator[bytes]:
+    """Yield the content-defined chunks of data."""
+    view = memoryview(data)
+    for start, end in chunk_boundaries(data):
+        yield bytes(view[start:end])
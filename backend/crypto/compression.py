@@ -0,0 +1,158 @@
+"""
+Adaptive compression applied before encryption.
+
+Compressed data can't be compressed after encryption, so text notes,
+JSON, CSVs and logs are compressed first. A sample of the data is
+compressed to skip inputs that don't shrink (JPEG, PDF, zip).
+"""
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+load_dotenv()
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+# Algorithm for new data: zstd, zlib or none
+COMPRESSION_ALGORITHM = os.getenv("COMPRESSION_ALGORITHM", ZLIB).lower()
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+# Data smaller than this is stored as-is
+MIN_COMPRESS_SIZE = 256
+# Size of the leading sample used to decide whether to compress
+SAMPLE_SIZE = 64 * 1024
+# Compress only if the sample shrinks to at most this fraction
+MAX_SAMPLE_RATIO = 0.9
+
+# Raised when a compressed payload is corrupt
+DECOMPRESSION_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+if COMPRESSION_ALGORITHM == ZSTD and zstandard is None:
+    print("[Compression] zstandard is not installed, falling back to zlib")
+    COMPRESSION_ALGORITHM = ZLIB
+
+
+def _compress_with(data: bytes, algorithm: str) -> bytes:
+    if algorithm == ZSTD:
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(data)
+    return zlib.compress(data, COMPRESSION_LEVEL)
+
+
+def compress(data: bytes) -> tuple[bytes, Optional[str]]:
+    """
+    Compress data with the configured algorithm if it is worth it.
+    
+    Args:
+        data: Plain bytes
+        
+    Returns:
+        Tuple of (payload, algorithm). Algorithm is None when the data
+        was left uncompressed.
+    """
+    algorithm = COMPRESSION_ALGORITHM
+    if algorithm not in (ZLIB, ZSTD) or len(data) < MIN_COMPRESS_SIZE:
+        return data, None
+    
+    # Already-compressed formats barely shrink, so test a sample first
+    sample = data[:SAMPLE_SIZE]
+    if len(_compress_with(sample, algorithm)) > len(sample) * MAX_SAMPLE_RATIO:
+        return data, None
+    
+    compressed = _compress_with(data, algorithm)
+    if len(compressed) >= len(data):
+        return data, None
+    return compressed, algorithm
+
+
+def decompress(data: bytes, algorithm: Optional[str]) -> bytes:
+    """
+    Reverse compress().
+    
+    Args:
+        data: Payload returned by compress()
+        algorithm: Algorithm recorded with the payload (None if uncompressed)
+        
+    Returns:
+        Original bytes
+    """
+    if algorithm is None:
+        return data
+    return b"".join(decompress_stream(data, algorithm))
+
+
+def decompress_stream(data: bytes, algorithm: Optional[str], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Decompress a payload incrementally.
+    
+    Yields output in pieces of roughly chunk_size bytes so the whole
+    plaintext never has to be held in memory at once.
+    """
+    if algorithm is None:
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+    
+    if algorithm == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read zstd-compressed data")
+        reader = zstandard.ZstdDecompressor().stream_reader(data)
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    
+    if algorithm != ZLIB:
+        raise ValueError(f"Unknown compression algorithm: {algorithm}")
+    
+    decompressor = zlib.decompressobj()
+    view = memoryview(data)
+    for start in range(0, len(data), chunk_size):
+        chunk = decompressor.decompress(view[start:start + chunk_size], chunk_size)
+        while chunk:
+            yield chunk
+            chunk = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def decompress_chunks(chunks: Iterable[bytes], algorithm: Optional[str], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Decompress a payload that arrives in pieces (e.g. from a streaming decrypt).
+    
+    Neither the compressed nor the decompressed payload is held in full.
+    """
+    if algorithm is None:
+        yield from chunks
+        return
+    
+    if algorithm == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read zstd-compressed data")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        for piece in chunks:
+            chunk = decompressor.decompress(piece)
+            if chunk:
+                yield chunk
+        return
+    
+    if algorithm != ZLIB:
+        raise ValueError(f"Unknown compression algorithm: {algorithm}")
+    
+    decompressor = zlib.decompressobj()
+    for piece in chunks:
+        chunk = decompressor.decompress(piece, chunk_size)
+        while chunk:
+            yield chunk
+            chunk = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
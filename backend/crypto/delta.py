@@ -0,0 +1,106 @@
+"""
+Binary deltas between versions of an item.
+
+Both versions are cut into small content-defined blocks (see chunking.py).
+Blocks of the target that also occur in the base become copy instructions
+and everything else is stored literally, like rsync with content-defined
+instead of fixed-size blocks: an insert or edit only costs the blocks
+around it, wherever it is. Deltas are compressed by the caller.
+"""
+import struct
+
+from crypto.chunking import chunk_boundaries
+
+# Blocks average about 300 bytes; smaller blocks find more matches but
+# produce more instructions
+DELTA_MIN_BLOCK = 32
+DELTA_MAX_BLOCK = 4096
+DELTA_CUT_PATTERN = b"\x00"
+
+DELTA_MAGIC = b"SVD1"
+_COPY = b"C"
+_INSERT = b"I"
+_COPY_HEADER = struct.Struct(">II")
+_INSERT_HEADER = struct.Struct(">I")
+
+
+def _blocks(data: bytes):
+    for start, end in chunk_boundaries(data, DELTA_MIN_BLOCK, DELTA_MAX_BLOCK, DELTA_CUT_PATTERN):
+        yield start, data[start:end]
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """
+    Encode target as copies from base plus literal bytes.
+    
+    Args:
+        base: Version the delta is applied to
+        target: Version the delta reproduces
+    
+    Returns:
+        Delta for apply_delta
+    """
+    index = {}
+    for start, block in _blocks(base):
+        index.setdefault(block, start)
+    
+    # Each instruction is [offset, length] for a copy or a bytearray literal
+    instructions = []
+    for _, block in _blocks(target):
+        offset = index.get(block)
+        previous = instructions[-1] if instructions else None
+        if offset is None:
+            if isinstance(previous, bytearray):
+                previous += block
+            else:
+                instructions.append(bytearray(block))
+        elif isinstance(previous, list) and previous[0] + previous[1] == offset:
+            previous[1] += len(block)
+        else:
+            instructions.append([offset, len(block)])
+    
+    parts = [DELTA_MAGIC]
+    for instruction in instructions:
+        if isinstance(instruction, list):
+            parts.append(_COPY + _COPY_HEADER.pack(*instruction))
+        else:
+            parts.append(_INSERT + _INSERT_HEADER.pack(len(instruction)))
+            parts.append(bytes(instruction))
+    return b"".join(parts)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """
+    Rebuild a version from its base and a delta made by make_delta.
+    
+    Raises:
+        ValueError: If the delta is malformed or doesn't fit the base
+    """
+    if not delta.startswith(DELTA_MAGIC):
+        raise ValueError("Not a version delta")
+    
+    output = []
+    position = len(DELTA_MAGIC)
+    try:
+        while position < len(delta):
+            opcode = delta[position:position + 1]
+            position += 1
+            if opcode == _COPY:
+                offset, length = _COPY_HEADER.unpack_from(delta, position)
+                position += _COPY_HEADER.size
+                if offset + length > len(base):
+                    raise ValueError("Delta copies past the end of its base")
+                output.append(base[offset:offset + length])
+            elif opcode == _INSERT:
+                (length,) = _INSERT_HEADER.unpack_from(delta, position)
+                position += _INSERT_HEADER.size
+                if position + length > len(delta):
+                    raise ValueError("Truncated delta")
+                output.append(delta[position:position + length])
+                position += length
+            else:
+                raise ValueError("Unknown delta instruction")
+    except struct.error:
+        raise ValueError("Truncated delta")
+    
+    return b"".join(output)
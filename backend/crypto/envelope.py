@@ -0,0 +1,208 @@
+"""
+Envelope encryption utilities.
+
+Each user has a random data-encryption key (DEK) that is stored wrapped
+by a server key-encryption key (KEK). Item keys are derived from the DEK
+with HKDF, so rotating the KEK only rewraps one DEK per user.
+
+Run `python -m crypto.envelope rotate` to rewrap every DEK and team key
+under the current KEK after changing VAULT_KEK.
+"""
+import os
+from functools import lru_cache
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
+from dotenv import load_dotenv
+
+from cache import TTLCache
+from crypto.encoding import encode_base64, decode_base64
+from crypto.rsa import KEYS_DIR
+
+load_dotenv()
+
+# Local keyfile used when VAULT_KEK is not configured
+KEK_PATH = os.path.join(KEYS_DIR, "kek.key")
+LOCAL_KEK_ID = "local"
+
+# Unwrapped DEKs are kept in memory briefly so one unwrap serves a whole request
+DEK_CACHE_TTL_SECONDS = int(os.getenv("DEK_CACHE_TTL_SECONDS", "300"))
+DEK_CACHE_SIZE = int(os.getenv("DEK_CACHE_SIZE", "1024"))
+
+# Rows rewrapped per commit by rotate_keks
+KEK_ROTATION_BATCH_SIZE = int(os.getenv("KEK_ROTATION_BATCH_SIZE", "500"))
+
+dek_cache = TTLCache(maxsize=DEK_CACHE_SIZE, ttl=DEK_CACHE_TTL_SECONDS)
+
+
+def generate_dek() -> bytes:
+    """
+    Generate a random 256-bit data-encryption key.
+    
+    Returns:
+        32 bytes random key
+    """
+    return os.urandom(32)
+
+
+def _load_local_kek() -> bytes:
+    """Load the local KEK keyfile, creating it on first use."""
+    if not os.path.exists(KEK_PATH):
+        os.makedirs(KEYS_DIR, exist_ok=True)
+        with open(KEK_PATH, "wb") as f:
+            f.write(os.urandom(32))
+    
+    with open(KEK_PATH, "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=1)
+def load_keks() -> tuple[str, dict]:
+    """
+    Load the current KEK and any previous KEKs kept for rotation.
+    The keys are read once per process.
+    
+    VAULT_KEK holds the current Base64 KEK (identified by VAULT_KEK_ID),
+    VAULT_KEK_PREVIOUS holds older ones as comma separated `id:base64` pairs.
+    Without VAULT_KEK, a local keyfile stands in for the server KEK.
+    
+    Returns:
+        Tuple of (current_kek_id, {kek_id: kek_bytes})
+    """
+    keks = {}
+    
+    for entry in filter(None, os.getenv("VAULT_KEK_PREVIOUS", "").split(",")):
+        kek_id, kek_b64 = entry.strip().split(":", 1)
+        keks[kek_id] = decode_base64(kek_b64)
+    
+    kek_b64 = os.getenv("VAULT_KEK")
+    if kek_b64:
+        current_id = os.getenv("VAULT_KEK_ID", "env")
+        keks[current_id] = decode_base64(kek_b64)
+    else:
+        current_id = LOCAL_KEK_ID
+        keks[current_id] = _load_local_kek()
+    
+    return current_id, keks
+
+
+def wrap_key(key: bytes, kek: bytes) -> str:
+    """
+    Wrap a key with AES key wrap (RFC 3394).
+    
+    Returns:
+        Base64 encoded wrapped key
+    """
+    return encode_base64(aes_key_wrap(kek, key))
+
+
+def unwrap_key(wrapped_b64: str, kek: bytes) -> bytes:
+    """
+    Unwrap a Base64 encoded key wrapped with wrap_key.
+    
+    Raises:
+        cryptography.hazmat.primitives.keywrap.InvalidUnwrap: If the KEK is wrong
+    """
+    return aes_key_unwrap(kek, decode_base64(wrapped_b64))
+
+
+def derive_item_key(dek: bytes, item_id: int, purpose: bytes = b"item") -> bytes:
+    """
+    Derive a per-item AES-256 key from a DEK with HKDF-SHA256.
+    
+    Args:
+        dek: User data-encryption key
+        item_id: Database id of the item the key belongs to
+        purpose: Domain separation label for different kinds of item
+        
+    Returns:
+        32-byte item key
+    """
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"securevault:" + purpose + b":" + str(item_id).encode()
+    ).derive(dek)
+
+
+def derive_convergence_key(dek: bytes) -> bytes:
+    """
+    Derive a user's convergence key from their DEK with HKDF-SHA256.
+    
+    File chunk keys are HMACs of the chunk content under this key, so equal
+    chunks get equal keys within one vault and unrelated keys across users.
+    
+    Returns:
+        32-byte convergence key
+    """
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"securevault:convergence"
+    ).derive(dek)
+
+
+def _rewrap_in_batches(db, model, wrapped_column, current_id: str, keks: dict) -> tuple[int, int]:
+    # Walks the rows by id, so rows whose KEK is missing are skipped rather than retried
+    rewrapped = skipped = 0
+    last_id = 0
+    while True:
+        rows = db.query(model).filter(
+            model.id > last_id,
+            wrapped_column.isnot(None),
+            model.kek_id != current_id
+        ).order_by(model.id).limit(KEK_ROTATION_BATCH_SIZE).all()
+        if not rows:
+            return rewrapped, skipped
+        
+        for row in rows:
+            if row.kek_id not in keks:
+                skipped += 1
+                continue
+            wrapped = getattr(row, wrapped_column.key)
+            setattr(row, wrapped_column.key, wrap_key(unwrap_key(wrapped, keks[row.kek_id]), keks[current_id]))
+            row.kek_id = current_id
+            rewrapped += 1
+        last_id = rows[-1].id
+        db.commit()
+
+
+def rotate_keks(db) -> dict:
+    """
+    Rewrap every user DEK and team key under the current KEK.
+    
+    Rows are rewrapped and committed in batches of KEK_ROTATION_BATCH_SIZE.
+    Keys wrapped by a KEK that is no longer configured can't be unwrapped
+    and are left as they are.
+    
+    Returns:
+        {"users", "teams"} rewrapped counts and "skipped" keys with an unknown KEK
+    """
+    from models import Team, User
+    
+    current_id, keks = load_keks()
+    users, skipped_users = _rewrap_in_batches(db, User, User.wrapped_dek, current_id, keks)
+    teams, skipped_teams = _rewrap_in_batches(db, Team, Team.wrapped_key, current_id, keks)
+    dek_cache.clear()
+    return {"users": users, "teams": teams, "skipped": skipped_users + skipped_teams}
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if sys.argv[1:] != ["rotate"]:
+        print("Usage: python -m crypto.envelope rotate")
+        sys.exit(1)
+    
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        result = rotate_keks(db)
+        print(f"Rewrapped {result['users']} user key(s) and {result['teams']} team key(s)")
+        if result["skipped"]:
+            print(f"Skipped {result['skipped']} key(s) wrapped by a KEK that is not configured")
+    finally:
+        db.close()
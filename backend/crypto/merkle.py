@@ -0,0 +1,83 @@
+"""
+SHA-256 Merkle trees.
+
+Leaves and inner nodes are hashed with different prefixes (as in RFC 6962),
+so a leaf can never be passed off as an inner node. An odd node at the end
+of a level is carried up to the next level unchanged.
+"""
+import hashlib
+from typing import List, Tuple
+
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(data: bytes) -> bytes:
+    """Hash a leaf value."""
+    return hashlib.sha256(_LEAF_PREFIX + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """Hash two child nodes into their parent."""
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def merkle_root(leaves: List[bytes]) -> bytes:
+    """
+    Compute the Merkle root of a list of leaf values.
+    
+    Args:
+        leaves: Leaf values in order (hashed with leaf_hash)
+        
+    Returns:
+        32-byte root; the hash of no data for an empty list
+    """
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    
+    level = [leaf_hash(leaf) for leaf in leaves]
+    while len(level) > 1:
+        level = _parent_level(level)
+    return level[0]
+
+
+def merkle_proofs(leaves: List[bytes]) -> Tuple[bytes, List[list]]:
+    """
+    Compute the Merkle root of leaf values and an inclusion proof for each.
+    
+    Args:
+        leaves: Leaf values in order (at least one)
+        
+    Returns:
+        Tuple of (32-byte root, proofs). Each proof lists the sibling hashes
+        from the leaf up as ("L" or "R", hash), the side the sibling is on.
+    """
+    level = [leaf_hash(leaf) for leaf in leaves]
+    # Index of each leaf's ancestor in the current level
+    positions = list(range(len(leaves)))
+    proofs = [[] for _ in leaves]
+    
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append(("L" if sibling < position else "R", level[sibling]))
+            positions[leaf] = position // 2
+        level = _parent_level(level)
+    
+    return level[0], proofs
+
+
+def root_from_proof(leaf: bytes, proof: List[tuple]) -> bytes:
+    """Recompute the Merkle root from a leaf value and its inclusion proof."""
+    node = leaf_hash(leaf)
+    for side, sibling in proof:
+        node = node_hash(sibling, node) if side == "L" else node_hash(node, sibling)
+    return node
+
+
+def _parent_level(level: List[bytes]) -> List[bytes]:
+    parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
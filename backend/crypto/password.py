@@ -1,24 +1,128 @@
 """
-Password hashing utilities using bcrypt.
-Implements secure password storage with salt.
+Password hashing utilities.
+
+New hashes use Argon2id with the cost set by ARGON2_MEMORY_KIB,
+ARGON2_ITERATIONS and ARGON2_PARALLELISM, stored as PHC strings
+($argon2id$v=19$m=...,t=...,p=...$salt$hash). bcrypt hashes from before
+Argon2id still verify, and needs_rehash tells the login route when a
+hash should be replaced because the algorithm or its cost has changed.
+
+Run `python -m crypto.password calibrate [target_ms]` to find Argon2id
+parameters that take about target_ms on this host.
 """
+import base64
+import os
+import time
 import bcrypt
+from dotenv import load_dotenv
+
+try:
+    from cryptography.exceptions import InvalidKey, UnsupportedAlgorithm
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:  # Needs cryptography 44 or newer
+    Argon2id = None
+
+load_dotenv()
+
+ARGON2ID = "argon2id"
+BCRYPT = "bcrypt"
+
+# Algorithm for new hashes: argon2id or bcrypt
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", ARGON2ID).lower()
+
+# Argon2id cost; the defaults are the OWASP minimum (19 MiB, 2 passes, 1 lane)
+ARGON2_MEMORY_KIB = int(os.getenv("ARGON2_MEMORY_KIB", "19456"))
+ARGON2_ITERATIONS = int(os.getenv("ARGON2_ITERATIONS", "2"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+ARGON2_SALT_SIZE = 16
+ARGON2_HASH_SIZE = 32
+ARGON2_VERSION = 19
+
+if PASSWORD_HASH_ALGORITHM == ARGON2ID and Argon2id is None:
+    print("[Password] Argon2id needs cryptography 44 or newer, falling back to bcrypt")
+    PASSWORD_HASH_ALGORITHM = BCRYPT
+
+
+def _b64encode(data: bytes) -> str:
+    # PHC strings use unpadded standard Base64
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _argon2(salt: bytes, memory_kib: int, iterations: int, parallelism: int, length: int) -> Argon2id:
+    return Argon2id(
+        salt=salt,
+        length=length,
+        iterations=iterations,
+        lanes=parallelism,
+        memory_cost=memory_kib
+    )
+
+
+def parse_argon2_hash(hashed_password: str) -> tuple[dict, bytes, bytes]:
+    """
+    Split an Argon2id PHC string into its parameters, salt and hash.
+    
+    Returns:
+        Tuple of ({"m": memory_kib, "t": iterations, "p": parallelism}, salt, hash)
+    
+    Raises:
+        ValueError: If the string is not a version 19 Argon2id hash
+    """
+    parts = hashed_password.split("$")
+    if len(parts) != 6 or parts[1] != ARGON2ID or parts[2] != f"v={ARGON2_VERSION}":
+        raise ValueError("Not an Argon2id hash")
+    
+    try:
+        params = dict(param.split("=", 1) for param in parts[3].split(","))
+        params = {name: int(params[name]) for name in ("m", "t", "p")}
+    except (KeyError, ValueError):
+        raise ValueError("Malformed Argon2id parameters")
+    return params, _b64decode(parts[4]), _b64decode(parts[5])
+
+
+def _hash_bcrypt(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
 def hash_password(password: str) -> str:
     """
-    Hash a password using bcrypt with automatic salt generation.
+    Hash a password with the configured algorithm and a random salt.
+    
+    Switches to bcrypt for good if the OpenSSL in use can't run Argon2id.
     
     Args:
         password: Plain text password
-        
+    
     Returns:
-        Hashed password string (includes salt)
+        Hashed password string (includes algorithm, cost and salt)
     """
-    # Generate salt and hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    global PASSWORD_HASH_ALGORITHM
+    
+    if PASSWORD_HASH_ALGORITHM == BCRYPT:
+        return _hash_bcrypt(password)
+    
+    salt = os.urandom(ARGON2_SALT_SIZE)
+    try:
+        digest = _argon2(
+            salt, ARGON2_MEMORY_KIB, ARGON2_ITERATIONS, ARGON2_PARALLELISM, ARGON2_HASH_SIZE
+        ).derive(password.encode('utf-8'))
+    except UnsupportedAlgorithm:
+        # cryptography exposes Argon2id even when its OpenSSL build lacks it
+        print("[Password] Argon2id is not supported by this OpenSSL, falling back to bcrypt")
+        PASSWORD_HASH_ALGORITHM = BCRYPT
+        return _hash_bcrypt(password)
+    return (
+        f"${ARGON2ID}$v={ARGON2_VERSION}"
+        f"$m={ARGON2_MEMORY_KIB},t={ARGON2_ITERATIONS},p={ARGON2_PARALLELISM}"
+        f"${_b64encode(salt)}${_b64encode(digest)}"
+    )
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -27,12 +131,100 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     
     Args:
         plain_password: Plain text password to verify
-        hashed_password: Stored hashed password
-        
+        hashed_password: Stored Argon2id or bcrypt hash
+    
     Returns:
         True if password matches, False otherwise
     """
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'),
-        hashed_password.encode('utf-8')
+    if hashed_password.startswith(f"${ARGON2ID}$"):
+        if Argon2id is None:
+            return False
+        try:
+            params, salt, digest = parse_argon2_hash(hashed_password)
+            _argon2(salt, params["m"], params["t"], params["p"], len(digest)).verify(
+                plain_password.encode('utf-8'), digest
+            )
+            return True
+        except (InvalidKey, ValueError, UnsupportedAlgorithm):
+            return False
+    
+    try:
+        return bcrypt.checkpw(
+            plain_password.encode('utf-8'),
+            hashed_password.encode('utf-8')
+        )
+    except ValueError:
+        return False  # Not a bcrypt hash either
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a verified hash should be replaced with hash_password.
+    
+    True when the hash uses another algorithm or different cost parameters
+    than the current configuration.
+    """
+    if PASSWORD_HASH_ALGORITHM == BCRYPT:
+        try:
+            return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+        except (IndexError, ValueError):
+            return True
+    
+    try:
+        params, _, digest = parse_argon2_hash(hashed_password)
+    except ValueError:
+        return True
+    return (
+        params != {"m": ARGON2_MEMORY_KIB, "t": ARGON2_ITERATIONS, "p": ARGON2_PARALLELISM}
+        or len(digest) != ARGON2_HASH_SIZE
     )
+
+
+def calibrate(target_ms: float, max_memory_kib: int = 65536, parallelism: int = ARGON2_PARALLELISM) -> dict:
+    """
+    Pick Argon2id parameters that take about target_ms to hash on this host.
+    
+    Memory is the main cost, so it is raised first (up to max_memory_kib)
+    and then passes are added until a hash takes at least target_ms.
+    
+    Returns:
+        {"memory_kib", "iterations", "parallelism", "ms"} of the chosen parameters
+    """
+    def measure(memory_kib: int, iterations: int) -> float:
+        start = time.perf_counter()
+        _argon2(os.urandom(ARGON2_SALT_SIZE), memory_kib, iterations, parallelism, ARGON2_HASH_SIZE).derive(
+            b"calibration password"
+        )
+        return (time.perf_counter() - start) * 1000
+    
+    # Argon2 needs at least 8 KiB per lane
+    memory_kib = max(8 * parallelism, 8192)
+    iterations = 1
+    elapsed = measure(memory_kib, iterations)
+    while memory_kib * 2 <= max_memory_kib and elapsed * 2 <= target_ms:
+        memory_kib *= 2
+        elapsed = measure(memory_kib, iterations)
+    
+    while elapsed < target_ms:
+        iterations += 1
+        elapsed = measure(memory_kib, iterations)
+    
+    return {"memory_kib": memory_kib, "iterations": iterations, "parallelism": parallelism, "ms": elapsed}
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if sys.argv[1:2] != ["calibrate"] or len(sys.argv) > 3:
+        print("Usage: python -m crypto.password calibrate [target_ms]")
+        sys.exit(1)
+    if Argon2id is None:
+        print("Argon2id needs cryptography 44 or newer")
+        sys.exit(1)
+    
+    target_ms = float(sys.argv[2]) if len(sys.argv) == 3 else 250.0
+    result = calibrate(target_ms)
+    print(f"Argon2id took {result['ms']:.0f} ms (target {target_ms:.0f} ms); add to .env:")
+    print(f"ARGON2_MEMORY_KIB={result['memory_kib']}")
+    print(f"ARGON2_ITERATIONS={result['iterations']}")
+    print(f"ARGON2_PARALLELISM={result['parallelism']}")
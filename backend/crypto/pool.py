@@ -0,0 +1,36 @@
+"""
+Shared thread pool for CPU-bound crypto work.
+AES-GCM and RSA operations in `cryptography` release the GIL,
+so running them on worker threads uses multiple cores.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of crypto worker threads (defaults to the number of cores)
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS") or os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_crypto_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide crypto thread pool, creating it on first use.
+    
+    Returns:
+        Shared ThreadPoolExecutor
+    """
+    global _executor
+    
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=CRYPTO_WORKERS,
+                    thread_name_prefix="crypto"
+                )
+    return _executor
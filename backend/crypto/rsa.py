@@ -3,6 +3,7 @@ RSA utilities for digital signatures and key exchange.
 Uses RSA-2048 with PSS padding for signatures.
 """
 import os
+from functools import lru_cache
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.backends import default_backend
@@ -52,9 +53,11 @@ def save_keys(private_key, public_key):
         ))
 
 
+@lru_cache(maxsize=1)
 def load_private_key():
     """
     Load the private key from file, or generate if not exists.
+    The parsed key is cached for the lifetime of the process.
     
     Returns:
         RSA private key object
@@ -72,9 +75,11 @@ def load_private_key():
         )
 
 
+@lru_cache(maxsize=1)
 def load_public_key():
     """
     Load the public key from file, or generate if not exists.
+    The parsed key is cached for the lifetime of the process.
     
     Returns:
         RSA public key object
@@ -0,0 +1,229 @@
+"""
+Digital signatures over item hashes.
+
+New signatures use the algorithm chosen by SIGNATURE_ALGORITHM: Ed25519
+(the default), ECDSA P-256 or RSA-2048 PSS. Items store the algorithm and
+key id next to their signature, so anything signed before the algorithm
+or key changed still verifies. Rows without an algorithm were signed with
+RSA-PSS by crypto.rsa before it was recorded.
+
+Ed25519 and ECDSA keys live in the keys directory as signing_<algorithm>.pem
+and are created on first use; RSA-PSS keeps using the keys from crypto.rsa.
+Every other signing_*.pem file there (e.g. a key renamed when it was
+replaced) is only used to verify.
+"""
+import glob
+import hashlib
+import os
+from functools import lru_cache
+from typing import Optional
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+from dotenv import load_dotenv
+
+from crypto.rsa import KEYS_DIR, PUBLIC_KEY_PATH, load_private_key as load_rsa_private_key
+from crypto.rsa import verify_signature as verify_rsa_signature
+
+load_dotenv()
+
+ED25519 = "ed25519"
+ECDSA_P256 = "ecdsa-p256"
+RSA_PSS = "rsa-pss"
+ALGORITHMS = (ED25519, ECDSA_P256, RSA_PSS)
+
+# Name and digest of each algorithm, as reported by /security-info
+ALGORITHM_DESCRIPTIONS = {
+    ED25519: {"algorithm": "Ed25519", "hash": "SHA-512 (built into Ed25519)"},
+    ECDSA_P256: {"algorithm": "ECDSA P-256", "hash": "SHA-256"},
+    RSA_PSS: {"algorithm": "RSA-2048 with PSS padding", "hash": "SHA-256"}
+}
+
+# Algorithm for new signatures
+SIGNATURE_ALGORITHM = os.getenv("SIGNATURE_ALGORITHM", ED25519).lower()
+
+# Same parameters as crypto.rsa, so RSA keys verify signatures from either
+_PSS_PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+if SIGNATURE_ALGORITHM not in ALGORITHMS:
+    print(f"[Signing] Unknown signature algorithm {SIGNATURE_ALGORITHM}, falling back to {ED25519}")
+    SIGNATURE_ALGORITHM = ED25519
+
+
+def generate_private_key(algorithm: str):
+    """
+    Generate a new private key for a signature algorithm.
+    
+    Raises:
+        ValueError: If the algorithm is not supported
+    """
+    if algorithm == ED25519:
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == ECDSA_P256:
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == RSA_PSS:
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unknown signature algorithm: {algorithm}")
+
+
+def key_algorithm(public_key) -> str:
+    """
+    Get the signature algorithm a public key is used with.
+    
+    Raises:
+        ValueError: If the key type is not supported
+    """
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return ED25519
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and isinstance(public_key.curve, ec.SECP256R1):
+        return ECDSA_P256
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return RSA_PSS
+    raise ValueError("Unsupported signing key type")
+
+
+def key_id(public_key) -> str:
+    """Identify a public key by the start of its SHA-256 fingerprint."""
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return hashlib.sha256(der).hexdigest()[:16]
+
+
+class Verifier:
+    """Checks signatures made with one key."""
+    
+    def __init__(self, public_key):
+        self.public_key = public_key
+        self.algorithm = key_algorithm(public_key)
+        self.key_id = key_id(public_key)
+    
+    def verify(self, data: bytes, signature: bytes) -> bool:
+        """
+        Verify a signature over data.
+        
+        Returns:
+            True if signature is valid, False otherwise
+        """
+        try:
+            if self.algorithm == ED25519:
+                self.public_key.verify(signature, data)
+            elif self.algorithm == ECDSA_P256:
+                self.public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+            else:
+                self.public_key.verify(signature, data, _PSS_PADDING, hashes.SHA256())
+            return True
+        except (InvalidSignature, ValueError):
+            return False
+
+
+class Signer(Verifier):
+    """Signs with one private key and verifies its own signatures."""
+    
+    def __init__(self, private_key):
+        super().__init__(private_key.public_key())
+        self.private_key = private_key
+    
+    def sign(self, data: bytes) -> bytes:
+        """Sign data (SHA-256 for ECDSA and RSA-PSS)."""
+        if self.algorithm == ED25519:
+            return self.private_key.sign(data)
+        if self.algorithm == ECDSA_P256:
+            return self.private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+        return self.private_key.sign(data, _PSS_PADDING, hashes.SHA256())
+
+
+def _key_path(algorithm: str) -> str:
+    return os.path.join(KEYS_DIR, f"signing_{algorithm}.pem")
+
+
+@lru_cache(maxsize=1)
+def current_signer() -> Signer:
+    """
+    Load the signing key for SIGNATURE_ALGORITHM, or generate if not exists.
+    The key is read once per process.
+    """
+    if SIGNATURE_ALGORITHM == RSA_PSS:
+        return Signer(load_rsa_private_key())
+    
+    path = _key_path(SIGNATURE_ALGORITHM)
+    if not os.path.exists(path):
+        os.makedirs(KEYS_DIR, exist_ok=True)
+        private_key = generate_private_key(SIGNATURE_ALGORITHM)
+        with open(path, "wb") as f:
+            f.write(private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            ))
+        return Signer(private_key)
+    
+    with open(path, "rb") as f:
+        return Signer(serialization.load_pem_private_key(f.read(), password=None))
+
+
+@lru_cache(maxsize=1)
+def load_verifiers() -> dict:
+    """
+    Load every key signatures can be checked with: the current signing key,
+    the other signing_*.pem keys and the RSA public key.
+    The keys are read once per process.
+    
+    Returns:
+        {(algorithm, key_id): Verifier}
+    """
+    signer = current_signer()
+    verifiers = {(signer.algorithm, signer.key_id): signer}
+    
+    paths = sorted(glob.glob(os.path.join(KEYS_DIR, "signing_*.pem")))
+    if os.path.exists(PUBLIC_KEY_PATH):
+        paths.append(PUBLIC_KEY_PATH)
+    
+    for path in paths:
+        with open(path, "rb") as f:
+            pem = f.read()
+        if b"PRIVATE KEY" in pem:
+            public_key = serialization.load_pem_private_key(pem, password=None).public_key()
+        else:
+            public_key = serialization.load_pem_public_key(pem)
+        verifier = Verifier(public_key)
+        verifiers.setdefault((verifier.algorithm, verifier.key_id), verifier)
+    
+    return verifiers
+
+
+def create_signature(data: bytes) -> tuple[str, str, bytes]:
+    """
+    Sign data with the current signing key.
+    
+    Returns:
+        Tuple of (algorithm, key_id, signature) to store together
+    """
+    signer = current_signer()
+    return signer.algorithm, signer.key_id, signer.sign(data)
+
+
+def verify_signature(
+    data: bytes,
+    signature: bytes,
+    algorithm: Optional[str] = None,
+    key_id: Optional[str] = None
+) -> bool:
+    """
+    Verify a signature made by create_signature (or by crypto.rsa).
+    
+    Args:
+        data: Original data bytes
+        signature: Signature bytes to verify
+        algorithm: Algorithm stored with the signature, None for legacy RSA-PSS
+        key_id: Key id stored with the signature
+    
+    Returns:
+        True if signature is valid, False otherwise (also for unknown keys)
+    """
+    if algorithm is None:
+        return verify_rsa_signature(data, signature)
+    
+    verifier = load_verifiers().get((algorithm, key_id))
+    return verifier is not None and verifier.verify(data, signature)
@@ -2,22 +2,50 @@
 SecureVault - FastAPI Backend
 Main application entry point.
 """
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.orm import Session
 
-from database import engine, Base
-from routes import auth, vault, utils, teams
+from admission import AdmissionMiddleware, admission_stats
+from chunkstore import chunk_store_stats
+from database import engine, Base, get_db
+from models import UserRole
+from notifications import notifier
+from auth.jwt import require_role, revocation_list
+from auth.sessions import session_store
+from auth.tokens import token_store
+from crypto.envelope import dek_cache
+from crypto.signing import ALGORITHM_DESCRIPTIONS, SIGNATURE_ALGORITHM
+from ratelimit import rate_limit_stats
+from routes import auth, vault, utils, teams, uploads
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background maintenance tasks and notification workers while the app is up."""
+    sweeper = asyncio.create_task(uploads.run_upload_sweeper())
+    notifier.start()
+    yield
+    sweeper.cancel()
+    await notifier.stop()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SecureVault API",
     description="Secure digital vault for storing passwords and files with encryption, hashing, and digital signatures.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Added before CORS so shed requests still get CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -29,6 +57,7 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router)
 app.include_router(vault.router)
+app.include_router(uploads.router)
 app.include_router(utils.router)
 app.include_router(teams.router)
 
@@ -49,6 +78,29 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", dependencies=[Depends(require_role(UserRole.ADMIN.value))])
+async def metrics(db: Session = Depends(get_db)):
+    """
+    Runtime metrics for operators.
+    Admin only.
+    """
+    return {
+        "admission": admission_stats(),
+        "rate_limits": rate_limit_stats(),
+        "sessions": session_store.stats(),
+        "revoked_tokens": revocation_list.stats(),
+        "one_time_codes": token_store.stats(),
+        "notifications": notifier.stats(),
+        "download_coalescing": teams.download_flights.stats(),
+        "file_deduplication": chunk_store_stats(db),
+        "caches": {
+            "team_roles": teams.team_role_cache.stats(),
+            "verified_content": teams.verified_content_cache.stats(),
+            "encryption_keys": dek_cache.stats()
+        }
+    }
+
+
 # Security info endpoint for demonstration
 @app.get("/security-info")
 async def security_info():
@@ -59,7 +111,7 @@ async def security_info():
     return {
         "authentication": {
             "method": "Username + Password + OTP (Multi-Factor)",
-            "password_storage": "bcrypt with salt",
+            "password_storage": "Argon2id with salt (bcrypt fallback), rehashed on login when the cost changes",
             "session": "JWT tokens"
         },
         "authorization": {
@@ -69,15 +121,15 @@ async def security_info():
         "encryption": {
             "algorithm": "AES-256-GCM",
             "key_size": "256 bits",
-            "mode": "Galois/Counter Mode (authenticated encryption)"
+            "mode": "Galois/Counter Mode (authenticated encryption)",
+            "key_management": "Per-user DEK wrapped by a server KEK, per-item keys derived with HKDF-SHA256"
         },
         "hashing": {
-            "passwords": "bcrypt with salt",
+            "passwords": "Argon2id (bcrypt where unavailable; older bcrypt hashes upgraded on login)",
             "integrity": "SHA-256"
         },
         "digital_signatures": {
-            "algorithm": "RSA-2048 with PSS padding",
-            "hash": "SHA-256",
+            **ALGORITHM_DESCRIPTIONS[SIGNATURE_ALGORITHM],
             "purpose": "Tamper detection and authenticity verification"
         },
         "encoding": {
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Text, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -15,19 +15,70 @@ class UserRole(str, enum.Enum):
 class User(Base):
     """User model for authentication."""
     __tablename__ = "users"
+    # Tokens and caches are keyed by user id, so a deleted user's id must never be reused
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     role = Column(String(20), default=UserRole.USER.value)
-    otp = Column(String(6), nullable=True)
-    otp_expiry = Column(DateTime, nullable=True)
-    reset_token = Column(String(6), nullable=True)  # For password reset
-    reset_token_expiry = Column(DateTime, nullable=True)
+    wrapped_dek = Column(Text, nullable=True)  # Base64 data-encryption key wrapped by the server KEK
+    kek_id = Column(String(50), nullable=True)  # Which KEK wrapped the DEK
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    # Relationship to vault items
-    vault_items = relationship("VaultItem", back_populates="owner")
+    # Relationship to vault items (rows are removed by ON DELETE CASCADE)
+    vault_items = relationship("VaultItem", back_populates="owner", passive_deletes=True)
+
+
+class EphemeralToken(Base):
+    """One-time code (OTP or reset token) kept by the database token store."""
+    __tablename__ = "ephemeral_tokens"
+    __table_args__ = (UniqueConstraint("purpose", "subject"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    purpose = Column(String(20), nullable=False)  # e.g. "register" or "reset"
+    subject = Column(String(255), nullable=False)  # Who the code was issued to (user id)
+    code_hash = Column(String(64), nullable=False)  # SHA-256 of the code
+    attempts = Column(Integer, nullable=False, default=0)  # Failed verifications so far
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class AuthSession(Base):
+    """Opaque access/refresh token pair issued in session auth mode."""
+    __tablename__ = "auth_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)  # SHA-256 of the access token
+    refresh_hash = Column(String(64), unique=True, nullable=False)  # SHA-256 of the refresh token
+    expires_at = Column(DateTime, nullable=False)  # When the access token expires
+    refresh_expires_at = Column(DateTime, nullable=False, index=True)  # When the session can no longer be refreshed
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RevokedToken(Base):
+    """Revoked JWT (jti set) or "sign out everywhere" cutoff for a user (jti NULL)."""
+    __tablename__ = "revoked_tokens"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, nullable=True)  # Token id, NULL for a user-wide cutoff
+    # No foreign key: revocations must outlive a deleted user until they expire
+    user_id = Column(Integer, nullable=False)
+    revoked_at = Column(DateTime, nullable=False, index=True)  # Cutoffs reject tokens issued up to this time
+    expires_at = Column(DateTime, nullable=False, index=True)  # When every token this row rejects has expired
+
+
+class KeyScheme(str, enum.Enum):
+    """How a vault item's AES key is stored."""
+    RAW = "raw"  # Base64 key stored in encryption_key (legacy rows)
+    USER_DEK = "user-dek"  # Derived from the owner's DEK and the item id
+
+
+class ContentLayout(str, enum.Enum):
+    """How an item's content is stored."""
+    INLINE = "inline"  # The ciphertext is the whole content (NULL for older rows)
+    CHUNKED = "chunked"  # The ciphertext is a manifest of deduplicated FileChunks
 
 
 class VaultItemType(str, enum.Enum):
@@ -40,21 +91,105 @@ class VaultItemType(str, enum.Enum):
 class VaultItem(Base):
     """Vault item model for storing encrypted data."""
     __tablename__ = "vault_items"
+    # Item keys are derived from the id, so a deleted item's id must never be reused
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     type = Column(String(20), nullable=False)  # password or file
     name = Column(String(255), nullable=False)  # item name/label
     encrypted_data = Column(Text, nullable=False)  # Base64 encoded encrypted data
-    encryption_key = Column(Text, nullable=False)  # Base64 encoded AES key (encrypted with master key)
+    encryption_key = Column(Text, nullable=False)  # Base64 AES key for raw rows, empty when derived
+    key_scheme = Column(String(20), nullable=True)  # KeyScheme value, NULL for legacy raw keys
     iv = Column(Text, nullable=False)  # Base64 encoded initialization vector
+    compression = Column(String(10), nullable=True)  # Algorithm applied before encryption, NULL if none
     hash = Column(String(64), nullable=False)  # SHA-256 hash for integrity
-    signature = Column(Text, nullable=False)  # RSA signature for authenticity
+    signature = Column(Text, nullable=False)  # Signature over the hash for authenticity
+    signature_algorithm = Column(String(20), nullable=True)  # crypto.signing algorithm, NULL for legacy RSA-PSS
+    signature_key_id = Column(String(50), nullable=True)  # Which signing key made the signature
+    signature_proof = Column(Text, nullable=True)  # JSON Merkle proof when the signature covers a batch
     file_name = Column(String(255), nullable=True)  # Original filename for files
+    display_data = Column(Text, nullable=True)  # Base64 encrypted display metadata (passwords)
+    display_iv = Column(Text, nullable=True)  # Base64 IV for display metadata
+    blob_id = Column(Integer, ForeignKey("encrypted_blobs.id"), nullable=True)  # Set once the file is shared
+    layout = Column(String(10), nullable=True)  # ContentLayout value, NULL for inline content
+    chunk_refs = Column(Text, nullable=True)  # JSON ids of the FileChunks a chunked manifest references
+    version = Column(Integer, nullable=True, default=1)  # Current version number, NULL for rows older than history
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True)  # When the content was last replaced
 
     # Relationship to user
     owner = relationship("User", back_populates="vault_items")
+    blob = relationship("EncryptedBlob")
+
+
+class VersionStorage(str, enum.Enum):
+    """How a previous version of an item is stored."""
+    SNAPSHOT = "snapshot"  # Full content
+    DELTA = "delta"  # Binary delta against the next newer version
+    CHUNKED = "chunked"  # Manifest of deduplicated FileChunks
+
+
+class VaultItemVersion(Base):
+    """
+    Previous version of a vault item's content.
+
+    Versions are reverse deltas: each one is stored against its successor,
+    so the current content stays whole in the item, the oldest versions can
+    be pruned freely, and snapshots bound how far back a restore must go.
+    """
+    __tablename__ = "vault_item_versions"
+    __table_args__ = (UniqueConstraint("item_id", "version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("vault_items.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    name = Column(String(255), nullable=False)
+    file_name = Column(String(255), nullable=True)
+    storage = Column(String(10), nullable=False)  # VersionStorage value
+    encrypted_data = Column(Text, nullable=False)  # Base64 AES-GCM ciphertext of the snapshot, delta or manifest
+    iv = Column(Text, nullable=False)
+    compression = Column(String(10), nullable=True)
+    chunk_refs = Column(Text, nullable=True)  # JSON FileChunk ids, for chunked versions
+    size = Column(Integer, nullable=False)  # Plaintext length of the version
+    hash = Column(String(64), nullable=False)  # SHA-256 of the version's content
+    created_at = Column(DateTime, nullable=False)  # When this version was written
+
+
+class EncryptedBlob(Base):
+    """
+    Ciphertext shared by reference between a vault item and its team shares.
+    Freed when the last reference is released.
+    """
+    __tablename__ = "encrypted_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    data = Column(Text, nullable=False)  # Base64 encoded encrypted data
+    chunk_refs = Column(Text, nullable=True)  # Moved here from the vault item with its manifest
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FileChunk(Base):
+    """
+    Deduplicated piece of a user's file content.
+
+    Encrypted with a key derived from its own content (per-user keyed
+    convergent encryption), so a chunk that appears in several files or
+    versions is stored once. Freed when no manifest references it.
+    """
+    __tablename__ = "file_chunks"
+    __table_args__ = (UniqueConstraint("user_id", "digest"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    digest = Column(String(64), nullable=False)  # SHA-256 of the chunk key, identifies equal content
+    data = Column(Text, nullable=False)  # Base64 AES-GCM ciphertext
+    iv = Column(Text, nullable=False)
+    compression = Column(String(10), nullable=True)
+    size = Column(Integer, nullable=False)  # Plaintext length
+    ref_count = Column(Integer, nullable=False, default=1)  # Manifests referencing the chunk
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class TeamRole(str, enum.Enum):
@@ -71,12 +206,20 @@ class Team(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     description = Column(String(255), nullable=True)
-    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    wrapped_key = Column(Text, nullable=True)  # Base64 team key wrapped by the server KEK
+    kek_id = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    # Relationships
-    members = relationship("TeamMember", back_populates="team", cascade="all, delete-orphan")
-    shared_items = relationship("SharedVaultItem", back_populates="team", cascade="all, delete-orphan")
+    # Relationships (children are removed by ON DELETE CASCADE, never loaded for deletion)
+    members = relationship("TeamMember", back_populates="team", cascade="all, delete-orphan", passive_deletes=True)
+    shared_items = relationship("SharedVaultItem", back_populates="team", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class SharedKeyScheme(str, enum.Enum):
+    """How a shared item's content key is stored."""
+    RAW = "raw"  # Base64 key copied into encryption_key (legacy shares)
+    TEAM = "team"  # Content key wrapped under the team key
 
 
 class TeamMember(Base):
@@ -84,8 +227,8 @@ class TeamMember(Base):
     __tablename__ = "team_members"
 
     id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     role = Column(String(20), default=TeamRole.MEMBER.value)
     joined_at = Column(DateTime, default=datetime.utcnow)
 
@@ -99,19 +242,60 @@ class SharedVaultItem(Base):
     __tablename__ = "shared_vault_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
-    shared_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), nullable=False, index=True)
+    shared_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     type = Column(String(20), nullable=False)
     name = Column(String(255), nullable=False)
-    encrypted_data = Column(Text, nullable=False)
-    encryption_key = Column(Text, nullable=False)
+    encrypted_data = Column(Text, nullable=False)  # Empty when the ciphertext lives in a blob
+    encryption_key = Column(Text, nullable=False)  # Raw or team-wrapped content key (see key_scheme)
+    key_scheme = Column(String(20), nullable=True)  # SharedKeyScheme value, NULL for raw keys
+    blob_id = Column(Integer, ForeignKey("encrypted_blobs.id"), nullable=True)
+    layout = Column(String(10), nullable=True)  # ContentLayout value of the shared content
     iv = Column(Text, nullable=False)
+    compression = Column(String(10), nullable=True)
     hash = Column(String(64), nullable=False)
     signature = Column(Text, nullable=False)
+    signature_algorithm = Column(String(20), nullable=True)
+    signature_key_id = Column(String(50), nullable=True)
+    signature_proof = Column(Text, nullable=True)
     file_name = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     team = relationship("Team", back_populates="shared_items")
     sharer = relationship("User")
+    blob = relationship("EncryptedBlob")
+
+
+class FileRendition(Base):
+    """
+    Preview rendition (thumbnail) of a vault file, encrypted with the file's item key.
+    Regenerated when the file's content hash changes.
+    """
+    __tablename__ = "file_renditions"
+    __table_args__ = (UniqueConstraint("item_id", "size"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("vault_items.id", ondelete="CASCADE"), nullable=False)
+    size = Column(Integer, nullable=False)  # Longest edge in pixels
+    content_type = Column(String(50), nullable=False)
+    encrypted_data = Column(Text, nullable=False)  # Base64 AES-GCM ciphertext
+    iv = Column(Text, nullable=False)
+    source_hash = Column(String(64), nullable=False)  # Hash of the file content it was rendered from
+    created_at = Column(DateTime, default=datetime.utcnow)
 
+
+class UploadSession(Base):
+    """Resumable file upload in progress; chunks live encrypted on disk until finalized."""
+    __tablename__ = "upload_sessions"
+    # Ids name the chunk directories, so they must never be reused
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    file_name = Column(String(255), nullable=True)
+    length = Column(BigInteger, nullable=False)  # Total size declared by the client
+    offset = Column(BigInteger, nullable=False, default=0)  # Bytes received so far
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
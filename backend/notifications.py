@@ -0,0 +1,257 @@
+"""
+Asynchronous notification dispatch (OTPs, password reset codes).
+
+Routes enqueue a message and return; a pool of NOTIFY_WORKERS delivery
+tasks sends it through the configured transport. A failed send is retried
+with exponential backoff and jitter, up to NOTIFY_MAX_ATTEMPTS attempts.
+When the queue is full new messages are dropped and counted, so a slow
+mail server never holds up a request.
+
+NOTIFY_TRANSPORT selects the transport:
+- console (default): prints the message to the server log
+- smtp: sends email through SMTP_HOST:SMTP_PORT. For local testing, run
+  an aiosmtpd sink with `python -m aiosmtpd -n -l localhost:8025`
+
+Messages must be enqueued from the event loop. The workers are started
+and stopped with the application's lifespan.
+"""
+import asyncio
+import os
+import random
+import smtplib
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+load_dotenv()
+
+CONSOLE = "console"
+SMTP = "smtp"
+
+NOTIFY_TRANSPORT = os.getenv("NOTIFY_TRANSPORT", CONSOLE).lower()
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "1"))
+NOTIFY_RETRY_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "60"))
+# Seconds shutdown waits for queued messages to be sent
+NOTIFY_DRAIN_SECONDS = float(os.getenv("NOTIFY_DRAIN_SECONDS", "5"))
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "8025"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() in ("1", "true", "yes", "on")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+SMTP_FROM = os.getenv("SMTP_FROM", "SecureVault <no-reply@localhost>")
+# Domain appended to usernames that aren't email addresses
+NOTIFY_EMAIL_DOMAIN = os.getenv("NOTIFY_EMAIL_DOMAIN", "localhost")
+
+
+class Notification:
+    """A message to one recipient, with the number of delivery attempts so far."""
+    
+    def __init__(self, recipient: str, subject: str, body: str):
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.attempts = 0
+
+
+class Transport(ABC):
+    """Delivers a notification; raises on failure so the dispatcher retries."""
+    
+    @abstractmethod
+    async def send(self, notification: Notification):
+        """Send one notification."""
+
+
+class ConsoleTransport(Transport):
+    """Prints notifications to the server log (development default)."""
+    
+    async def send(self, notification: Notification):
+        print(f"\n{'='*50}")
+        print(f"📧 To '{notification.recipient}': {notification.subject}")
+        print(notification.body)
+        print(f"{'='*50}\n")
+
+
+class SmtpTransport(Transport):
+    """
+    Sends notifications as plain text email.
+    
+    smtplib is blocking, so each send runs in the thread pool. Usernames
+    without an @ are addressed at NOTIFY_EMAIL_DOMAIN.
+    """
+    
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        sender: str = SMTP_FROM,
+        user: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT_SECONDS
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+    
+    def _send(self, message: EmailMessage):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or "")
+            smtp.send_message(message)
+    
+    async def send(self, notification: Notification):
+        recipient = notification.recipient
+        if "@" not in recipient:
+            recipient = f"{recipient}@{NOTIFY_EMAIL_DOMAIN}"
+        
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = notification.subject
+        message.set_content(notification.body)
+        await run_in_threadpool(self._send, message)
+
+
+class NotificationDispatcher:
+    """
+    Bounded queue of notifications drained by a pool of worker tasks.
+    
+    Keeps enqueued, delivered, retried, failed and dropped counters so
+    callers can expose them as metrics.
+    """
+    
+    def __init__(
+        self,
+        transport: Transport,
+        workers: int = NOTIFY_WORKERS,
+        max_queue: int = NOTIFY_QUEUE_SIZE,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+        retry_base: float = NOTIFY_RETRY_BASE_SECONDS,
+        retry_max: float = NOTIFY_RETRY_MAX_SECONDS
+    ):
+        self.transport = transport
+        self.workers = max(workers, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+        self._retry_handles = set()
+    
+    def enqueue(self, recipient: str, subject: str, body: str) -> bool:
+        """
+        Queue a notification for delivery without waiting for it.
+        
+        Returns:
+            True if queued, False if the queue is full and it was dropped
+        """
+        if not self._put(Notification(recipient, subject, body)):
+            return False
+        self.enqueued += 1
+        return True
+    
+    def _put(self, notification: Notification) -> bool:
+        try:
+            self._queue.put_nowait(notification)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"[Notify] Queue full, dropped message to '{notification.recipient}'")
+            return False
+    
+    def _retry_delay(self, attempts: int) -> float:
+        # Exponential backoff with full jitter, so retries after an outage spread out
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (attempts - 1)))
+    
+    def _schedule_retry(self, notification: Notification):
+        loop = asyncio.get_running_loop()
+        
+        def requeue():
+            self._retry_handles.discard(handle)
+            self._put(notification)
+        
+        handle = loop.call_later(self._retry_delay(notification.attempts), requeue)
+        self._retry_handles.add(handle)
+        self.retried += 1
+    
+    async def _deliver(self, notification: Notification):
+        notification.attempts += 1
+        try:
+            await self.transport.send(notification)
+            self.delivered += 1
+        except Exception as e:
+            if notification.attempts >= self.max_attempts:
+                self.failed += 1
+                print(f"[Notify] Giving up on message to '{notification.recipient}' "
+                      f"after {notification.attempts} attempts: {e}")
+            else:
+                self._schedule_retry(notification)
+    
+    async def _worker(self):
+        while True:
+            notification = await self._queue.get()
+            try:
+                await self._deliver(notification)
+            finally:
+                self._queue.task_done()
+    
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self, drain_timeout: float = NOTIFY_DRAIN_SECONDS):
+        """Send what is queued (waiting up to drain_timeout), then stop the workers."""
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"[Notify] Shutting down with {self._queue.qsize()} undelivered message(s)")
+        
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def stats(self) -> dict:
+        """Return queue depth and delivery counters."""
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "retry_pending": len(self._retry_handles),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+
+if NOTIFY_TRANSPORT == SMTP:
+    notifier = NotificationDispatcher(SmtpTransport())
+else:
+    if NOTIFY_TRANSPORT != CONSOLE:
+        print(f"[Notify] Unknown transport {NOTIFY_TRANSPORT}, falling back to {CONSOLE}")
+    notifier = NotificationDispatcher(ConsoleTransport())
@@ -0,0 +1,130 @@
+"""
+Token-bucket rate limiting for the authentication endpoints.
+
+Every login, registration and password reset costs a password hash, so
+attempts are limited per client IP, per username and globally. Each key
+has a bucket of RATE_LIMIT_*_BURST tokens that refills at
+RATE_LIMIT_*_PER_MINUTE; a request takes one token or is refused with
+429 and a Retry-After header. Setting a rate to 0 disables that limit.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+load_dotenv()
+
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "10"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "10"))
+RATE_LIMIT_GLOBAL_PER_MINUTE = float(os.getenv("RATE_LIMIT_GLOBAL_PER_MINUTE", "1200"))
+RATE_LIMIT_GLOBAL_BURST = int(os.getenv("RATE_LIMIT_GLOBAL_BURST", "200"))
+
+# Buckets kept per limiter; the least recently used are dropped first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class RateLimiter:
+    """
+    Thread-safe token buckets, one per key.
+    
+    Keeps allowed and limited counters so callers can expose them as metrics.
+    """
+    
+    def __init__(self, per_minute: float, burst: int, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = max(burst, 1)
+        self.maxsize = maxsize
+        self.allowed = 0
+        self.limited = 0
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+    
+    def hit(self, key: Hashable) -> float:
+        """
+        Take a token from key's bucket.
+        
+        Returns:
+            0 if the request is allowed, otherwise seconds until a token is available
+        """
+        if self.rate <= 0:
+            return 0.0
+        
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                self.allowed += 1
+                return 0.0
+            
+            bucket[0] = tokens
+            self.limited += 1
+            return (1 - tokens) / self.rate
+    
+    def stats(self) -> dict:
+        """Return key count and allowed/limited counters."""
+        with self._lock:
+            return {"keys": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+
+ip_limiter = RateLimiter(RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+user_limiter = RateLimiter(RATE_LIMIT_USER_PER_MINUTE, RATE_LIMIT_USER_BURST)
+global_limiter = RateLimiter(RATE_LIMIT_GLOBAL_PER_MINUTE, RATE_LIMIT_GLOBAL_BURST, maxsize=1)
+
+
+def client_ip(request: Request) -> str:
+    """
+    Get the client address of a request.
+    
+    Behind a reverse proxy, run uvicorn with --proxy-headers (and
+    --forwarded-allow-ips) so this is the original client.
+    """
+    return request.client.host if request.client else "unknown"
+
+
+def check_auth_rate_limits(ip: str, username: Optional[str]):
+    """
+    Count an authentication attempt against the IP, username and global limits.
+    
+    The IP is checked first, so one noisy client can't drain the global bucket.
+    
+    Raises:
+        HTTPException: 429 with Retry-After if any limit is exceeded
+    """
+    checks = [(ip_limiter, ip)]
+    if username:
+        checks.append((user_limiter, username))
+    checks.append((global_limiter, None))
+    
+    for limiter, key in checks:
+        retry_after = limiter.hit(key)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+
+def rate_limit_stats() -> dict:
+    """Counters of every limiter, for the metrics endpoint."""
+    return {
+        "ip": ip_limiter.stats(),
+        "username": user_limiter.stats(),
+        "global": global_limiter.stats()
+    }
@@ -0,0 +1,100 @@
+"""
+Preview renditions (thumbnails) for image and PDF files.
+
+Images are resized with Pillow and the first page of a PDF is rasterized
+with poppler's pdftoppm. Both are optional: without them, previews fall
+back to the original file.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional dependency
+    Image = None
+
+# Longest edge, in pixels, of the renditions that can be requested
+RENDITION_SIZES = (128, 512, 1024)
+
+RASTER_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+PDF_TYPE = "application/pdf"
+
+PDFTOPPM = shutil.which("pdftoppm")
+PDF_RENDER_TIMEOUT_SECONDS = 30
+JPEG_QUALITY = 85
+
+
+def can_render(content_type: Optional[str]) -> bool:
+    """Check whether renditions can be generated for a content type here."""
+    if content_type == PDF_TYPE:
+        return PDFTOPPM is not None
+    return Image is not None and content_type in RASTER_IMAGE_TYPES
+
+
+def _rasterize_pdf_page(data: bytes, size: int) -> Optional[bytes]:
+    """Render the first page of a PDF to a PNG whose longest edge is size."""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.pdf")
+        with open(source, "wb") as f:
+            f.write(data)
+        
+        output_root = os.path.join(directory, "page")
+        try:
+            subprocess.run(
+                [PDFTOPPM, "-png", "-f", "1", "-l", "1", "-singlefile", "-scale-to", str(size), source, output_root],
+                check=True,
+                capture_output=True,
+                timeout=PDF_RENDER_TIMEOUT_SECONDS
+            )
+            with open(output_root + ".png", "rb") as f:
+                return f.read()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+def _thumbnail(data: bytes, size: int) -> Optional[Tuple[bytes, str]]:
+    """Resize an image to fit a size x size box, keeping its aspect ratio."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Let JPEG decode at reduced scale instead of full resolution
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "image/png"
+        
+        image.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue(), "image/jpeg"
+    except Exception:
+        # Corrupt, truncated or oversized (decompression bomb) images
+        return None
+
+
+def render_rendition(data: bytes, content_type: Optional[str], size: int) -> Optional[Tuple[bytes, str]]:
+    """
+    Render a preview of a file.
+    
+    Args:
+        data: Original file content
+        content_type: MIME type of the original
+        size: Longest edge of the rendition in pixels
+    
+    Returns:
+        Tuple of (rendition bytes, rendition content type), or None if the
+        type is unsupported, the renderer is unavailable or rendering failed
+    """
+    if not can_render(content_type):
+        return None
+    
+    if content_type == PDF_TYPE:
+        page = _rasterize_pdf_page(data, size)
+        return (page, "image/png") if page is not None else None
+    
+    return _thumbnail(data, size)
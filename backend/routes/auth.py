@@ -1,18 +1,36 @@
 """
 Authentication routes for user registration, login, and OTP verification.
 """
+import os
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
 from database import get_db
-from models import User, UserRole
-from crypto.password import hash_password, verify_password
-from auth.jwt import create_access_token, get_current_user
-from auth.otp import generate_otp, get_otp_expiry, verify_otp, simulate_send_otp
+from models import User, UserRole, VaultItem, Team, TeamMember, SharedVaultItem
+from crypto.password import hash_password, needs_rehash, verify_password
+from auth.jwt import create_access_token, get_current_user, revoke_token, revoke_user_tokens, security
+from auth.sessions import AUTH_MODE, SESSION, session_store
+from auth.otp import OTP_EXPIRY_MINUTES, generate_otp, send_otp, send_reset_token
+from auth.tokens import token_store
+from crypto.envelope import dek_cache
+from routes.teams import team_role_cache
+from ratelimit import check_auth_rate_limits, client_ip
+from routes.vault import release_blobs
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Rows deleted per statement when removing an account
+ACCOUNT_DELETE_BATCH_SIZE = int(os.getenv("ACCOUNT_DELETE_BATCH_SIZE", "500"))
+
+# Token store purposes of the one-time codes, keyed by user id
+REGISTER_OTP = "register"
+PASSWORD_RESET = "reset"
+
 
 # Request/Response Models
 class RegisterRequest(BaseModel):
@@ -33,6 +51,12 @@ class OTPVerifyRequest(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None  # Session mode only
+    expires_in: Optional[int] = None  # Session mode only, in seconds
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class UserResponse(BaseModel):
@@ -59,17 +83,85 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
+class DeleteAccountRequest(BaseModel):
+    password: str
+
+
+# Helper functions
+def issue_tokens(user: User) -> dict:
+    """Create the bearer token response for a user: a JWT, or a session in session mode."""
+    if AUTH_MODE == SESSION:
+        return {"token_type": "bearer", **session_store.create(user.id)}
+    
+    # sub must be string
+    return {"access_token": create_access_token(data={"sub": str(user.id)}), "token_type": "bearer"}
+
+
+def delete_in_batches(db: Session, model, condition):
+    """
+    Delete rows matching condition in batches of set-based statements.
+    
+    Only ids and blob references are read, never the encrypted data.
+    Each batch releases the shared ciphertext its rows referenced. Nothing
+    is committed, so the caller can delete everything in one transaction.
+    """
+    while True:
+        rows = db.query(model.id, model.blob_id).filter(condition).limit(ACCOUNT_DELETE_BATCH_SIZE).all()
+        if not rows:
+            return
+        
+        db.query(model).filter(model.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+        release_blobs(db, [row.blob_id for row in rows])
+
+
+def delete_user_account(db: Session, user: User):
+    """
+    Delete a user and everything they own.
+    
+    The user's sessions and JWTs are revoked first.
+    Vault items and shared items (the user's own shares and every share in
+    teams they created) are removed in batches. Memberships, teams, file
+    chunks and the user row then go with ON DELETE CASCADE. It all commits
+    at once, so a failure leaves the account untouched.
+    """
+    user_id = user.id
+    revoke_user_tokens(user_id)
+    owned_team_ids = [team_id for (team_id,) in db.query(Team.id).filter(Team.created_by == user_id)]
+    memberships = db.query(TeamMember.team_id, TeamMember.user_id).filter(
+        or_(TeamMember.user_id == user_id, TeamMember.team_id.in_(owned_team_ids))
+    ).all()
+    
+    delete_in_batches(db, VaultItem, VaultItem.user_id == user_id)
+    delete_in_batches(db, SharedVaultItem, or_(
+        SharedVaultItem.shared_by == user_id,
+        SharedVaultItem.team_id.in_(owned_team_ids)
+    ))
+    
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+    db.commit()
+    
+    dek_cache.delete(user_id)
+    token_store.discard(REGISTER_OTP, str(user_id))
+    token_store.discard(PASSWORD_RESET, str(user_id))
+    for team_id in owned_team_ids:
+        dek_cache.delete(("team", team_id))
+    for membership in memberships:
+        team_role_cache.delete((membership.team_id, membership.user_id))
+
+
 # Routes
 @router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def register(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register(request: RegisterRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)):
     """
     Register a new user.
     
     - Validates username is unique
-    - Hashes password with bcrypt + salt
+    - Hashes password with Argon2id + salt
     - Generates OTP for verification
     - Stores user in database (inactive until OTP verified)
     """
+    check_auth_rate_limits(ip, request.username)
+    
     # Check if username already exists
     existing_user = db.query(User).filter(User.username == request.username).first()
     if existing_user:
@@ -86,7 +178,7 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
         )
     
     # Create new user with hashed password
-    hashed_password = hash_password(request.password)
+    hashed_password = await run_in_threadpool(hash_password, request.password)
     
     # Generate OTP for verification
     otp = generate_otp()
@@ -94,30 +186,29 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
     new_user = User(
         username=request.username,
         password_hash=hashed_password,
-        role=UserRole.USER.value,
-        otp=otp,
-        otp_expiry=get_otp_expiry()
+        role=UserRole.USER.value
     )
     
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
+    token_store.put(REGISTER_OTP, str(new_user.id), otp, OTP_EXPIRY_MINUTES * 60)
     
-    # Simulate sending OTP (in production, send via email/SMS)
-    simulate_send_otp(request.username, otp)
+    # Queue the OTP for delivery; the response doesn't wait for the send
+    send_otp(request.username, otp)
     
     return {"message": "Registration successful. Please verify OTP to activate your account."}
 
 
 @router.post("/verify-otp", response_model=TokenResponse)
-async def verify_otp_route(request: OTPVerifyRequest, db: Session = Depends(get_db)):
+async def verify_otp_route(request: OTPVerifyRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)):
     """
     Verify OTP after registration and activate account.
     
-    - Verifies OTP matches and is not expired
-    - Clears OTP from database
-    - Issues JWT access token
+    - Verifies OTP matches and is not expired (consumes it)
+    - Issues JWT access token (or session tokens in session mode)
     """
+    check_auth_rate_limits(ip, request.username)
+    
     # Find user
     user = db.query(User).filter(User.username == request.username).first()
     if not user:
@@ -126,33 +217,29 @@ async def verify_otp_route(request: OTPVerifyRequest, db: Session = Depends(get_
             detail="Invalid username"
         )
     
-    # Verify OTP
-    if not verify_otp(request.otp, user.otp, user.otp_expiry):
+    # Verify and consume OTP (wrong guesses count towards its attempt limit)
+    if not token_store.verify(REGISTER_OTP, str(user.id), request.otp):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired OTP"
         )
     
-    # Clear OTP after successful verification
-    user.otp = None
-    user.otp_expiry = None
-    db.commit()
-    
-    # Create and return access token (sub must be string)
-    access_token = create_access_token(data={"sub": str(user.id)})
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Create and return access token
+    return issue_tokens(user)
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)):
     """
     Login with username and password.
     
     - Verifies username exists
     - Verifies password hash
-    - Returns JWT token directly
+    - Rehashes the password if its algorithm or cost is outdated
+    - Returns JWT token directly (or session tokens in session mode)
     """
+    check_auth_rate_limits(ip, request.username)
+    
     # Find user
     user = db.query(User).filter(User.username == request.username).first()
     if not user:
@@ -162,16 +249,19 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(request.password, user.password_hash):
+    if not await run_in_threadpool(verify_password, request.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
         )
     
-    # Create and return access token (sub must be string)
-    access_token = create_access_token(data={"sub": str(user.id)})
+    # Upgrade bcrypt or outdated Argon2id hashes while the password is at hand
+    if needs_rehash(user.password_hash):
+        user.password_hash = await run_in_threadpool(hash_password, request.password)
+        db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Create and return access token
+    return issue_tokens(user)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -186,13 +276,15 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/forgot-password", response_model=MessageResponse)
-async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
+async def forgot_password(request: ForgotPasswordRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)):
     """
     Request password reset.
     
     - Generates a reset token (OTP)
-    - Sends token to user (simulated - printed to console)
+    - Queues the token for delivery to the user
     """
+    check_auth_rate_limits(ip, request.username)
+    
     # Find user
     user = db.query(User).filter(User.username == request.username).first()
     if not user:
@@ -201,27 +293,25 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
     
     # Generate reset token
     reset_token = generate_otp()
-    user.reset_token = reset_token
-    user.reset_token_expiry = get_otp_expiry()
-    db.commit()
+    token_store.put(PASSWORD_RESET, str(user.id), reset_token, OTP_EXPIRY_MINUTES * 60)
     
-    # Simulate sending reset token
-    print("\n" + "=" * 50)
-    print(f"🔑 PASSWORD RESET TOKEN for user '{request.username}': {reset_token}")
-    print("=" * 50 + "\n")
+    # Queue the reset token for delivery
+    send_reset_token(request.username, reset_token)
     
     return {"message": "If the account exists, a reset code has been sent."}
 
 
 @router.post("/reset-password", response_model=MessageResponse)
-async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: ResetPasswordRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)):
     """
     Reset password with token.
     
-    - Verifies reset token
+    - Verifies reset token (consumes it)
     - Updates password hash
-    - Clears reset token
+    - Signs out every session and token of the user
     """
+    check_auth_rate_limits(ip, request.username)
+    
     # Find user
     user = db.query(User).filter(User.username == request.username).first()
     if not user:
@@ -230,25 +320,101 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
             detail="Invalid reset request"
         )
     
-    # Verify reset token
-    if not verify_otp(request.reset_token, user.reset_token, user.reset_token_expiry):
+    # Validate new password (before the token is consumed)
+    if len(request.new_password) < 8:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid or expired reset token"
+            detail="Password must be at least 8 characters"
         )
     
-    # Validate new password
-    if len(request.new_password) < 8:
+    # Verify and consume reset token
+    if not token_store.verify(PASSWORD_RESET, str(user.id), request.reset_token):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must be at least 8 characters"
+            detail="Invalid or expired reset token"
         )
     
     # Update password
-    user.password_hash = hash_password(request.new_password)
-    user.reset_token = None
-    user.reset_token_expiry = None
+    user.password_hash = await run_in_threadpool(hash_password, request.new_password)
     db.commit()
+    revoke_user_tokens(user.id)
     
     return {"message": "Password has been reset successfully. You can now login."}
 
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh_session(request: RefreshRequest):
+    """
+    Exchange a refresh token for a new access and refresh token.
+    
+    - Session mode only
+    - Rotates the pair: the old tokens stop working
+    """
+    if AUTH_MODE != SESSION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Refresh tokens are only issued in session mode"
+        )
+    
+    tokens = session_store.refresh(request.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    
+    return {"token_type": "bearer", **tokens}
+
+
+@router.post("/logout", response_model=MessageResponse)
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sign out the current token.
+    
+    - Session mode: the session is revoked
+    - JWT mode: the token's jti is added to the revocation list
+    """
+    revoke_token(credentials.credentials)
+    
+    return {"message": "Logged out"}
+
+
+@router.post("/logout-all", response_model=MessageResponse)
+async def logout_all(current_user: User = Depends(get_current_user)):
+    """
+    Sign out everywhere.
+    
+    - Revokes every session, or every JWT issued until now, of the current user
+    """
+    revoke_user_tokens(current_user.id)
+    
+    return {"message": "Logged out of all sessions"}
+
+
+@router.post("/delete-account", response_model=MessageResponse)
+async def delete_account(
+    request: DeleteAccountRequest,
+    ip: str = Depends(client_ip),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Permanently delete the current user's account.
+    
+    - Requires the current password
+    - Deletes all vault items, shares and teams created by the user
+    """
+    check_auth_rate_limits(ip, current_user.username)
+    
+    if not await run_in_threadpool(verify_password, request.password, current_user.password_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid password"
+        )
+    
+    delete_user_account(db, current_user)
+    
+    return {"message": "Account deleted"}
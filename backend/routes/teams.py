@@ -6,20 +6,54 @@ Role Permissions:
 - ADMIN: Share files, view/download (cannot manage members)
 - MEMBER: View and download shared files only
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import Response
-from sqlalchemy.orm import Session
+import mimetypes
+import os
+from cryptography.exceptions import InvalidTag
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session, defer
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 
 from database import get_db
-from models import User, Team, TeamMember, TeamRole, SharedVaultItem, VaultItem, VaultItemType
+from models import (
+    User, Team, TeamMember, TeamRole, SharedVaultItem, SharedKeyScheme, VaultItem, VaultItemType, ContentLayout
+)
 from auth.jwt import get_current_user
-from crypto.aes import decrypt_data
+from crypto.aes import GCM_TAG_SIZE, decrypt_data
+from crypto.compression import decompress, decompress_stream
 from crypto.encoding import decode_base64
+from crypto.hashing import verify_hash
+from cache import TTLCache
+from chunkstore import iter_chunks
+from coalesce import SingleFlight
+from crypto.envelope import dek_cache, generate_dek, load_keks, unwrap_key, wrap_key
+from routes.vault import (
+    ArchiveRequest, add_blob_reference, archive_ids, archive_response, get_user_dek, integrity_error,
+    item_ciphertext, item_key, read_chunked_content, release_blobs, signature_valid
+)
+from streaming import etag_for, etag_matches, iter_range, parse_range
 
 router = APIRouter(prefix="/teams", tags=["Teams"])
 
+# (team_id, user_id) -> role, or "" for non-members. Membership changes
+# write through, so the TTL only bounds staleness across worker processes.
+TEAM_ROLE_CACHE_TTL_SECONDS = int(os.getenv("TEAM_ROLE_CACHE_TTL_SECONDS", "30"))
+team_role_cache = TTLCache(maxsize=10000, ttl=TEAM_ROLE_CACHE_TTL_SECONDS)
+NOT_A_MEMBER = ""
+
+# (hash, signature, GCM tag) -> plaintext size, for shared ciphertexts whose
+# signature and hash have already been checked. The tag pins the entry to one
+# ciphertext, so a swapped blob is verified again.
+INTEGRITY_CACHE_TTL_SECONDS = int(os.getenv("INTEGRITY_CACHE_TTL_SECONDS", "3600"))
+verified_content_cache = TTLCache(maxsize=10000, ttl=INTEGRITY_CACHE_TTL_SECONDS)
+
+# Concurrent downloads of one shared ciphertext share a single decryption
+# pass. Buffered plaintext across all such downloads is capped at this size.
+COALESCE_MAX_BUFFER_BYTES = int(os.getenv("COALESCE_MAX_BUFFER_BYTES", str(256 * 1024 * 1024)))
+download_flights = SingleFlight(max_buffer_bytes=COALESCE_MAX_BUFFER_BYTES)
+
 
 # Request/Response Models
 class CreateTeamRequest(BaseModel):
@@ -58,6 +92,38 @@ class ShareFileRequest(BaseModel):
     vault_item_id: int
 
 
+# Bulk Models
+MAX_BULK_ENTRIES = 500
+
+
+class BulkAddMembersRequest(BaseModel):
+    members: List[AddMemberRequest]
+
+
+class BulkRemoveMembersRequest(BaseModel):
+    user_ids: List[int]
+
+
+class BulkShareRequest(BaseModel):
+    vault_item_ids: List[int]
+
+
+class BulkMemberResult(BaseModel):
+    username: str
+    status: str  # added, not_found, already_member or duplicate
+    role: Optional[str] = None
+
+
+class BulkRemoveResult(BaseModel):
+    user_id: int
+    status: str  # removed, not_found or invalid
+
+
+class BulkShareResult(BaseModel):
+    vault_item_id: int
+    status: str  # shared, not_found, already_shared or duplicate
+
+
 class SharedFileResponse(BaseModel):
     id: int
     name: str
@@ -69,6 +135,216 @@ class SharedFileResponse(BaseModel):
         from_attributes = True
 
 
+# Helper functions
+def get_team_key(db: Session, team: Team) -> bytes:
+    """
+    Get the team key that wraps the content keys of shared items.
+    
+    Teams created before team keys existed get one on first use.
+    Unwrapped keys share the DEK cache.
+    
+    Returns:
+        32-byte team key
+    """
+    cache_key = ("team", team.id)
+    key = dek_cache.get(cache_key)
+    if key is not None:
+        return key
+    
+    current_kek_id, keks = load_keks()
+    
+    if team.wrapped_key is None:
+        key = generate_dek()
+        created = db.query(Team).filter(
+            Team.id == team.id,
+            Team.wrapped_key.is_(None)
+        ).update(
+            {"wrapped_key": wrap_key(key, keks[current_kek_id]), "kek_id": current_kek_id},
+            synchronize_session=False
+        )
+        db.flush()
+        db.refresh(team)
+        if not created:
+            key = None
+    
+    if key is None:
+        if team.kek_id not in keks:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Team encryption key unavailable"
+            )
+        key = unwrap_key(team.wrapped_key, keks[team.kek_id])
+    
+    dek_cache.set(cache_key, key)
+    return key
+
+
+def get_team_role(db: Session, team_id: int, user_id: int) -> Optional[str]:
+    """
+    Look up a user's role in a team through the role cache.
+    
+    Returns:
+        Role string, or None if the user is not a member
+    """
+    role = team_role_cache.get((team_id, user_id))
+    if role is None:
+        membership = db.query(TeamMember.role).filter(
+            TeamMember.team_id == team_id,
+            TeamMember.user_id == user_id
+        ).first()
+        role = membership.role if membership else NOT_A_MEMBER
+        team_role_cache.set((team_id, user_id), role)
+    
+    return role or None
+
+
+def require_team_role(*roles: str, detail: str = "Not a member of this team"):
+    """
+    Dependency factory for team authorization.
+    
+    Args:
+        roles: Roles allowed to use the route (any member if empty)
+        detail: Error message for members without one of the roles
+        
+    Returns:
+        Dependency that returns the caller's role in the team
+    """
+    async def team_role_checker(
+        team_id: int,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ) -> str:
+        role = get_team_role(db, team_id, current_user.id)
+        if role is None:
+            raise HTTPException(status_code=403, detail="Not a member of this team")
+        if roles and role not in roles:
+            raise HTTPException(status_code=403, detail=detail)
+        return role
+    
+    return team_role_checker
+
+
+def check_bulk_size(entries: list):
+    """Reject bulk requests above MAX_BULK_ENTRIES."""
+    if len(entries) > MAX_BULK_ENTRIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_ENTRIES} entries per request"
+        )
+
+
+def member_role_for(requested_role: str) -> str:
+    """Only admin or member roles can be granted, never owner."""
+    allowed_roles = [TeamRole.ADMIN.value, TeamRole.MEMBER.value]
+    return requested_role if requested_role in allowed_roles else TeamRole.MEMBER.value
+
+
+def share_vault_item(
+    db: Session,
+    team: Team,
+    vault_item: VaultItem,
+    user: User,
+    dek: bytes
+) -> SharedVaultItem:
+    """
+    Share a file with a team by reference.
+    
+    The share points at the same ciphertext as the vault item and stores
+    the content key wrapped under the team key.
+    
+    Returns:
+        The new SharedVaultItem (not yet committed)
+    """
+    content_key = item_key(vault_item, dek)
+    blob_id = add_blob_reference(db, vault_item)
+    
+    shared_item = SharedVaultItem(
+        team_id=team.id,
+        shared_by=user.id,
+        type=VaultItemType.FILE.value,
+        name=vault_item.name,
+        encrypted_data="",
+        encryption_key=wrap_key(content_key, get_team_key(db, team)),
+        key_scheme=SharedKeyScheme.TEAM.value,
+        blob_id=blob_id,
+        layout=vault_item.layout,
+        iv=vault_item.iv,
+        compression=vault_item.compression,
+        hash=vault_item.hash,
+        signature=vault_item.signature,
+        signature_algorithm=vault_item.signature_algorithm,
+        signature_key_id=vault_item.signature_key_id,
+        signature_proof=vault_item.signature_proof,
+        file_name=vault_item.file_name
+    )
+    db.add(shared_item)
+    return shared_item
+
+
+def shared_item_key(db: Session, shared_item: SharedVaultItem) -> bytes:
+    """Get the AES content key of a shared item."""
+    if shared_item.key_scheme == SharedKeyScheme.TEAM.value:
+        return unwrap_key(shared_item.encryption_key, get_team_key(db, shared_item.team))
+    return decode_base64(shared_item.encryption_key)
+
+
+def open_shared_file(db: Session, shared_item: SharedVaultItem) -> Tuple[Iterator[bytes], int]:
+    """
+    Decrypt a shared file for streaming.
+    
+    The GCM tag is checked on every call. The signature and hash are checked
+    the first time a ciphertext is seen; later calls trust the cached result
+    and decompress (or read chunks) lazily as the response is sent.
+    
+    Returns:
+        Tuple of (plaintext chunk iterator, plaintext size)
+        
+    Raises:
+        HTTPException: If any integrity check fails
+    """
+    encrypted = decode_base64(item_ciphertext(shared_item))
+    try:
+        payload = decrypt_data(encrypted, shared_item_key(db, shared_item), decode_base64(shared_item.iv))
+    except InvalidTag:
+        raise integrity_error("Data integrity check failed - decryption failed")
+    
+    chunked = shared_item.layout == ContentLayout.CHUNKED.value
+    
+    # For chunked files the tag pins the manifest, and chunk keys in the
+    # manifest are derived from chunk content, so swapped chunks still fail
+    cache_key = (shared_item.hash, shared_item.signature, encrypted[-GCM_TAG_SIZE:])
+    size = verified_content_cache.get(cache_key)
+    if size is not None:
+        if chunked:
+            # Read with their own session, from whichever thread streams the response
+            return iter_chunks(payload), size
+        return decompress_stream(payload, shared_item.compression), size
+    
+    if not signature_valid(shared_item):
+        raise integrity_error("Data authenticity check failed - signature invalid")
+    
+    if chunked:
+        decrypted = read_chunked_content(db, payload)
+    else:
+        decrypted = decompress(payload, shared_item.compression)
+    if not verify_hash(decrypted, shared_item.hash):
+        raise integrity_error("Data integrity check failed - hash mismatch")
+    
+    verified_content_cache.set(cache_key, len(decrypted))
+    return decompress_stream(decrypted, None), len(decrypted)
+
+
+def shared_download_key(shared_item: SharedVaultItem) -> tuple:
+    """
+    Coalescing key for a shared file: its ciphertext and content version.
+    
+    Shares of the same blob (e.g. in several teams) map to the same key.
+    """
+    if shared_item.blob_id is not None:
+        return ("blob", shared_item.blob_id, shared_item.hash)
+    return ("shared", shared_item.id, shared_item.hash)
+
+
 # Routes
 @router.post("/", response_model=TeamResponse, status_code=status.HTTP_201_CREATED)
 async def create_team(
@@ -77,10 +353,13 @@ async def create_team(
     db: Session = Depends(get_db)
 ):
     """Create a new team. Creator becomes the owner."""
+    current_kek_id, keks = load_keks()
     team = Team(
         name=request.name,
         description=request.description,
-        created_by=current_user.id
+        created_by=current_user.id,
+        wrapped_key=wrap_key(generate_dek(), keks[current_kek_id]),
+        kek_id=current_kek_id
     )
     db.add(team)
     db.commit()
@@ -94,6 +373,7 @@ async def create_team(
     )
     db.add(member)
     db.commit()
+    team_role_cache.set((team.id, current_user.id), TeamRole.OWNER.value)
     
     return {
         "id": team.id,
@@ -137,19 +417,10 @@ async def get_my_teams(
 @router.get("/{team_id}/members", response_model=List[TeamMemberResponse])
 async def get_team_members(
     team_id: int,
-    current_user: User = Depends(get_current_user),
+    caller_role: str = Depends(require_team_role()),
     db: Session = Depends(get_db)
 ):
     """Get all members of a team. Any member can view."""
-    # Verify user is a member
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
-    
     members = db.query(TeamMember).filter(TeamMember.team_id == team_id).all()
     
     result = []
@@ -169,22 +440,13 @@ async def get_team_members(
 async def add_team_member(
     team_id: int,
     request: AddMemberRequest,
-    current_user: User = Depends(get_current_user),
+    caller_role: str = Depends(require_team_role(TeamRole.OWNER.value, detail="Only team owner can add members")),
     db: Session = Depends(get_db)
 ):
     """
     Add a member to the team.
     Only OWNER can add members.
     """
-    # Verify caller is owner only
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership or membership.role != TeamRole.OWNER.value:
-        raise HTTPException(status_code=403, detail="Only team owner can add members")
-    
     # Find user to add
     user_to_add = db.query(User).filter(User.username == request.username).first()
     if not user_to_add:
@@ -200,8 +462,7 @@ async def add_team_member(
         raise HTTPException(status_code=400, detail="User is already a member")
     
     # Add member (only allow admin or member roles, not owner)
-    allowed_roles = [TeamRole.ADMIN.value, TeamRole.MEMBER.value]
-    role = request.role if request.role in allowed_roles else TeamRole.MEMBER.value
+    role = member_role_for(request.role)
     
     new_member = TeamMember(
         team_id=team_id,
@@ -210,6 +471,7 @@ async def add_team_member(
     )
     db.add(new_member)
     db.commit()
+    team_role_cache.set((team_id, user_to_add.id), role)
     
     return {"message": f"Added {request.username} as {role} to the team"}
 
@@ -218,6 +480,7 @@ async def add_team_member(
 async def remove_team_member(
     team_id: int,
     user_id: int,
+    caller_role: str = Depends(require_team_role(TeamRole.OWNER.value, detail="Only team owner can remove members")),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -225,15 +488,6 @@ async def remove_team_member(
     Remove a member from the team.
     Only OWNER can remove members.
     """
-    # Verify caller is owner only
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership or membership.role != TeamRole.OWNER.value:
-        raise HTTPException(status_code=403, detail="Only team owner can remove members")
-    
     # Can't remove self (owner)
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Owner cannot remove themselves")
@@ -248,14 +502,177 @@ async def remove_team_member(
     
     db.delete(member_to_remove)
     db.commit()
+    team_role_cache.set((team_id, user_id), NOT_A_MEMBER)
     
     return {"message": "Member removed"}
 
 
+@router.post("/{team_id}/members/bulk", response_model=List[BulkMemberResult])
+async def add_team_members_bulk(
+    team_id: int,
+    request: BulkAddMembersRequest,
+    caller_role: str = Depends(require_team_role(TeamRole.OWNER.value, detail="Only team owner can add members")),
+    db: Session = Depends(get_db)
+):
+    """
+    Add many members to the team in one transaction.
+    Only OWNER can add members.
+    
+    - Resolves all usernames with one query
+    - Returns one result per requested username
+    """
+    check_bulk_size(request.members)
+    
+    usernames = {entry.username for entry in request.members}
+    users = db.query(User).filter(User.username.in_(usernames)).all() if usernames else []
+    users_by_name = {user.username: user for user in users}
+    
+    existing_ids = {
+        user_id for (user_id,) in db.query(TeamMember.user_id).filter(
+            TeamMember.team_id == team_id,
+            TeamMember.user_id.in_([user.id for user in users])
+        )
+    } if users else set()
+    
+    results = []
+    added = []
+    seen = set()
+    for entry in request.members:
+        user = users_by_name.get(entry.username)
+        if entry.username in seen:
+            results.append(BulkMemberResult(username=entry.username, status="duplicate"))
+        elif user is None:
+            results.append(BulkMemberResult(username=entry.username, status="not_found"))
+        elif user.id in existing_ids:
+            results.append(BulkMemberResult(username=entry.username, status="already_member"))
+        else:
+            role = member_role_for(entry.role)
+            added.append(TeamMember(team_id=team_id, user_id=user.id, role=role))
+            results.append(BulkMemberResult(username=entry.username, status="added", role=role))
+        seen.add(entry.username)
+    
+    db.add_all(added)
+    db.commit()
+    for member in added:
+        team_role_cache.set((team_id, member.user_id), member.role)
+    
+    return results
+
+
+@router.post("/{team_id}/members/bulk-remove", response_model=List[BulkRemoveResult])
+async def remove_team_members_bulk(
+    team_id: int,
+    request: BulkRemoveMembersRequest,
+    caller_role: str = Depends(require_team_role(TeamRole.OWNER.value, detail="Only team owner can remove members")),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Remove many members from the team with one statement.
+    Only OWNER can remove members, and not themselves.
+    """
+    check_bulk_size(request.user_ids)
+    
+    candidate_ids = set(request.user_ids) - {current_user.id}
+    member_ids = {
+        user_id for (user_id,) in db.query(TeamMember.user_id).filter(
+            TeamMember.team_id == team_id,
+            TeamMember.user_id.in_(candidate_ids)
+        )
+    } if candidate_ids else set()
+    
+    if member_ids:
+        db.query(TeamMember).filter(
+            TeamMember.team_id == team_id,
+            TeamMember.user_id.in_(member_ids)
+        ).delete(synchronize_session=False)
+    db.commit()
+    for user_id in member_ids:
+        team_role_cache.set((team_id, user_id), NOT_A_MEMBER)
+    
+    results = []
+    for user_id in request.user_ids:
+        if user_id == current_user.id:
+            status_value = "invalid"
+        elif user_id in member_ids:
+            status_value = "removed"
+        else:
+            status_value = "not_found"
+        results.append(BulkRemoveResult(user_id=user_id, status=status_value))
+    
+    return results
+
+
+@router.post("/{team_id}/share/bulk", response_model=List[BulkShareResult])
+async def share_files_with_team_bulk(
+    team_id: int,
+    request: BulkShareRequest,
+    caller_role: str = Depends(require_team_role(
+        TeamRole.OWNER.value, TeamRole.ADMIN.value, detail="Only owner or admin can share files"
+    )),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Share many FILES with the team in one transaction.
+    Only OWNER and ADMIN can share files.
+    
+    - Loads all files and checks for existing shares with one query each
+    - Returns one result per requested vault item id
+    """
+    check_bulk_size(request.vault_item_ids)
+    
+    item_ids = set(request.vault_item_ids)
+    vault_items = db.query(VaultItem).filter(
+        VaultItem.id.in_(item_ids),
+        VaultItem.user_id == current_user.id,
+        VaultItem.type == VaultItemType.FILE.value
+    ).all() if item_ids else []
+    items_by_id = {item.id: item for item in vault_items}
+    
+    # A file counts as shared when the team has one with the same name and file name
+    names = {item.name for item in vault_items}
+    already_shared = {
+        (name, file_name) for name, file_name in db.query(
+            SharedVaultItem.name, SharedVaultItem.file_name
+        ).filter(
+            SharedVaultItem.team_id == team_id,
+            SharedVaultItem.name.in_(names)
+        )
+    } if names else set()
+    
+    team = db.query(Team).filter(Team.id == team_id).first()
+    dek = get_user_dek(db, current_user) if vault_items else None
+    
+    results = []
+    seen = set()
+    for item_id in request.vault_item_ids:
+        vault_item = items_by_id.get(item_id)
+        if item_id in seen:
+            status_value = "duplicate"
+        elif vault_item is None:
+            status_value = "not_found"
+        elif (vault_item.name, vault_item.file_name) in already_shared:
+            status_value = "already_shared"
+        else:
+            share_vault_item(db, team, vault_item, current_user, dek)
+            already_shared.add((vault_item.name, vault_item.file_name))
+            status_value = "shared"
+        results.append(BulkShareResult(vault_item_id=item_id, status=status_value))
+        seen.add(item_id)
+    
+    db.commit()
+    
+    return results
+
+
 @router.post("/{team_id}/share")
 async def share_file_with_team(
     team_id: int,
     request: ShareFileRequest,
+    caller_role: str = Depends(require_team_role(
+        TeamRole.OWNER.value, TeamRole.ADMIN.value, detail="Only owner or admin can share files"
+    )),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -263,18 +680,6 @@ async def share_file_with_team(
     Share a FILE with the team.
     Only OWNER and ADMIN can share files.
     """
-    # Verify user is owner or admin
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
-    
-    if membership.role not in [TeamRole.OWNER.value, TeamRole.ADMIN.value]:
-        raise HTTPException(status_code=403, detail="Only owner or admin can share files")
-    
     # Get the vault item
     vault_item = db.query(VaultItem).filter(
         VaultItem.id == request.vault_item_id,
@@ -295,20 +700,9 @@ async def share_file_with_team(
     if existing:
         raise HTTPException(status_code=400, detail="This file is already shared with the team")
     
-    # Create shared item
-    shared_item = SharedVaultItem(
-        team_id=team_id,
-        shared_by=current_user.id,
-        type=VaultItemType.FILE.value,
-        name=vault_item.name,
-        encrypted_data=vault_item.encrypted_data,
-        encryption_key=vault_item.encryption_key,
-        iv=vault_item.iv,
-        hash=vault_item.hash,
-        signature=vault_item.signature,
-        file_name=vault_item.file_name
-    )
-    db.add(shared_item)
+    # Reference the same ciphertext and wrap its key under the team key
+    team = db.query(Team).filter(Team.id == team_id).first()
+    share_vault_item(db, team, vault_item, current_user, get_user_dek(db, current_user))
     db.commit()
     
     return {"message": f"Shared '{vault_item.name}' with the team"}
@@ -317,22 +711,13 @@ async def share_file_with_team(
 @router.get("/{team_id}/shared", response_model=List[SharedFileResponse])
 async def get_shared_files(
     team_id: int,
-    current_user: User = Depends(get_current_user),
+    caller_role: str = Depends(require_team_role()),
     db: Session = Depends(get_db)
 ):
     """
     Get all shared files in a team.
     All members can view.
     """
-    # Verify user is member
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
-    
     shared_items = db.query(SharedVaultItem).filter(
         SharedVaultItem.team_id == team_id
     ).all()
@@ -355,22 +740,21 @@ async def get_shared_files(
 async def download_shared_file(
     team_id: int,
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    caller_role: str = Depends(require_team_role()),
     db: Session = Depends(get_db)
 ):
     """
     Download a shared file.
     All members can download.
-    """
-    # Verify user is member
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
     
+    - Streams the decrypted file with its guessed content type
+    - ETag is the content hash; If-None-Match returns 304 without decrypting
+    - A single byte range is served as 206 Partial Content
+    - Concurrent downloads of the same file share one decryption pass
+    """
     # Get the shared item
     shared_item = db.query(SharedVaultItem).filter(
         SharedVaultItem.id == item_id,
@@ -380,29 +764,95 @@ async def download_shared_file(
     if not shared_item:
         raise HTTPException(status_code=404, detail="Shared file not found")
     
-    # Decrypt the file
+    etag = etag_for(shared_item.hash)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache"
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Decrypt and verify off the event loop, once for all concurrent requests
+    flight, leader = download_flights.join(shared_download_key(shared_item))
+    if leader:
+        try:
+            chunks, size = await run_in_threadpool(open_shared_file, db, shared_item)
+        except BaseException as e:
+            download_flights.fail(flight, e)
+            raise
+        if download_flights.start(flight, chunks, size):
+            chunks = download_flights.stream(flight)
+        else:
+            chunks = iterate_in_threadpool(chunks)
+    elif await download_flights.follow(flight):
+        chunks, size = download_flights.stream(flight), flight.size
+    else:
+        chunks, size = await run_in_threadpool(open_shared_file, db, shared_item)
+        chunks = iterate_in_threadpool(chunks)
+    
+    content_type, _ = mimetypes.guess_type(shared_item.file_name or "")
+    if content_type is None:
+        content_type = "application/octet-stream"
+    headers["Content-Disposition"] = f'attachment; filename="{shared_item.file_name}"'
+    
+    # A stale If-Range validator means the client wants the whole new file
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    
     try:
-        encrypted_data = decode_base64(shared_item.encrypted_data)
-        key = decode_base64(shared_item.encryption_key)
-        iv = decode_base64(shared_item.iv)
-        
-        decrypted_data = decrypt_data(encrypted_data, key, iv)
-        
-        return Response(
-            content=decrypted_data,
-            media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f'attachment; filename="{shared_item.file_name}"'
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to decrypt file")
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(chunks, media_type=content_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_range(chunks, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=content_type,
+        headers=headers
+    )
+
+
+@router.post("/{team_id}/shared/archive")
+async def download_shared_archive(
+    team_id: int,
+    request: ArchiveRequest,
+    caller_role: str = Depends(require_team_role()),
+    db: Session = Depends(get_db)
+):
+    """
+    Download several shared files as one ZIP, streamed as it is built.
+    All members can download.
+    """
+    ids = archive_ids(request.ids)
+    
+    shared_items = db.query(SharedVaultItem).options(defer(SharedVaultItem.encrypted_data)).filter(
+        SharedVaultItem.id.in_(ids),
+        SharedVaultItem.team_id == team_id
+    ).all()
+    
+    found = {shared_item.id: shared_item for shared_item in shared_items}
+    missing = [item_id for item_id in ids if item_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Shared files not found: {missing}")
+    
+    keys = {item_id: shared_item_key(db, found[item_id]) for item_id in ids}
+    return archive_response(SharedVaultItem, keys, request.compression == "deflate", "team-files.zip")
 
 
 @router.delete("/{team_id}/shared/{item_id}")
 async def remove_shared_file(
     team_id: int,
     item_id: int,
+    caller_role: str = Depends(require_team_role()),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -410,15 +860,6 @@ async def remove_shared_file(
     Remove a shared file.
     Only OWNER, ADMIN, or the original sharer can remove.
     """
-    # Verify user is member
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
-    
-    if not membership:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
-    
     shared_item = db.query(SharedVaultItem).filter(
         SharedVaultItem.id == item_id,
         SharedVaultItem.team_id == team_id
@@ -429,7 +870,7 @@ async def remove_shared_file(
     
     # Check permission: owner, admin, or original sharer
     can_delete = (
-        membership.role in [TeamRole.OWNER.value, TeamRole.ADMIN.value] or
+        caller_role in [TeamRole.OWNER.value, TeamRole.ADMIN.value] or
         shared_item.shared_by == current_user.id
     )
     
@@ -437,6 +878,8 @@ async def remove_shared_file(
         raise HTTPException(status_code=403, detail="You don't have permission to remove this file")
     
     db.delete(shared_item)
+    db.flush()
+    release_blobs(db, [shared_item.blob_id])
     db.commit()
     
     return {"message": "Shared file removed"}
@@ -445,24 +888,30 @@ async def remove_shared_file(
 @router.delete("/{team_id}")
 async def delete_team(
     team_id: int,
-    current_user: User = Depends(get_current_user),
+    caller_role: str = Depends(require_team_role(TeamRole.OWNER.value, detail="Only team owner can delete the team")),
     db: Session = Depends(get_db)
 ):
     """
     Delete a team.
     Only OWNER can delete.
     """
-    membership = db.query(TeamMember).filter(
-        TeamMember.team_id == team_id,
-        TeamMember.user_id == current_user.id
-    ).first()
+    member_ids = [
+        user_id for (user_id,) in db.query(TeamMember.user_id).filter(TeamMember.team_id == team_id)
+    ]
+    blob_ids = [
+        blob_id for (blob_id,) in db.query(SharedVaultItem.blob_id).filter(
+            SharedVaultItem.team_id == team_id,
+            SharedVaultItem.blob_id.isnot(None)
+        )
+    ]
     
-    if not membership or membership.role != TeamRole.OWNER.value:
-        raise HTTPException(status_code=403, detail="Only team owner can delete the team")
+    # Members and shared items go with ON DELETE CASCADE, without loading their data
+    db.query(Team).filter(Team.id == team_id).delete(synchronize_session=False)
+    release_blobs(db, blob_ids)
+    db.commit()
     
-    team = db.query(Team).filter(Team.id == team_id).first()
-    if team:
-        db.delete(team)
-        db.commit()
+    dek_cache.delete(("team", team_id))
+    for user_id in member_ids:
+        team_role_cache.delete((team_id, user_id))
     
     return {"message": "Team deleted"}
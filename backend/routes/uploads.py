@@ -0,0 +1,433 @@
+"""
+Resumable (tus-style) file uploads.
+
+A client creates an upload session, sends the file in any number of PATCH
+requests that each carry the offset they start at, and finalizes the session
+into a vault file. Each segment is encrypted as it arrives and written to a
+temporary directory, so a dropped connection only loses the segment in
+flight and the server never holds the whole upload in one request.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from cryptography.exceptions import InvalidTag
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from database import SessionLocal, get_db
+from models import User, UploadSession, VaultItemType
+from auth.jwt import get_current_user
+from crypto.aes import encrypt_data, decrypt_data, generate_iv
+from crypto.envelope import derive_item_key
+from routes.vault import create_vault_item, get_user_dek, integrity_error
+
+router = APIRouter(prefix="/vault/uploads", tags=["Vault"])
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or os.path.join(tempfile.gettempdir(), "securevault-uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_SEGMENT_BYTES = int(os.getenv("UPLOAD_SEGMENT_BYTES", str(1024 * 1024)))
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+UPLOAD_SWEEP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_SWEEP_INTERVAL_SECONDS", "600"))
+
+IV_SIZE = 12
+SEGMENT_SUFFIX = ".part"
+
+
+# Request/Response Models
+class CreateUploadRequest(BaseModel):
+    name: str
+    file_name: Optional[str] = None
+    length: int = Field(..., ge=0)  # Total file size in bytes
+
+
+class UploadSessionResponse(BaseModel):
+    id: int
+    name: str
+    file_name: Optional[str]
+    length: int
+    offset: int
+    expires_at: str
+
+
+def session_response(upload: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=upload.id,
+        name=upload.name,
+        file_name=upload.file_name,
+        length=upload.length,
+        offset=upload.offset,
+        expires_at=upload.expires_at.isoformat()
+    )
+
+
+def upload_headers(upload: UploadSession) -> dict:
+    """tus-style headers describing an upload's progress."""
+    return {
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.length),
+        "Upload-Expires": upload.expires_at.isoformat(),
+        "Cache-Control": "no-store"
+    }
+
+
+def session_dir(session_id: int) -> str:
+    return os.path.join(UPLOAD_DIR, str(session_id))
+
+
+def get_upload_session(db: Session, session_id: int, user: User) -> UploadSession:
+    """
+    Get one of the user's live upload sessions.
+    
+    Raises:
+        HTTPException: 404 if the session does not exist, belongs to another
+        user or has expired
+    """
+    upload = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user.id,  # RBAC check
+        UploadSession.expires_at > datetime.utcnow()
+    ).first()
+    
+    if not upload:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+    return upload
+
+
+def upload_key(upload: UploadSession, dek: bytes) -> bytes:
+    """Derive the key that encrypts an upload's temporary segments."""
+    return derive_item_key(dek, upload.id, purpose=b"upload")
+
+
+def segment_associated_data(session_id: int, offset: int) -> bytes:
+    # Binds each segment to its session and position, so segments can't be reordered
+    return f"{session_id}:{offset}".encode()
+
+
+def write_segment(session_id: int, key: bytes, offset: int, data: bytes) -> str:
+    """
+    Encrypt a segment into a temporary file next to its final location.
+    
+    Returns:
+        Path of the temporary file (renamed into place once claimed)
+    """
+    directory = session_dir(session_id)
+    os.makedirs(directory, exist_ok=True)
+    
+    encrypted, iv = encrypt_data(data, key, generate_iv(), segment_associated_data(session_id, offset))
+    
+    temp_path = os.path.join(directory, f"{offset:016d}{SEGMENT_SUFFIX}.{uuid.uuid4().hex}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(iv + encrypted)
+    return temp_path
+
+
+async def store_segment(db: Session, upload: UploadSession, key: bytes, offset: int, data: bytes) -> int:
+    """
+    Persist one segment and advance the upload's offset.
+    
+    The offset is claimed with a conditional UPDATE, so two requests racing
+    on the same session can't both write at one position.
+    
+    Returns:
+        The new offset
+    """
+    end = offset + len(data)
+    if end > upload.length:
+        raise HTTPException(
+            status_code=413,
+            detail="Upload exceeds its declared length"
+        )
+    
+    temp_path = await run_in_threadpool(write_segment, upload.id, key, offset, data)
+    
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == upload.id,
+        UploadSession.offset == offset
+    ).update(
+        {
+            "offset": end,
+            "expires_at": datetime.utcnow() + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    
+    if not claimed:
+        os.remove(temp_path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload-Offset does not match the current offset"
+        )
+    
+    os.replace(temp_path, os.path.join(session_dir(upload.id), f"{offset:016d}{SEGMENT_SUFFIX}"))
+    return end
+
+
+def segments_pending_error() -> HTTPException:
+    """Build the 409 raised when a claimed segment's file is not in place yet."""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Upload segments are still being written, retry finalize"
+    )
+
+
+def assemble_upload(session_id: int, key: bytes, length: int) -> bytes:
+    """
+    Decrypt an upload's segments in order and join them.
+    
+    A segment's offset is committed just before its file is moved into
+    place, so a finalize racing the last PATCH can find it missing; that is
+    reported as 409 (not complete yet, retry) rather than as corruption.
+    
+    Raises:
+        HTTPException: 409 if a segment is not in place yet, 500 if one is tampered with
+    """
+    directory = session_dir(session_id)
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+    
+    parts = []
+    offset = 0
+    for name in names:
+        if int(name[:-len(SEGMENT_SUFFIX)]) != offset:
+            raise segments_pending_error()
+        
+        with open(os.path.join(directory, name), "rb") as f:
+            stored = f.read()
+        try:
+            part = decrypt_data(
+                stored[IV_SIZE:], key, stored[:IV_SIZE], segment_associated_data(session_id, offset)
+            )
+        except InvalidTag:
+            raise integrity_error("Data integrity check failed - upload segment corrupted")
+        
+        parts.append(part)
+        offset += len(part)
+    
+    if offset != length:
+        raise segments_pending_error()
+    
+    return b"".join(parts)
+
+
+def remove_session_dir(session_id: int):
+    shutil.rmtree(session_dir(session_id), ignore_errors=True)
+
+
+def sweep_expired_uploads() -> int:
+    """
+    Delete expired upload sessions and any chunk directory without a session.
+    
+    Returns:
+        Number of chunk directories removed
+    """
+    # List directories before reading live sessions: a directory is only
+    # created after its session row is committed
+    try:
+        entries = os.listdir(UPLOAD_DIR)
+    except FileNotFoundError:
+        entries = []
+    
+    db = SessionLocal()
+    try:
+        db.query(UploadSession).filter(
+            UploadSession.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        live_ids = {str(session_id) for (session_id,) in db.query(UploadSession.id)}
+    finally:
+        db.close()
+    
+    removed = 0
+    for entry in entries:
+        if entry not in live_ids:
+            shutil.rmtree(os.path.join(UPLOAD_DIR, entry), ignore_errors=True)
+            removed += 1
+    return removed
+
+
+async def run_upload_sweeper():
+    """Garbage-collect abandoned uploads every UPLOAD_SWEEP_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await run_in_threadpool(sweep_expired_uploads)
+            if removed:
+                print(f"[UPLOAD] Removed {removed} abandoned upload(s)")
+        except Exception as e:
+            print(f"[UPLOAD] Sweep failed: {e}")
+
+
+# Routes
+@router.post("", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    request: CreateUploadRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable file upload.
+    
+    - Declares the file's name and total length
+    - Returns the session id used by the PATCH and finalize routes
+    """
+    if request.length > UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Files larger than {UPLOAD_MAX_BYTES} bytes are not accepted"
+        )
+    
+    upload = UploadSession(
+        user_id=current_user.id,
+        name=request.name,
+        file_name=request.file_name,
+        length=request.length,
+        offset=0,
+        expires_at=datetime.utcnow() + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    )
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    
+    return session_response(upload)
+
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get an upload's progress."""
+    return session_response(get_upload_session(db, session_id, current_user))
+
+
+@router.head("/{session_id}")
+async def head_upload(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get an upload's offset in the Upload-Offset header (tus-style resume)."""
+    upload = get_upload_session(db, session_id, current_user)
+    return Response(status_code=status.HTTP_200_OK, headers=upload_headers(upload))
+
+
+@router.patch("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    session_id: int,
+    request: Request,
+    upload_offset: int = Header(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Append bytes to an upload.
+    
+    - Upload-Offset must equal the bytes received so far (409 otherwise)
+    - The body is encrypted in segments as it arrives; if the connection
+      drops, everything received up to then is kept
+    """
+    upload = get_upload_session(db, session_id, current_user)
+    
+    if upload_offset != upload.offset:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload-Offset does not match the current offset"
+        )
+    
+    key = upload_key(upload, get_user_dek(db, current_user))
+    offset = upload_offset
+    buffer = bytearray()
+    
+    try:
+        async for data in request.stream():
+            buffer += data
+            while len(buffer) >= UPLOAD_SEGMENT_BYTES:
+                offset = await store_segment(db, upload, key, offset, bytes(buffer[:UPLOAD_SEGMENT_BYTES]))
+                del buffer[:UPLOAD_SEGMENT_BYTES]
+    except ClientDisconnect:
+        pass  # Keep what arrived before the client left
+    
+    if buffer:
+        offset = await store_segment(db, upload, key, offset, bytes(buffer))
+    
+    db.refresh(upload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=upload_headers(upload))
+
+
+@router.post("/{session_id}/finalize", status_code=status.HTTP_201_CREATED)
+async def finalize_upload(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Turn a complete upload into an encrypted vault file.
+    
+    - Decrypts and joins the segments, then stores the file like a regular upload
+    - The vault item is created and the session removed in one transaction
+    """
+    upload = get_upload_session(db, session_id, current_user)
+    
+    if upload.offset != upload.length:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {upload.offset} of {upload.length} bytes received"
+        )
+    
+    dek = get_user_dek(db, current_user)
+    file_content = await run_in_threadpool(
+        assemble_upload, upload.id, upload_key(upload, dek), upload.length
+    )
+    
+    vault_item = create_vault_item(
+        db,
+        current_user,
+        dek,
+        VaultItemType.FILE.value,
+        upload.name,
+        file_content,
+        file_name=upload.file_name
+    )
+    
+    # A concurrent finalize of the same session loses here and creates nothing
+    removed = db.query(UploadSession).filter(UploadSession.id == upload.id).delete(synchronize_session=False)
+    if not removed:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+    
+    db.commit()
+    db.refresh(vault_item)
+    remove_session_dir(session_id)
+    
+    return {"message": "File uploaded and encrypted", "id": vault_item.id}
+
+
+@router.delete("/{session_id}")
+async def abort_upload(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Abort an upload and discard what was received."""
+    upload = get_upload_session(db, session_id, current_user)
+    
+    db.delete(upload)
+    db.commit()
+    remove_session_dir(session_id)
+    
+    return {"message": "Upload aborted"}
@@ -12,8 +12,10 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import VaultItem, VaultItemType
 from crypto.aes import decrypt_data
+from crypto.compression import decompress
 from crypto.encoding import decode_base64
 from crypto.password_health import analyze_password_health
+from routes.vault import get_user_dek, item_key
 import json
 
 
@@ -103,14 +105,15 @@ async def get_password_health(
     ).all()
     
     # Decrypt passwords for analysis
+    dek = get_user_dek(db, current_user)
     passwords = []
     for item in password_items:
         try:
             encrypted_data = decode_base64(item.encrypted_data)
-            key = decode_base64(item.encryption_key)
+            key = item_key(item, dek)
             iv = decode_base64(item.iv)
             
-            decrypted = decrypt_data(encrypted_data, key, iv)
+            decrypted = decompress(decrypt_data(encrypted_data, key, iv), item.compression)
             password_data = json.loads(decrypted.decode('utf-8'))
             
             passwords.append({
@@ -2,19 +2,46 @@
 Vault routes for storing and retrieving encrypted passwords and files.
 Implements RBAC - users can only access their own data.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import Response
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List, Optional
-
-from database import get_db
-from models import User, VaultItem, VaultItemType
+import os
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import FIRST_EXCEPTION, wait
+from datetime import datetime
+from itertools import accumulate
+from cryptography.exceptions import InvalidTag
+from fastapi import APIRouter, Depends, Header, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer, object_session
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Iterator, List, Literal, Optional
+
+from database import SessionLocal, get_db
+from models import (
+    User, VaultItem, VaultItemType, KeyScheme, ContentLayout, EncryptedBlob, FileRendition,
+    VaultItemVersion, VersionStorage
+)
 from auth.jwt import get_current_user
-from crypto.aes import generate_aes_key, encrypt_data, decrypt_data
+from chunkstore import (
+    CHUNK_ERRORS, add_chunk_references, chunk_merkle_root, dump_manifest, dump_refs, iter_chunk_entries, iter_chunks,
+    load_refs, manifest_compressed, manifest_size, parse_manifest, release_chunks, should_chunk, store_chunk_entries,
+    store_chunks
+)
+from crypto.aes import encrypt_data, decrypt_data, decrypt_stream
+from crypto.envelope import (
+    dek_cache, derive_convergence_key, derive_item_key, generate_dek, load_keks, unwrap_key, wrap_key
+)
+from crypto.compression import compress, decompress, decompress_chunks, decompress_stream
+from crypto.delta import apply_delta, make_delta
 from crypto.hashing import compute_sha256, verify_hash
-from crypto.rsa import sign_data, verify_signature
+from crypto.merkle import merkle_proofs, root_from_proof
+from crypto.signing import create_signature, verify_signature
 from crypto.encoding import encode_base64, decode_base64
+from crypto.pool import CRYPTO_WORKERS, get_crypto_executor
+from renditions import RENDITION_SIZES, render_rendition
+from streaming import archive_name, etag_for, etag_matches, stream_zip
 
 router = APIRouter(prefix="/vault", tags=["Vault"])
 
@@ -36,6 +63,18 @@ class PasswordResponse(BaseModel):
     created_at: str
 
 
+class PasswordSummaryResponse(BaseModel):
+    id: int
+    name: str
+    website: Optional[str]
+    username: str
+    created_at: str
+
+
+class RevealPasswordsRequest(BaseModel):
+    ids: List[int]
+
+
 class VaultItemResponse(BaseModel):
     id: int
     type: str
@@ -69,40 +108,515 @@ class NoteResponse(BaseModel):
     created_at: str
 
 
+MAX_NOTE_PATCH_OPERATIONS = 100
+
+
+class NotePatchOperation(BaseModel):
+    op: Literal["replace", "append"]
+    start: Optional[int] = None  # UTF-8 byte offsets of the replaced range (replace only)
+    end: Optional[int] = None
+    text: str = ""
+
+
+class NotePatchRequest(BaseModel):
+    title: Optional[str] = None
+    operations: List[NotePatchOperation] = []
+
+
+# Batch Models
+MAX_BATCH_OPERATIONS = 500
+
+
+class BatchOperation(BaseModel):
+    op: Literal["delete", "rename", "get"]
+    id: int
+    name: Optional[str] = Field(None, min_length=1, max_length=255)  # New name for rename operations
+    
+    @model_validator(mode="after")
+    def check_rename_name(self):
+        if self.op == "rename" and self.name is None:
+            raise ValueError("Rename requires a name")
+        return self
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+
+class BatchOperationResult(BaseModel):
+    op: str
+    id: int
+    status: str  # ok, not_found or error
+    detail: Optional[str] = None
+    data: Optional[Any] = None  # Decrypted payload for get operations
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+
+
+# Archive Models
+MAX_ARCHIVE_FILES = 500
+CIPHERTEXT_READ_CHARS = 1024 * 1024  # Base64 characters read per query (a multiple of 4)
+
+
+class ArchiveRequest(BaseModel):
+    ids: List[int]
+    compression: Literal["store", "deflate"] = "deflate"
+
+
+# Version Models
+# Previous versions kept per item; older ones are pruned
+VERSION_HISTORY_LIMIT = int(os.getenv("VERSION_HISTORY_LIMIT", "50"))
+# Every Nth version is a full snapshot, so a restore applies at most N deltas
+VERSION_SNAPSHOT_INTERVAL = int(os.getenv("VERSION_SNAPSHOT_INTERVAL", "10"))
+
+
+class VersionResponse(BaseModel):
+    version: int
+    name: str
+    file_name: Optional[str]
+    current: bool
+    storage: Optional[str]  # snapshot, delta or chunked; None for the current version
+    size: Optional[int]  # Content size, None for the current version
+    stored_bytes: Optional[int]  # Encrypted size of the stored version
+    created_at: str
+
+
+# Import Models
+MAX_IMPORT_ITEMS = 1000
+# Batch signatures cover this prefix and a hex Merkle root, so they can never
+# pass for a signature over a single item's hash
+BATCH_SIGNATURE_PREFIX = b"securevault:batch:"
+
+
+class ImportRequest(BaseModel):
+    passwords: List[PasswordStoreRequest] = []
+    notes: List[NoteStoreRequest] = []
+
+
 # Helper functions
-def encrypt_and_store(data: bytes) -> tuple[str, str, str, str, str]:
+def get_user_dek(db: Session, user: User) -> bytes:
+    """
+    Get the user's data-encryption key, unwrapping it at most once per TTL.
+    
+    Creates and stores a wrapped DEK the first time a user needs one.
+    
+    Returns:
+        32-byte DEK
+    """
+    dek = dek_cache.get(user.id)
+    if dek is not None:
+        return dek
+    
+    current_kek_id, keks = load_keks()
+    
+    if user.wrapped_dek is None:
+        dek = generate_dek()
+        # Only set the DEK if no concurrent request created one first
+        created = db.query(User).filter(
+            User.id == user.id,
+            User.wrapped_dek.is_(None)
+        ).update(
+            {"wrapped_dek": wrap_key(dek, keks[current_kek_id]), "kek_id": current_kek_id},
+            synchronize_session=False
+        )
+        db.commit()
+        db.refresh(user)
+        if not created:
+            dek = None
+    
+    if dek is None:
+        if user.kek_id not in keks:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Encryption key unavailable"
+            )
+        dek = unwrap_key(user.wrapped_dek, keks[user.kek_id])
+    
+    dek_cache.set(user.id, dek)
+    return dek
+
+
+def item_key(item: VaultItem, dek: bytes) -> bytes:
     """
-    Encrypt data and generate integrity proofs.
+    Get the AES key for an item.
     
+    Args:
+        item: VaultItem from database
+        dek: Owner's data-encryption key
+        
     Returns:
-        Tuple of (encrypted_data_b64, key_b64, iv_b64, hash, signature_b64)
+        32-byte AES key
+    """
+    if item.key_scheme == KeyScheme.USER_DEK.value:
+        return derive_item_key(dek, item.id)
+    return decode_base64(item.encryption_key)
+
+
+def encrypt_and_store(item: VaultItem, data: bytes, dek: bytes, sign: bool = True):
     """
-    # Generate AES key and encrypt
-    key = generate_aes_key()
-    encrypted, iv = encrypt_data(data, key)
+    Encrypt data into an item and generate integrity proofs.
     
-    # Compute hash for integrity
-    data_hash = compute_sha256(data)
+    The item key is derived from the owner's DEK and the item id, so the
+    item must already have an id (see create_vault_item). Large files and
+    notes are stored as deduplicated chunks and the item keeps their
+    encrypted manifest.
     
-    # Sign the hash for authenticity
-    signature = sign_data(data_hash.encode())
+    Args:
+        item: VaultItem to write encrypted_data, iv, hash and signature into
+        data: Plain bytes to encrypt
+        dek: Owner's data-encryption key
+        sign: Sign the hash now; False leaves it to sign_items
+    """
+    old_chunk_refs = item.chunk_refs
+    
+    if should_chunk(item.type, data) and item.type == VaultItemType.NOTE.value:
+        # Only the content is chunked (the title is the item's name), and the
+        # hash is a Merkle root so patches don't need the whole note
+        entries = store_chunk_entries(object_session(item), item.user_id, dek, note_content(data), note=True)
+        payload, compression, data_hash = dump_manifest(entries), None, chunk_merkle_root(entries)
+        item.layout = ContentLayout.CHUNKED.value
+        item.chunk_refs = dump_refs([entry[0] for entry in entries])
+    elif should_chunk(item.type, data):
+        payload, chunk_ids = store_chunks(object_session(item), item.user_id, dek, data)
+        compression, data_hash = None, compute_sha256(data)
+        item.layout = ContentLayout.CHUNKED.value
+        item.chunk_refs = dump_refs(chunk_ids)
+    else:
+        # Compress (skipped for data that doesn't shrink)
+        payload, compression = compress(data)
+        # Compute hash of the original data for integrity
+        data_hash = compute_sha256(data)
+        item.layout = ContentLayout.INLINE.value
+        item.chunk_refs = None
+    
+    seal_item(item, payload, compression, data_hash, dek, sign)
+    
+    # New content must not overwrite ciphertext that team shares still reference
+    if item.blob_id is not None:
+        db = object_session(item)
+        old_blob_id = item.blob_id
+        item.blob_id = None
+        db.flush()
+        release_blobs(db, [old_blob_id])
+    elif old_chunk_refs:
+        # Released after the new chunks were referenced, so chunks both versions share stay
+        release_chunks(object_session(item), load_refs(old_chunk_refs))
+
+
+def seal_item(
+    item: VaultItem,
+    payload: bytes,
+    compression: Optional[str],
+    data_hash: str,
+    dek: bytes,
+    sign: bool = True
+):
+    """
+    Encrypt a prepared payload into an item and sign its content hash.
+    
+    Args:
+        item: VaultItem to write encrypted_data, iv, hash and signature into
+        payload: Compressed content or chunk manifest
+        compression: Algorithm the payload was compressed with, or None
+        data_hash: Hex SHA-256 (or Merkle root) of the content
+        dek: Owner's data-encryption key
+        sign: Sign the hash now; False leaves it to sign_items
+    """
+    # Derive the item key and encrypt
+    key = derive_item_key(dek, item.id)
+    encrypted, iv = encrypt_data(payload, key)
     
     # Encode to Base64 for storage
-    return (
-        encode_base64(encrypted),
-        encode_base64(key),
-        encode_base64(iv),
-        data_hash,
-        encode_base64(signature)
+    item.encrypted_data = encode_base64(encrypted)
+    item.encryption_key = ""
+    item.key_scheme = KeyScheme.USER_DEK.value
+    item.iv = encode_base64(iv)
+    item.compression = compression
+    item.hash = data_hash
+    item.signature = ""
+    item.signature_algorithm = None
+    item.signature_key_id = None
+    item.signature_proof = None
+    
+    # Sign the hash for authenticity
+    if sign:
+        set_signature([item], data_hash.encode())
+
+
+def set_signature(items: list, data: bytes):
+    """Sign data with the current key and store the signature in items."""
+    algorithm, key_id, signature = create_signature(data)
+    for item in items:
+        item.signature = encode_base64(signature)
+        item.signature_algorithm = algorithm
+        item.signature_key_id = key_id
+
+
+def sign_items(items: list):
+    """
+    Sign the hashes of items written together with one signature.
+    
+    The signature covers the Merkle root of the items' hashes and each item
+    keeps the inclusion proof of its own hash, so a batch costs one
+    private-key operation and a page of it one verification.
+    """
+    import json
+    
+    if len(items) == 1:
+        set_signature(items, items[0].hash.encode())
+        items[0].signature_proof = None
+        return
+    
+    root, proofs = merkle_proofs([item.hash.encode() for item in items])
+    set_signature(items, BATCH_SIGNATURE_PREFIX + root.hex().encode())
+    for item, proof in zip(items, proofs):
+        item.signature_proof = json.dumps([[side, sibling.hex()] for side, sibling in proof])
+
+
+def signed_data(item) -> bytes:
+    """
+    Get the message a vault or shared item's signature covers: its hash, or
+    the Merkle root of its batch recomputed from the item's proof.
+    """
+    import json
+    
+    if item.signature_proof is None:
+        return item.hash.encode()
+    
+    proof = [(side, bytes.fromhex(sibling)) for side, sibling in json.loads(item.signature_proof)]
+    return BATCH_SIGNATURE_PREFIX + root_from_proof(item.hash.encode(), proof).hex().encode()
+
+
+def signature_valid(item) -> bool:
+    """Check a vault or shared item's signature over its hash."""
+    try:
+        return verify_signature(
+            signed_data(item),
+            decode_base64(item.signature),
+            item.signature_algorithm,
+            item.signature_key_id
+        )
+    except ValueError:
+        return False  # Malformed proof
+
+
+def note_content(data: bytes) -> bytes:
+    """Extract the UTF-8 content of a note payload."""
+    import json
+    
+    return json.loads(data.decode())["content"].encode()
+
+
+def note_payload(title: str, content: bytes) -> bytes:
+    """Build a note payload from its title and UTF-8 content."""
+    import json
+    
+    return json.dumps({"title": title, "content": content.decode()}).encode()
+
+
+def create_vault_item(
+    db: Session,
+    owner: User,
+    dek: bytes,
+    item_type: str,
+    name: str,
+    data: bytes,
+    file_name: Optional[str] = None,
+    sign: bool = True
+) -> VaultItem:
+    """
+    Add a new vault item and encrypt its data.
+    
+    The row is flushed first because the item key is derived from its id.
+    Pass sign=False for items that are signed together with sign_items.
+    
+    Returns:
+        The new VaultItem (not yet committed)
+    """
+    item = VaultItem(
+        user_id=owner.id,
+        type=item_type,
+        name=name,
+        file_name=file_name,
+        encrypted_data="",
+        encryption_key="",
+        iv="",
+        hash="",
+        signature=""
+    )
+    db.add(item)
+    db.flush()
+    
+    encrypt_and_store(item, data, dek, sign)
+    return item
+
+
+def item_ciphertext(item) -> str:
+    """
+    Get the Base64 ciphertext of a vault or shared item.
+    
+    Shared files keep their ciphertext in a reference-counted blob.
+    """
+    if item.blob_id is not None:
+        return item.blob.data
+    return item.encrypted_data
+
+
+def add_blob_reference(db: Session, item: VaultItem) -> int:
+    """
+    Add a reference to an item's ciphertext for a new share.
+    
+    The first time a file is shared its ciphertext moves from the item
+    into an EncryptedBlob, so every share points at the same data. A
+    chunked file's manifest takes its chunk references with it.
+    
+    Returns:
+        Id of the blob holding the item's ciphertext
+    """
+    if item.blob_id is None:
+        blob = EncryptedBlob(data=item.encrypted_data, chunk_refs=item.chunk_refs, ref_count=1)
+        db.add(blob)
+        db.flush()
+        item.blob_id = blob.id
+        item.encrypted_data = ""
+        item.chunk_refs = None
+    
+    db.query(EncryptedBlob).filter(EncryptedBlob.id == item.blob_id).update(
+        {EncryptedBlob.ref_count: EncryptedBlob.ref_count + 1},
+        synchronize_session=False
     )
+    return item.blob_id
+
+
+def release_blobs(db: Session, blob_ids: list):
+    """
+    Drop one reference per entry in blob_ids and delete unreferenced blobs,
+    along with the file chunks only they referenced.
+    
+    Rows pointing at the blobs must already be deleted or flushed.
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id is not None)
+    
+    for blob_id, count in counts.items():
+        db.query(EncryptedBlob).filter(EncryptedBlob.id == blob_id).update(
+            {EncryptedBlob.ref_count: EncryptedBlob.ref_count - count},
+            synchronize_session=False
+        )
+    
+    if counts:
+        unreferenced = db.query(EncryptedBlob).filter(
+            EncryptedBlob.id.in_(counts),
+            EncryptedBlob.ref_count <= 0
+        )
+        chunk_ids = [
+            chunk_id
+            for (chunk_refs,) in unreferenced.with_entities(EncryptedBlob.chunk_refs)
+            for chunk_id in load_refs(chunk_refs)
+        ]
+        unreferenced.delete(synchronize_session=False)
+        release_chunks(db, chunk_ids)
+
+
+def delete_vault_items(db: Session, items: List[VaultItem]):
+    """
+    Delete vault items and their versions, and release the shared ciphertext
+    and chunks they reference.
+    """
+    # Versions go with their items (ON DELETE CASCADE), so their chunk references are read first
+    version_refs = db.query(VaultItemVersion.chunk_refs).filter(
+        VaultItemVersion.item_id.in_([item.id for item in items]),
+        VaultItemVersion.chunk_refs.isnot(None)
+    ).all()
+    
+    for item in items:
+        db.delete(item)
+    db.flush()
+    release_blobs(db, [item.blob_id for item in items])
+    release_chunks(db, [chunk_id for item in items for chunk_id in load_refs(item.chunk_refs)])
+    release_chunks(db, [chunk_id for (chunk_refs,) in version_refs for chunk_id in load_refs(chunk_refs)])
+
+
+def integrity_error(detail: str) -> HTTPException:
+    """Build the 500 error raised when an item fails an integrity check."""
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=detail
+    )
+
+
+def decrypt_payload(item: VaultItem, dek: bytes, signature_checked: bool = False) -> bytes:
+    """
+    Decrypt an item's stored payload without decompressing it.
+    
+    Args:
+        signature_checked: The caller already verified the signature
+            (see check_signatures)
+    
+    Raises:
+        HTTPException: If the GCM tag or the signature is invalid
+    """
+    # Decode from Base64
+    encrypted = decode_base64(item_ciphertext(item))
+    key = item_key(item, dek)
+    iv = decode_base64(item.iv)
+    
+    # Decrypt (GCM tag check detects tampered ciphertext)
+    try:
+        payload = decrypt_data(encrypted, key, iv)
+    except InvalidTag:
+        raise integrity_error("Data integrity check failed - decryption failed")
+    
+    # Verify signature
+    if not signature_checked and not signature_valid(item):
+        raise integrity_error("Data authenticity check failed - signature invalid")
+    
+    return payload
+
+
+def read_chunked_content(db: Session, manifest: bytes) -> bytes:
+    """
+    Decrypt and join the content of a chunked file.
+    
+    Raises:
+        HTTPException: If a chunk is missing or fails authentication
+    """
+    try:
+        return b"".join(iter_chunks(manifest, db))
+    except CHUNK_ERRORS:
+        raise integrity_error("Data integrity check failed - file chunk missing or corrupt")
+
+
+def read_chunked_note(db: Session, manifest: bytes, title: str, merkle_root: str, dek: bytes) -> bytes:
+    """
+    Rebuild the payload of a chunked note.
+    
+    The manifest must match the note's Merkle root, and every chunk must
+    match its key, which is an HMAC of the chunk's content.
+    
+    Raises:
+        HTTPException: If the root doesn't match or a chunk is missing or corrupt
+    """
+    try:
+        entries = parse_manifest(manifest)
+        if chunk_merkle_root(entries) != merkle_root:
+            raise integrity_error("Data integrity check failed - hash mismatch")
+        content = b"".join(iter_chunk_entries(entries, db, derive_convergence_key(dek)))
+    except CHUNK_ERRORS:
+        raise integrity_error("Data integrity check failed - note chunk missing or corrupt")
+    
+    return note_payload(title, content)
 
 
-def decrypt_and_verify(item: VaultItem) -> bytes:
+def decrypt_and_verify(item: VaultItem, dek: bytes, signature_checked: bool = False) -> bytes:
     """
     Decrypt data and verify integrity.
     
     Args:
         item: VaultItem from database
+        dek: Owner's data-encryption key
+        signature_checked: The caller already verified the signature
         
     Returns:
         Decrypted data bytes
@@ -110,30 +624,779 @@ def decrypt_and_verify(item: VaultItem) -> bytes:
     Raises:
         HTTPException: If integrity check fails
     """
-    # Decode from Base64
-    encrypted = decode_base64(item.encrypted_data)
-    key = decode_base64(item.encryption_key)
-    iv = decode_base64(item.iv)
-    signature = decode_base64(item.signature)
+    payload = decrypt_payload(item, dek, signature_checked)
+    if item.layout == ContentLayout.CHUNKED.value and item.type == VaultItemType.NOTE.value:
+        # Verified against the Merkle root as the chunks are read
+        return read_chunked_note(object_session(item), payload, item.name, item.hash, dek)
+    if item.layout == ContentLayout.CHUNKED.value:
+        decrypted = read_chunked_content(object_session(item), payload)
+    else:
+        decrypted = decompress(payload, item.compression)
+    
+    # Verify hash
+    if not verify_hash(decrypted, item.hash):
+        raise integrity_error("Data integrity check failed - hash mismatch")
     
-    # Decrypt
-    decrypted = decrypt_data(encrypted, key, iv)
+    return decrypted
+
+
+def decrypt_and_verify_stream(item: VaultItem, dek: bytes) -> Iterator[bytes]:
+    """
+    Decrypt an item and stream its plaintext, decompressing chunk by chunk.
+    
+    The GCM tag and signature are checked before this returns. The hash is
+    checked as the last chunk is produced; on mismatch the stream is aborted.
+    
+    Raises:
+        HTTPException: If the GCM tag or the signature is invalid
+    """
+    import hashlib
+    
+    payload = decrypt_payload(item, dek)
+    if item.layout == ContentLayout.CHUNKED.value:
+        # Chunks are read with their own session; the response outlives the request's
+        plaintext = iter_chunks(payload)
+    else:
+        plaintext = decompress_stream(payload, item.compression)
+    
+    def stream():
+        digest = hashlib.sha256()
+        try:
+            for chunk in plaintext:
+                digest.update(chunk)
+                yield chunk
+        except CHUNK_ERRORS:
+            raise RuntimeError(f"Integrity check failed while streaming item {item.id}")
+        if digest.hexdigest() != item.hash:
+            raise RuntimeError(f"Integrity check failed while streaming item {item.id}")
+    
+    return stream()
+
+
+def encrypt_display_data(item: VaultItem, metadata: dict, dek: bytes):
+    """
+    Encrypt lightweight display metadata into an item with the item's key.
+    
+    Uses its own IV so it can be decrypted without touching the secret.
+    """
+    import json
+    
+    encrypted, iv = encrypt_data(json.dumps(metadata).encode(), item_key(item, dek))
+    item.display_data = encode_base64(encrypted)
+    item.display_iv = encode_base64(iv)
+
+
+def decrypt_display_data(item: VaultItem, dek: bytes) -> dict:
+    """
+    Decrypt an item's display metadata.
+    
+    AES-GCM authenticates the metadata, so no hash or signature check is needed.
+    
+    Raises:
+        HTTPException: If the metadata was tampered with
+    """
+    import json
+    
+    try:
+        decrypted = decrypt_data(
+            decode_base64(item.display_data),
+            item_key(item, dek),
+            decode_base64(item.display_iv)
+        )
+    except InvalidTag:
+        raise integrity_error("Data integrity check failed - decryption failed")
+    return json.loads(decrypted.decode())
+
+
+def password_response(item: VaultItem, decrypted: bytes) -> PasswordResponse:
+    """Build a PasswordResponse from a decrypted password item."""
+    import json
+    
+    data = json.loads(decrypted.decode())
+    return PasswordResponse(
+        id=item.id,
+        name=item.name,
+        website=data.get("website"),
+        username=data["username"],
+        password=data["password"],
+        created_at=item.created_at.isoformat()
+    )
+
+
+def iter_ciphertext(db: Session, item) -> Iterator[bytes]:
+    """
+    Read a vault or shared item's ciphertext in pieces with SQL substr.
+    
+    Only one piece of the Base64 column is in memory at a time, however
+    large the file is.
+    """
+    if item.blob_id is not None:
+        column, condition = EncryptedBlob.data, EncryptedBlob.id == item.blob_id
+    else:
+        model = type(item)
+        column, condition = model.encrypted_data, model.id == item.id
+    
+    length = db.query(func.length(column)).filter(condition).scalar() or 0
+    for start in range(0, length, CIPHERTEXT_READ_CHARS):
+        piece = db.query(func.substr(column, start + 1, CIPHERTEXT_READ_CHARS)).filter(condition).scalar()
+        yield decode_base64(piece)
+
+
+def decrypt_manifest(item, key: bytes) -> bytes:
+    """
+    Decrypt the manifest of a chunked vault or shared file.
+    
+    Raises:
+        InvalidTag: If the manifest was tampered with
+    """
+    return decrypt_data(decode_base64(item_ciphertext(item)), key, decode_base64(item.iv))
+
+
+def content_compressed(item, key: bytes) -> bool:
+    """Whether a file's content shrank when stored (for chunked files, most of it)."""
+    if item.layout != ContentLayout.CHUNKED.value:
+        return item.compression is not None
+    try:
+        return manifest_compressed(decrypt_manifest(item, key))
+    except CHUNK_ERRORS:
+        return False  # decrypt_item_chunks reports the failure
+
+
+def decrypt_item_chunks(db: Session, item, key: bytes) -> Iterator[bytes]:
+    """
+    Stream a vault or shared item's plaintext chunk by chunk.
+    
+    The signature is checked first. The GCM tag and the hash are checked
+    after the last chunk; on failure the stream is aborted.
+    """
+    import hashlib
+    
+    if not signature_valid(item):
+        raise RuntimeError(f"Signature check failed for item {item.id}")
+    
+    digest = hashlib.sha256()
+    try:
+        if item.layout == ContentLayout.CHUNKED.value:
+            plaintext = iter_chunks(decrypt_manifest(item, key), db)
+        else:
+            plaintext = decompress_chunks(
+                decrypt_stream(iter_ciphertext(db, item), key, decode_base64(item.iv)),
+                item.compression
+            )
+        for chunk in plaintext:
+            digest.update(chunk)
+            yield chunk
+    except CHUNK_ERRORS:
+        raise RuntimeError(f"Integrity check failed while streaming item {item.id}")
+    
+    if digest.hexdigest() != item.hash:
+        raise RuntimeError(f"Integrity check failed while streaming item {item.id}")
+
+
+def archive_stream(model, keys: dict, deflate: bool) -> Iterator[bytes]:
+    """
+    Stream a ZIP of vault or shared files.
+    
+    Uses its own session because the request's session may be closed while
+    the response is still streaming. Items are loaded one at a time without
+    their ciphertext column.
+    
+    Args:
+        model: VaultItem or SharedVaultItem
+        keys: Item id -> AES content key, in archive order (already authorized)
+        deflate: Deflate entries whose content compressed when stored
+    """
+    db = SessionLocal()
+    
+    def entries():
+        used_names = set()
+        for item_id, key in keys.items():
+            item = db.query(model).options(defer(model.encrypted_data)).filter(model.id == item_id).first()
+            if item is None:
+                continue  # Deleted since the request was authorized
+            # Content that didn't shrink when stored won't shrink in the ZIP either
+            yield (
+                archive_name(item.file_name or item.name, used_names),
+                item.created_at,
+                deflate and content_compressed(item, key),
+                decrypt_item_chunks(db, item, key)
+            )
+    
+    try:
+        yield from stream_zip(entries())
+    finally:
+        db.close()
+
+
+def archive_ids(ids: List[int]) -> List[int]:
+    """Deduplicate requested archive ids, keeping their order, and check the limit."""
+    ids = list(dict.fromkeys(ids))
+    if not ids or len(ids) > MAX_ARCHIVE_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archives must contain between 1 and {MAX_ARCHIVE_FILES} files"
+        )
+    return ids
+
+
+def archive_response(model, keys: dict, deflate: bool, file_name: str) -> StreamingResponse:
+    return StreamingResponse(
+        archive_stream(model, keys, deflate),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"'
+        }
+    )
+
+
+def check_signatures(items: list) -> set:
+    """
+    Verify the signatures of several items, once per distinct signature.
+    
+    Items signed in one batch share a signature over the same Merkle root,
+    so a page of them costs one signature verification plus a few hashes each.
+    
+    Returns:
+        Ids of the items whose signature is invalid
+    """
+    verified = {}
+    invalid = set()
+    for item in items:
+        try:
+            signed = signed_data(item)
+        except ValueError:
+            invalid.add(item.id)  # Malformed proof
+            continue
+        
+        key = (signed, item.signature, item.signature_algorithm, item.signature_key_id)
+        if key not in verified:
+            verified[key] = verify_signature(
+                signed,
+                decode_base64(item.signature),
+                item.signature_algorithm,
+                item.signature_key_id
+            )
+        if not verified[key]:
+            invalid.add(item.id)
+    return invalid
+
+
+def decrypt_and_verify_many(items: List[VaultItem], dek: bytes, fail_fast: bool = True) -> list:
+    """
+    Decrypt and verify several items on the shared crypto thread pool.
+    
+    Args:
+        items: VaultItems from database (attributes already loaded)
+        dek: Owner's data-encryption key
+        fail_fast: Raise on the first integrity failure and cancel the
+            remaining work, instead of reporting failures per item
+        
+    Returns:
+        List in the same order as items. With fail_fast=False, entries for
+        items that failed verification are the HTTPException instead of bytes.
+        
+    Raises:
+        HTTPException: If fail_fast is set and any integrity check fails
+    """
+    invalid_signatures = check_signatures(items)
+    
+    def decrypt_checked(item: VaultItem) -> bytes:
+        if item.id in invalid_signatures:
+            raise integrity_error("Data authenticity check failed - signature invalid")
+        return decrypt_and_verify(item, dek, signature_checked=True)
+    
+    # Chunked files read their chunks through the session, which can't leave this thread
+    chunked = any(item.layout == ContentLayout.CHUNKED.value for item in items)
+    if len(items) <= 1 or CRYPTO_WORKERS <= 1 or chunked:
+        results = []
+        for item in items:
+            try:
+                results.append(decrypt_checked(item))
+            except HTTPException as e:
+                if fail_fast:
+                    raise
+                results.append(e)
+        return results
+    
+    # Load any shared blobs here; the session must not be used from workers
+    for item in items:
+        item_ciphertext(item)
+    
+    executor = get_crypto_executor()
+    futures = [executor.submit(decrypt_checked, item) for item in items]
+    
+    if fail_fast:
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                for other in pending:
+                    other.cancel()
+                raise future.exception()
+        return [future.result() for future in futures]
+    
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except HTTPException as e:
+            results.append(e)
+    return results
+
+
+def rendition_associated_data(item: VaultItem, size: int) -> bytes:
+    # Ties a rendition to its item and size, so rows can't be swapped
+    return f"rendition:{item.id}:{size}".encode()
+
+
+def get_rendition(db: Session, item: VaultItem, dek: bytes, content_type: str, size: int) -> Optional[tuple]:
+    """
+    Get a file's preview rendition, rendering and storing it on first use.
+    
+    Renditions are encrypted with the item key and rebuilt when the file's
+    content hash no longer matches the one they were rendered from.
+    
+    Returns:
+        Tuple of (rendition bytes, content type), or None if no rendition
+        can be made for this file
+    """
+    rendition = db.query(FileRendition).filter(
+        FileRendition.item_id == item.id,
+        FileRendition.size == size
+    ).first()
+    
+    key = item_key(item, dek)
+    associated_data = rendition_associated_data(item, size)
+    
+    if rendition is not None and rendition.source_hash == item.hash:
+        try:
+            data = decrypt_data(
+                decode_base64(rendition.encrypted_data), key, decode_base64(rendition.iv), associated_data
+            )
+            return data, rendition.content_type
+        except InvalidTag:
+            pass  # Re-render over a corrupted rendition
+    
+    rendered = render_rendition(decrypt_and_verify(item, dek), content_type, size)
+    if rendered is None:
+        return None
+    
+    data, rendered_type = rendered
+    encrypted, iv = encrypt_data(data, key, associated_data=associated_data)
+    
+    if rendition is None:
+        rendition = FileRendition(item_id=item.id, size=size)
+        db.add(rendition)
+    rendition.content_type = rendered_type
+    rendition.encrypted_data = encode_base64(encrypted)
+    rendition.iv = encode_base64(iv)
+    rendition.source_hash = item.hash
+    
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same rendition first
+        db.rollback()
+    
+    return rendered
+
+
+def version_key(item: VaultItem, dek: bytes) -> bytes:
+    # Separate from the item key, which changes when a legacy item is rewritten
+    return derive_item_key(dek, item.id, purpose=b"version")
+
+
+def version_associated_data(item: VaultItem, version: int) -> bytes:
+    # Ties a stored version to its item and number, so rows can't be swapped
+    return f"version:{item.id}:{version}".encode()
+
+
+def archive_current_version(
+    db: Session,
+    item: VaultItem,
+    dek: bytes,
+    new_data: Optional[bytes]
+) -> VaultItemVersion:
+    """
+    Keep an item's current content as a previous version before it is replaced.
+    
+    Chunked files and notes keep their manifest, and the version takes its
+    own references to the chunks. Other content is stored as a delta against
+    new_data, or in full every VERSION_SNAPSHOT_INTERVAL versions (or when
+    the delta would be no smaller).
+    
+    Args:
+        db: Session of the update
+        item: VaultItem whose current content is being replaced
+        dek: Owner's data-encryption key
+        new_data: Content replacing it; may be None for chunked items
+        
+    Returns:
+        The new VaultItemVersion (not yet committed)
+        
+    Raises:
+        HTTPException: If the current content fails its integrity checks
+    """
+    version = item.version or 1
+    chunk_refs = None
+    
+    if item.layout == ContentLayout.CHUNKED.value:
+        payload = decrypt_payload(item, dek)
+        storage, compression, size = VersionStorage.CHUNKED.value, None, manifest_size(payload)
+        chunk_refs = item.blob.chunk_refs if item.blob_id is not None else item.chunk_refs
+        add_chunk_references(db, load_refs(chunk_refs))
+    else:
+        content = decrypt_and_verify(item, dek)
+        size = len(content)
+        storage, payload = VersionStorage.SNAPSHOT.value, content
+        # A chunked note is rebuilt with its current name as the title, so
+        # nothing is stored as a delta against one
+        if version % VERSION_SNAPSHOT_INTERVAL != 0 and not should_chunk(item.type, new_data):
+            delta = make_delta(new_data, content)
+            if len(delta) < len(content):
+                storage, payload = VersionStorage.DELTA.value, delta
+        payload, compression = compress(payload)
+    
+    encrypted, iv = encrypt_data(
+        payload, version_key(item, dek), associated_data=version_associated_data(item, version)
+    )
+    
+    previous = VaultItemVersion(
+        item_id=item.id,
+        version=version,
+        name=item.name,
+        file_name=item.file_name,
+        storage=storage,
+        encrypted_data=encode_base64(encrypted),
+        iv=encode_base64(iv),
+        compression=compression,
+        chunk_refs=chunk_refs,
+        size=size,
+        hash=item.hash,
+        created_at=item.updated_at or item.created_at
+    )
+    db.add(previous)
+    return previous
+
+
+def prune_versions(db: Session, item: VaultItem):
+    """
+    Delete versions beyond VERSION_HISTORY_LIMIT, oldest first.
+    
+    Every version is stored against a newer one, so dropping the oldest
+    never breaks the rest of the history.
+    """
+    oldest_kept = (item.version or 1) - VERSION_HISTORY_LIMIT
+    pruned = db.query(VaultItemVersion.id, VaultItemVersion.chunk_refs).filter(
+        VaultItemVersion.item_id == item.id,
+        VaultItemVersion.version < oldest_kept
+    ).all()
+    if not pruned:
+        return
+    
+    db.query(VaultItemVersion).filter(
+        VaultItemVersion.id.in_([row.id for row in pruned])
+    ).delete(synchronize_session=False)
+    release_chunks(db, [chunk_id for row in pruned for chunk_id in load_refs(row.chunk_refs)])
+
+
+def update_item_content(db: Session, item: VaultItem, dek: bytes, data: bytes):
+    """
+    Replace an item's content, keeping the current content as a version.
+    
+    Raises:
+        HTTPException: 409 if a concurrent update replaced the content first,
+            or 500 if the current content fails its integrity checks
+    """
+    begin_item_update(db, item, dek, data)
+    encrypt_and_store(item, data, dek)
+    finish_item_update(db, item)
+
+
+def begin_item_update(db: Session, item: VaultItem, dek: bytes, new_data: Optional[bytes]):
+    """
+    Claim the next version of an item and archive its current content.
+    
+    Call finish_item_update once the new content is written.
+    
+    Raises:
+        HTTPException: 409 if a concurrent update replaced the content first,
+            or 500 if the current content fails its integrity checks
+    """
+    version = item.version or 1
+    
+    # Claim the next version number; a concurrent update of the same version loses here
+    current = VaultItem.version == version if item.version is not None else VaultItem.version.is_(None)
+    claimed = db.query(VaultItem).filter(VaultItem.id == item.id, current).update(
+        {"version": version + 1},
+        synchronize_session=False
+    )
+    if not claimed:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Item was modified by another request, reload and try again"
+        )
+    
+    archive_current_version(db, item, dek, new_data)
+
+
+def finish_item_update(db: Session, item: VaultItem):
+    """Make an item's new content its next version and prune old versions."""
+    item.version = (item.version or 1) + 1
+    item.updated_at = datetime.utcnow()
+    prune_versions(db, item)
+
+
+def decrypt_version_payload(item: VaultItem, previous: VaultItemVersion, dek: bytes) -> bytes:
+    """
+    Decrypt a stored version into its content (snapshots and chunked
+    versions) or its delta.
+    
+    Raises:
+        HTTPException: If the version was tampered with
+    """
+    try:
+        payload = decrypt_data(
+            decode_base64(previous.encrypted_data),
+            version_key(item, dek),
+            decode_base64(previous.iv),
+            version_associated_data(item, previous.version)
+        )
+    except InvalidTag:
+        raise integrity_error("Data integrity check failed - version decryption failed")
+    
+    if previous.storage == VersionStorage.CHUNKED.value and item.type == VaultItemType.NOTE.value:
+        return read_chunked_note(object_session(item), payload, previous.name, previous.hash, dek)
+    if previous.storage == VersionStorage.CHUNKED.value:
+        return read_chunked_content(object_session(item), payload)
+    return decompress(payload, previous.compression)
+
+
+def version_content(db: Session, item: VaultItem, dek: bytes, version: int) -> tuple:
+    """
+    Rebuild a previous version of an item.
+    
+    Starts from the nearest newer snapshot or chunked version (or the
+    current content) and applies the deltas in between, newest first.
+    
+    Returns:
+        Tuple of (VaultItemVersion, content)
+        
+    Raises:
+        HTTPException: 404 if the version doesn't exist, 500 if any part of
+            the chain fails its integrity checks
+    """
+    chain = []
+    for previous in db.query(VaultItemVersion).filter(
+        VaultItemVersion.item_id == item.id,
+        VaultItemVersion.version >= version
+    ).order_by(VaultItemVersion.version):
+        if previous.version != version + len(chain):
+            raise integrity_error("Data integrity check failed - version history is incomplete")
+        chain.append(previous)
+        if previous.storage != VersionStorage.DELTA.value:
+            break
+    
+    if not chain or chain[0].version != version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version not found"
+        )
+    
+    target = chain[0]
+    if chain[-1].storage == VersionStorage.DELTA.value:
+        # The newest delta is stored against the current content
+        if chain[-1].version + 1 != (item.version or 1):
+            raise integrity_error("Data integrity check failed - version history is incomplete")
+        content = decrypt_and_verify(item, dek)
+    else:
+        content = decrypt_version_payload(item, chain.pop(), dek)
+    
+    for previous in reversed(chain):
+        try:
+            content = apply_delta(content, decrypt_version_payload(item, previous, dek))
+        except ValueError:
+            raise integrity_error("Data integrity check failed - version delta is corrupt")
+    
+    # A chunked note's hash is a Merkle root, checked as its chunks were read
+    chunked_note = target.storage == VersionStorage.CHUNKED.value and item.type == VaultItemType.NOTE.value
+    if not chunked_note and not verify_hash(content, target.hash):
+        raise integrity_error("Data integrity check failed - version hash mismatch")
+    
+    return target, content
+
+
+def refresh_password_display_data(item: VaultItem, data: bytes, dek: bytes):
+    """Re-encrypt a password's display metadata from its (restored) content."""
+    import json
+    
+    password = json.loads(data.decode())
+    encrypt_display_data(
+        item,
+        {"website": password.get("website"), "username": password["username"]},
+        dek
+    )
+
+
+def note_edit_range(operation: NotePatchOperation, size: int) -> tuple:
+    """
+    Resolve a note patch operation to the byte range it replaces.
+    
+    Raises:
+        HTTPException: 400 if the range is outside the content
+    """
+    if operation.op == "append":
+        return size, size
+    if operation.start is None or operation.end is None or not 0 <= operation.start <= operation.end <= size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Replace needs 0 <= start <= end <= {size}"
+        )
+    return operation.start, operation.end
+
+
+def check_char_boundary(data: bytes, offset: int):
+    # UTF-8 continuation bytes look like 0b10xxxxxx
+    if offset < len(data) and data[offset] & 0xC0 == 0x80:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patch offsets must fall between UTF-8 characters"
+        )
+
+
+def patch_note_content(content: bytes, operations: List[NotePatchOperation]) -> bytes:
+    """Apply patch operations, in order, to the content of an inline note."""
+    for operation in operations:
+        start, end = note_edit_range(operation, len(content))
+        check_char_boundary(content, start)
+        check_char_boundary(content, end)
+        content = content[:start] + operation.text.encode() + content[end:]
+    return content
+
+
+def patch_chunked_note(db: Session, item: VaultItem, dek: bytes, operations: List[NotePatchOperation]) -> tuple:
+    """
+    Apply patch operations, in order, to a chunked note.
+    
+    Each operation reads, re-chunks and writes only the chunks its range
+    touches; the rest of the manifest is kept as it is.
+    
+    Returns:
+        Tuple of (new manifest entries, ids of the chunks that were replaced).
+        The replaced chunks must be released once the new manifest is stored.
+        
+    Raises:
+        HTTPException: 400 for an invalid range, 500 if the note fails its
+            integrity checks
+    """
+    try:
+        entries = parse_manifest(decrypt_payload(item, dek))
+    except ValueError:
+        raise integrity_error("Data integrity check failed - note manifest is corrupt")
+    if chunk_merkle_root(entries) != item.hash:
+        raise integrity_error("Data integrity check failed - hash mismatch")
+    
+    convergence_key = derive_convergence_key(dek)
+    replaced = []
+    for operation in operations:
+        # offsets[i] is where chunk i starts; the last offset is the note's size
+        offsets = list(accumulate((entry[2] for entry in entries), initial=0))
+        start, end = note_edit_range(operation, offsets[-1])
+        
+        # The chunks holding the range; an insert at the end goes into the last chunk
+        if entries:
+            first = min(bisect_right(offsets, start) - 1, len(entries) - 1)
+            last = max(first, bisect_right(offsets, end - 1) - 1)
+        else:
+            first, last = 0, -1
+        
+        try:
+            region = b"".join(iter_chunk_entries(entries[first:last + 1], db, convergence_key))
+        except CHUNK_ERRORS:
+            raise integrity_error("Data integrity check failed - note chunk missing or corrupt")
+        
+        region_start = offsets[first] if entries else 0
+        check_char_boundary(region, start - region_start)
+        check_char_boundary(region, end - region_start)
+        region = region[:start - region_start] + operation.text.encode() + region[end - region_start:]
+        
+        replaced.extend(entry[0] for entry in entries[first:last + 1])
+        entries[first:last + 1] = store_chunk_entries(db, item.user_id, dek, region, note=True)
+    
+    return entries, replaced
+
+
+def apply_note_patch(
+    db: Session,
+    item: VaultItem,
+    dek: bytes,
+    title: Optional[str],
+    operations: List[NotePatchOperation]
+) -> int:
+    """
+    Patch a note's content and title, keeping the previous content as a version.
+    
+    Returns:
+        Size of the new content in bytes
+    """
+    import json
+    
+    title = title or item.name
+    
+    if item.layout == ContentLayout.CHUNKED.value:
+        begin_item_update(db, item, dek, None)
+        entries, replaced = patch_chunked_note(db, item, dek, operations)
+        seal_item(item, dump_manifest(entries), None, chunk_merkle_root(entries), dek)
+        item.chunk_refs = dump_refs([entry[0] for entry in entries])
+        # Released after the new chunks were referenced, so chunks both versions share stay
+        release_chunks(db, replaced)
+        finish_item_update(db, item)
+        size = sum(entry[2] for entry in entries)
+    else:
+        content = json.loads(decrypt_and_verify(item, dek).decode())["content"].encode()
+        content = patch_note_content(content, operations)
+        update_item_content(db, item, dek, note_payload(title, content))
+        size = len(content)
+    
+    item.name = title
+    return size
+
+
+def get_owned_item(db: Session, item_id: int, user: User) -> VaultItem:
+    """
+    Load one of the user's vault items.
+    
+    Raises:
+        HTTPException: 404 if the item doesn't exist or belongs to someone else
+    """
+    item = db.query(VaultItem).filter(
+        VaultItem.id == item_id,
+        VaultItem.user_id == user.id
+    ).first()
     
-    # Verify hash
-    if not verify_hash(decrypted, item.hash):
+    if not item:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Data integrity check failed - hash mismatch"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found or access denied"
         )
+    return item
+
+
+def decode_item_payload(item: VaultItem, decrypted: bytes):
+    """
+    Turn decrypted item bytes into a JSON-friendly payload.
     
-    # Verify signature
-    if not verify_signature(item.hash.encode(), signature):
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Data authenticity check failed - signature invalid"
-        )
+    Passwords and notes are stored as JSON, files are returned as Base64.
+    """
+    import json
     
-    return decrypted
+    if item.type == VaultItemType.FILE.value:
+        return {"file_name": item.file_name, "content": encode_base64(decrypted)}
+    
+    data = json.loads(decrypted.decode())
+    if item.type == VaultItemType.NOTE.value:
+        data["title"] = item.name
+    return data
 
 
 # Password Routes
@@ -148,7 +1411,7 @@ async def store_password(
     
     - Encrypts password with AES-256-GCM
     - Computes SHA-256 hash for integrity
-    - Signs hash with RSA for authenticity
+    - Signs hash for authenticity
     - Stores in database (user can only access own passwords)
     """
     # Prepare data for encryption (JSON format)
@@ -160,38 +1423,35 @@ async def store_password(
     }).encode()
     
     # Encrypt and generate integrity proofs
-    encrypted_b64, key_b64, iv_b64, data_hash, signature_b64 = encrypt_and_store(password_data)
-    
-    # Store in database
-    vault_item = VaultItem(
-        user_id=current_user.id,
-        type=VaultItemType.PASSWORD.value,
-        name=request.name,
-        encrypted_data=encrypted_b64,
-        encryption_key=key_b64,
-        iv=iv_b64,
-        hash=data_hash,
-        signature=signature_b64
+    dek = get_user_dek(db, current_user)
+    vault_item = create_vault_item(
+        db, current_user, dek, VaultItemType.PASSWORD.value, request.name, password_data
+    )
+    
+    # Encrypt display metadata separately so listing never touches the secret
+    encrypt_display_data(
+        vault_item,
+        {"website": request.website, "username": request.username},
+        dek
     )
     
-    db.add(vault_item)
     db.commit()
     db.refresh(vault_item)
     
     return {"message": "Password stored securely", "id": vault_item.id}
 
 
-@router.get("/passwords", response_model=List[PasswordResponse])
+@router.get("/passwords", response_model=List[PasswordSummaryResponse])
 async def list_passwords(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    List all passwords for the current user.
+    List all passwords for the current user, without their secrets.
     
     - RBAC: Only returns user's own passwords
-    - Decrypts each password for display
-    - Verifies integrity before returning
+    - Returns display metadata only (name, website, username)
+    - Use the reveal endpoints to decrypt the password itself
     """
     import json
     
@@ -200,24 +1460,93 @@ async def list_passwords(
         VaultItem.type == VaultItemType.PASSWORD.value
     ).all()
     
+    dek = get_user_dek(db, current_user)
+    
+    # Items stored before display metadata existed need a full decrypt, once:
+    # their metadata is written now so later lists skip it
+    legacy_items = [item for item in items if item.display_data is None]
+    legacy_data = {}
+    if legacy_items:
+        decrypted_items = await run_in_threadpool(decrypt_and_verify_many, legacy_items, dek)
+        for item, decrypted in zip(legacy_items, decrypted_items):
+            legacy_data[item.id] = json.loads(decrypted.decode())
+            refresh_password_display_data(item, decrypted, dek)
+        db.commit()
+    
     passwords = []
     for item in items:
-        # Decrypt and verify
-        decrypted = decrypt_and_verify(item)
-        data = json.loads(decrypted.decode())
-        
-        passwords.append(PasswordResponse(
+        data = legacy_data.get(item.id) or decrypt_display_data(item, dek)
+        passwords.append(PasswordSummaryResponse(
             id=item.id,
             name=item.name,
             website=data.get("website"),
             username=data["username"],
-            password=data["password"],
             created_at=item.created_at.isoformat()
         ))
     
     return passwords
 
 
+@router.post("/passwords/reveal", response_model=List[PasswordResponse])
+async def reveal_passwords(
+    request: RevealPasswordsRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Decrypt several passwords on demand.
+    
+    - RBAC: Only the user's own passwords are returned
+    - Unknown or foreign ids are skipped
+    - Results follow the order of the requested ids
+    """
+    if len(request.ids) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_OPERATIONS} ids per request"
+        )
+    
+    items = db.query(VaultItem).filter(
+        VaultItem.id.in_(request.ids),
+        VaultItem.user_id == current_user.id,
+        VaultItem.type == VaultItemType.PASSWORD.value
+    ).all() if request.ids else []
+    items_by_id = {item.id: item for item in items}
+    items = [items_by_id[item_id] for item_id in dict.fromkeys(request.ids) if item_id in items_by_id]
+    
+    dek = get_user_dek(db, current_user)
+    decrypted_items = await run_in_threadpool(decrypt_and_verify_many, items, dek)
+    
+    return [password_response(item, decrypted) for item, decrypted in zip(items, decrypted_items)]
+
+
+@router.post("/passwords/{item_id}/reveal", response_model=PasswordResponse)
+async def reveal_password(
+    item_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Decrypt a single password on demand.
+    
+    - RBAC: Only owner can reveal
+    - Verifies integrity before returning
+    """
+    item = db.query(VaultItem).filter(
+        VaultItem.id == item_id,
+        VaultItem.user_id == current_user.id,
+        VaultItem.type == VaultItemType.PASSWORD.value
+    ).first()
+    
+    if not item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Password not found or access denied"
+        )
+    
+    return password_response(item, decrypt_and_verify(item, get_user_dek(db, current_user)))
+
+
 @router.get("/passwords/{item_id}", response_model=PasswordResponse)
 async def get_password(
     item_id: int,
@@ -229,8 +1558,6 @@ async def get_password(
     
     - RBAC: Only owner can access
     """
-    import json
-    
     item = db.query(VaultItem).filter(
         VaultItem.id == item_id,
         VaultItem.user_id == current_user.id,
@@ -243,17 +1570,7 @@ async def get_password(
             detail="Password not found or access denied"
         )
     
-    decrypted = decrypt_and_verify(item)
-    data = json.loads(decrypted.decode())
-    
-    return PasswordResponse(
-        id=item.id,
-        name=item.name,
-        website=data.get("website"),
-        username=data["username"],
-        password=data["password"],
-        created_at=item.created_at.isoformat()
-    )
+    return password_response(item, decrypt_and_verify(item, get_user_dek(db, current_user)))
 
 
 @router.delete("/passwords/{item_id}")
@@ -278,7 +1595,7 @@ async def delete_password(
             detail="Item not found or access denied"
         )
     
-    db.delete(item)
+    delete_vault_items(db, [item])
     db.commit()
     
     return {"message": "Item deleted successfully"}
@@ -318,14 +1635,15 @@ async def update_password(
         "password": request.password
     }).encode()
     
-    encrypted_b64, key_b64, iv_b64, data_hash, signature_b64 = encrypt_and_store(password_data)
+    dek = get_user_dek(db, current_user)
+    update_item_content(db, item, dek, password_data)
+    encrypt_display_data(
+        item,
+        {"website": request.website, "username": request.username},
+        dek
+    )
     
     item.name = request.name
-    item.encrypted_data = encrypted_b64
-    item.encryption_key = key_b64
-    item.iv = iv_b64
-    item.hash = data_hash
-    item.signature = signature_b64
     
     db.commit()
     
@@ -346,35 +1664,63 @@ async def upload_file(
     - Reads file content
     - Encrypts with AES-256-GCM
     - Computes SHA-256 hash for integrity
-    - Signs hash with RSA for authenticity
+    - Signs hash for authenticity
     - Stores encrypted file in database
     """
     # Read file content
     file_content = await file.read()
     
-    # Encrypt and generate integrity proofs
-    encrypted_b64, key_b64, iv_b64, data_hash, signature_b64 = encrypt_and_store(file_content)
-    
-    # Store in database
-    vault_item = VaultItem(
-        user_id=current_user.id,
-        type=VaultItemType.FILE.value,
-        name=name,
-        file_name=file.filename,
-        encrypted_data=encrypted_b64,
-        encryption_key=key_b64,
-        iv=iv_b64,
-        hash=data_hash,
-        signature=signature_b64
+    # Encrypt, generate integrity proofs and store in database
+    vault_item = create_vault_item(
+        db,
+        current_user,
+        get_user_dek(db, current_user),
+        VaultItemType.FILE.value,
+        name,
+        file_content,
+        file_name=file.filename
     )
     
-    db.add(vault_item)
     db.commit()
     db.refresh(vault_item)
     
     return {"message": "File uploaded and encrypted", "id": vault_item.id}
 
 
+@router.put("/files/{item_id}")
+async def replace_file(
+    item_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a new version of a file.
+    
+    - RBAC: Only owner can update
+    - The previous content is kept in the file's version history
+    """
+    item = db.query(VaultItem).filter(
+        VaultItem.id == item_id,
+        VaultItem.user_id == current_user.id,
+        VaultItem.type == VaultItemType.FILE.value
+    ).first()
+    
+    if not item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found or access denied"
+        )
+    
+    file_content = await file.read()
+    update_item_content(db, item, get_user_dek(db, current_user), file_content)
+    item.file_name = file.filename
+    
+    db.commit()
+    
+    return {"message": "File updated", "version": item.version}
+
+
 @router.get("/files", response_model=List[FileResponse])
 async def list_files(
     current_user: User = Depends(get_current_user),
@@ -427,8 +1773,8 @@ async def download_file(
             detail="File not found or access denied"
         )
     
-    # Decrypt and verify
-    decrypted = decrypt_and_verify(item)
+    # Decrypt and verify, decompressing as the response streams
+    chunks = decrypt_and_verify_stream(item, get_user_dek(db, current_user))
     
     # Determine content type
     import mimetypes
@@ -436,8 +1782,8 @@ async def download_file(
     if content_type is None:
         content_type = "application/octet-stream"
     
-    return Response(
-        content=decrypted,
+    return StreamingResponse(
+        chunks,
         media_type=content_type,
         headers={
             "Content-Disposition": f'attachment; filename="{item.file_name}"'
@@ -445,6 +1791,40 @@ async def download_file(
     )
 
 
+@router.post("/files/archive")
+async def download_files_archive(
+    request: ArchiveRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download several files as one ZIP, streamed as it is built.
+    
+    - RBAC: every id must be one of the caller's files
+    - Each file is decrypted chunk by chunk into the archive
+    - Integrity failures abort the download
+    """
+    ids = archive_ids(request.ids)
+    dek = get_user_dek(db, current_user)
+    
+    items = db.query(VaultItem).options(defer(VaultItem.encrypted_data)).filter(
+        VaultItem.id.in_(ids),
+        VaultItem.user_id == current_user.id,  # RBAC check
+        VaultItem.type == VaultItemType.FILE.value
+    ).all()
+    
+    found = {item.id: item for item in items}
+    missing = [item_id for item_id in ids if item_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Files not found or access denied: {missing}"
+        )
+    
+    keys = {item_id: item_key(found[item_id], dek) for item_id in ids}
+    return archive_response(VaultItem, keys, request.compression == "deflate", "vault-files.zip")
+
+
 @router.get("/files/{item_id}/verify", response_model=IntegrityResponse)
 async def verify_file_integrity(
     item_id: int,
@@ -470,7 +1850,7 @@ async def verify_file_integrity(
         )
     
     try:
-        decrypt_and_verify(item)
+        decrypt_and_verify(item, get_user_dek(db, current_user))
         return IntegrityResponse(
             valid=True,
             message="File integrity verified: hash and signature are valid"
@@ -521,7 +1901,7 @@ async def store_note(
     
     - Encrypts note content with AES-256-GCM
     - Computes SHA-256 hash for integrity
-    - Signs hash with RSA for authenticity
+    - Signs hash for authenticity
     """
     import json
     note_data = json.dumps({
@@ -529,20 +1909,15 @@ async def store_note(
         "content": request.content
     }).encode()
     
-    encrypted_b64, key_b64, iv_b64, data_hash, signature_b64 = encrypt_and_store(note_data)
-    
-    vault_item = VaultItem(
-        user_id=current_user.id,
-        type=VaultItemType.NOTE.value,
-        name=request.title,
-        encrypted_data=encrypted_b64,
-        encryption_key=key_b64,
-        iv=iv_b64,
-        hash=data_hash,
-        signature=signature_b64
+    vault_item = create_vault_item(
+        db,
+        current_user,
+        get_user_dek(db, current_user),
+        VaultItemType.NOTE.value,
+        request.title,
+        note_data
     )
     
-    db.add(vault_item)
     db.commit()
     db.refresh(vault_item)
     
@@ -564,14 +1939,16 @@ async def list_notes(
         VaultItem.type == VaultItemType.NOTE.value
     ).all()
     
+    dek = get_user_dek(db, current_user)
+    decrypted_items = await run_in_threadpool(decrypt_and_verify_many, items, dek)
+    
     notes = []
-    for item in items:
-        decrypted = decrypt_and_verify(item)
+    for item, decrypted in zip(items, decrypted_items):
         data = json.loads(decrypted.decode())
         
         notes.append(NoteResponse(
             id=item.id,
-            title=data.get("title", item.name),
+            title=item.name,
             content=data["content"],
             created_at=item.created_at.isoformat()
         ))
@@ -597,12 +1974,12 @@ async def get_note(
     if not item:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    decrypted = decrypt_and_verify(item)
+    decrypted = decrypt_and_verify(item, get_user_dek(db, current_user))
     data = json.loads(decrypted.decode())
     
     return NoteResponse(
         id=item.id,
-        title=data.get("title", item.name),
+        title=item.name,
         content=data["content"],
         created_at=item.created_at.isoformat()
     )
@@ -633,20 +2010,55 @@ async def update_note(
         "content": request.content
     }).encode()
     
-    encrypted_b64, key_b64, iv_b64, data_hash, signature_b64 = encrypt_and_store(note_data)
-    
+    update_item_content(db, item, get_user_dek(db, current_user), note_data)
     item.name = request.title
-    item.encrypted_data = encrypted_b64
-    item.encryption_key = key_b64
-    item.iv = iv_b64
-    item.hash = data_hash
-    item.signature = signature_b64
     
     db.commit()
     
     return {"message": "Note updated"}
 
 
+@router.patch("/notes/{item_id}")
+async def patch_note(
+    item_id: int,
+    request: NotePatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Edit part of a note.
+    
+    - RBAC: Only owner can update
+    - Operations replace a byte range of the UTF-8 content or append to it
+    - Large notes are stored as chunks; only the chunks an edit touches are
+      re-encrypted, and the signature covers a Merkle root over the chunks
+    """
+    if len(request.operations) > MAX_NOTE_PATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_NOTE_PATCH_OPERATIONS} operations per patch"
+        )
+    if not request.operations and not request.title:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patch has no operations"
+        )
+    
+    item = db.query(VaultItem).filter(
+        VaultItem.id == item_id,
+        VaultItem.user_id == current_user.id,
+        VaultItem.type == VaultItemType.NOTE.value
+    ).first()
+    
+    if not item:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    size = apply_note_patch(db, item, get_user_dek(db, current_user), request.title, request.operations)
+    db.commit()
+    
+    return {"message": "Note updated", "version": item.version, "size": size}
+
+
 @router.delete("/notes/{item_id}")
 async def delete_note(
     item_id: int,
@@ -663,16 +2075,264 @@ async def delete_note(
     if not item:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    db.delete(item)
+    delete_vault_items(db, [item])
     db.commit()
     
     return {"message": "Note deleted"}
 
 
+# Import Routes
+@router.post("/import", status_code=status.HTTP_201_CREATED)
+async def import_items(
+    request: ImportRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Store many passwords and notes in one request.
+    
+    - All items are written in a single transaction
+    - One signature covers the whole import: it signs a Merkle root over
+      the items' hashes, and each item stores its inclusion proof
+    - Returns the new ids in request order
+    """
+    import json
+    
+    if not 0 < len(request.passwords) + len(request.notes) <= MAX_IMPORT_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Imports must contain between 1 and {MAX_IMPORT_ITEMS} items"
+        )
+    
+    dek = get_user_dek(db, current_user)
+    passwords = []
+    for password in request.passwords:
+        password_data = json.dumps({
+            "website": password.website,
+            "username": password.username,
+            "password": password.password
+        }).encode()
+        item = create_vault_item(
+            db, current_user, dek, VaultItemType.PASSWORD.value, password.name, password_data, sign=False
+        )
+        encrypt_display_data(item, {"website": password.website, "username": password.username}, dek)
+        passwords.append(item)
+    
+    notes = [
+        create_vault_item(
+            db, current_user, dek, VaultItemType.NOTE.value, note.title,
+            note_payload(note.title, note.content.encode()), sign=False
+        )
+        for note in request.notes
+    ]
+    
+    sign_items(passwords + notes)
+    db.commit()
+    
+    return {
+        "message": f"Imported {len(passwords) + len(notes)} items",
+        "password_ids": [item.id for item in passwords],
+        "note_ids": [item.id for item in notes]
+    }
+
+
+# Version Routes
+@router.get("/items/{item_id}/versions", response_model=List[VersionResponse])
+async def list_versions(
+    item_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List an item's versions, newest (current) first.
+    
+    - RBAC: Only owner can list
+    - stored_bytes shows what each previous version actually costs
+    """
+    item = get_owned_item(db, item_id, current_user)
+    
+    versions = [
+        VersionResponse(
+            version=item.version or 1,
+            name=item.name,
+            file_name=item.file_name,
+            current=True,
+            storage=None,
+            size=None,
+            stored_bytes=None,
+            created_at=(item.updated_at or item.created_at).isoformat()
+        )
+    ]
+    previous_versions = db.query(VaultItemVersion).options(defer(VaultItemVersion.encrypted_data)).filter(
+        VaultItemVersion.item_id == item.id
+    ).order_by(VaultItemVersion.version.desc())
+    stored_lengths = dict(
+        db.query(VaultItemVersion.id, func.length(VaultItemVersion.encrypted_data)).filter(
+            VaultItemVersion.item_id == item.id
+        )
+    )
+    
+    for previous in previous_versions:
+        versions.append(VersionResponse(
+            version=previous.version,
+            name=previous.name,
+            file_name=previous.file_name,
+            current=False,
+            storage=previous.storage,
+            size=previous.size,
+            stored_bytes=stored_lengths[previous.id] * 3 // 4,  # Base64 to ciphertext bytes
+            created_at=previous.created_at.isoformat()
+        ))
+    
+    return versions
+
+
+@router.get("/items/{item_id}/versions/{version}")
+async def get_version(
+    item_id: int,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the content of a previous version.
+    
+    - RBAC: Only owner can read
+    - Rebuilt from the nearest newer snapshot and verified against its hash
+    - Returns the item's usual payload (files as Base64)
+    """
+    item = get_owned_item(db, item_id, current_user)
+    previous, content = await run_in_threadpool(
+        version_content, db, item, get_user_dek(db, current_user), version
+    )
+    
+    return {
+        "version": previous.version,
+        "name": previous.name,
+        "file_name": previous.file_name,
+        "created_at": previous.created_at.isoformat(),
+        "data": decode_item_payload(item, content)
+    }
+
+
+@router.post("/items/{item_id}/versions/{version}/restore")
+async def restore_version(
+    item_id: int,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Make a previous version current again.
+    
+    - RBAC: Only owner can restore
+    - The restored content becomes a new version, so the history is kept
+    """
+    item = get_owned_item(db, item_id, current_user)
+    if version == (item.version or 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Version is already current"
+        )
+    
+    dek = get_user_dek(db, current_user)
+    previous, content = await run_in_threadpool(version_content, db, item, dek, version)
+    name, file_name = previous.name, previous.file_name
+    
+    update_item_content(db, item, dek, content)
+    if item.type == VaultItemType.PASSWORD.value:
+        refresh_password_display_data(item, content, dek)
+    item.name = name
+    item.file_name = file_name
+    
+    db.commit()
+    
+    return {"message": f"Version {version} restored", "version": item.version}
+
+
+# Batch Routes
+@router.post("/batch", response_model=BatchResponse)
+async def batch_operations(
+    request: BatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Run several delete, rename and get operations in one request.
+    
+    - RBAC: All item ids are authorized with a single IN query
+    - Deletes and renames are committed in a single transaction
+    - Get operations are decrypted and verified concurrently
+    - Returns one result per operation, in request order
+    """
+    if len(request.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch"
+        )
+    
+    dek = get_user_dek(db, current_user)
+    item_ids = {operation.id for operation in request.operations}
+    items = db.query(VaultItem).filter(
+        VaultItem.id.in_(item_ids),
+        VaultItem.user_id == current_user.id
+    ).all() if item_ids else []
+    items_by_id = {item.id: item for item in items}
+    
+    results = []
+    deleted_ids = set()
+    deleted_items = []
+    get_operations = []
+    
+    for operation in request.operations:
+        result = BatchOperationResult(op=operation.op, id=operation.id, status="ok")
+        results.append(result)
+        item = items_by_id.get(operation.id)
+        
+        if item is None or operation.id in deleted_ids:
+            result.status = "not_found"
+            result.detail = "Item not found or access denied"
+        elif operation.op == "delete":
+            deleted_items.append(item)
+            deleted_ids.add(item.id)
+        elif operation.op == "rename":
+            item.name = operation.name
+        else:
+            get_operations.append((result, item))
+    
+    # Decrypt get operations concurrently, before their rows are deleted
+    decrypted_items = await run_in_threadpool(
+        decrypt_and_verify_many,
+        [item for _, item in get_operations],
+        dek,
+        False
+    )
+    for (result, item), decrypted in zip(get_operations, decrypted_items):
+        if isinstance(decrypted, HTTPException):
+            result.status = "error"
+            result.detail = decrypted.detail
+        else:
+            result.data = decode_item_payload(item, decrypted)
+    
+    try:
+        delete_vault_items(db, deleted_items)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Batch could not be applied - no changes were made"
+        )
+    
+    return BatchResponse(results=results)
+
+
 # File Preview Route
 @router.get("/files/{item_id}/preview")
 async def preview_file(
     item_id: int,
+    size: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -681,6 +2341,10 @@ async def preview_file(
     
     - Returns file content inline for preview
     - Supports images (jpg, png, gif, webp) and PDFs
+    - ?size= returns a thumbnail whose longest edge is that many pixels,
+      rendered once and cached encrypted (falls back to the original
+      when no renderer is available)
+    - ETag/If-None-Match let browsers revalidate without a download
     """
     item = db.query(VaultItem).filter(
         VaultItem.id == item_id,
@@ -706,14 +2370,34 @@ async def preview_file(
             detail=f"Preview not supported for this file type: {content_type}"
         )
     
+    if size is not None and size not in RENDITION_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported preview size, choose one of {', '.join(map(str, RENDITION_SIZES))}"
+        )
+    
+    etag = etag_for(item.hash if size is None else f"{item.hash}-{size}")
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'inline; filename="{item.file_name}"'
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    dek = get_user_dek(db, current_user)
+    
+    if size is not None:
+        rendition = await run_in_threadpool(get_rendition, db, item, dek, content_type, size)
+        if rendition is not None:
+            data, rendition_type = rendition
+            return Response(content=data, media_type=rendition_type, headers=headers)
+    
     # Decrypt and verify
-    decrypted = decrypt_and_verify(item)
+    decrypted = await run_in_threadpool(decrypt_and_verify, item, dek)
     
     return Response(
         content=decrypted,
         media_type=content_type,
-        headers={
-            "Content-Disposition": f'inline; filename="{item.file_name}"'
-        }
+        headers=headers
     )
-
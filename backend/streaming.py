@@ -0,0 +1,162 @@
+"""
+HTTP helpers for streaming downloads: conditional and Range requests, and
+ZIP archives built on the fly.
+"""
+import io
+import zipfile
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Tuple
+
+
+def etag_for(content_hash: str) -> str:
+    """Build a strong ETag from an item's SHA-256 content hash."""
+    return f'"{content_hash}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+    
+    Weak comparison is used, as RFC 9110 requires for If-None-Match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" Range header.
+    
+    Args:
+        range_header: Value of the Range header, if any
+        size: Total length of the representation
+    
+    Returns:
+        Inclusive (start, end) byte positions, or None to serve the whole body
+        (no header, an unknown unit or several ranges, which we may ignore)
+    
+    Raises:
+        ValueError: If the range is syntactically valid but unsatisfiable
+    """
+    if not range_header:
+        return None
+    
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    first, sep, last = spec.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and start > end:
+        return None
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    
+    return start, min(end, size - 1)
+
+
+async def iter_range(chunks: AsyncIterable[bytes], start: int, end: int) -> AsyncIterator[bytes]:
+    """
+    Yield only bytes start..end (inclusive) of a chunked stream.
+    
+    Chunks before the range are discarded and the stream stops as soon as
+    the range has been produced.
+    """
+    position = 0
+    async for chunk in chunks:
+        chunk_end = position + len(chunk)
+        if chunk_end > start:
+            piece = chunk[max(start - position, 0):end + 1 - position]
+            if piece:
+                yield piece
+        position = chunk_end
+        if position > end:
+            return
+
+
+class _ZipOutput(io.RawIOBase):
+    """Unseekable sink that collects what zipfile writes until it is drained."""
+    
+    def __init__(self):
+        self._pieces = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._pieces.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._pieces)
+        self._pieces.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, datetime, bool, Iterable[bytes]]]) -> Iterator[bytes]:
+    """
+    Build a ZIP archive while it is being sent.
+    
+    The output is unseekable, so zipfile writes each entry's sizes and CRC in
+    a data descriptor after its data. Entry sizes aren't known up front, so
+    every entry gets ZIP64 fields; otherwise zipfile raises (and the archive
+    is cut off) once an entry passes 2 GiB. Only the current chunk and the
+    compressor's window are held in memory.
+    
+    Args:
+        entries: (archive name, modification time, deflate?, content chunks)
+        
+    Yields:
+        Pieces of the ZIP file
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, mode="w") as archive:
+        for name, modified, deflate, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+            with archive.open(info, mode="w", force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = output.drain()
+                    if data:
+                        yield data
+            yield output.drain()
+    yield output.drain()
+
+
+def archive_name(name: str, used: set) -> str:
+    """
+    Make a safe, unique file name for an archive entry.
+    
+    Path separators are replaced so entries can't escape the extraction
+    directory, and repeated names get a " (n)" suffix.
+    """
+    name = name.replace("/", "_").replace("\\", "_").strip(" .") or "file"
+    stem, dot, extension = name.rpartition(".")
+    if not stem:
+        stem, dot, extension = name, "", ""
+    
+    candidate = name
+    counter = 2
+    while candidate.lower() in used:
+        candidate = f"{stem} ({counter}){dot}{extension}"
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
@@ -21,6 +21,7 @@ export default function PasswordsPage() {
     const [saving, setSaving] = useState(false);
     const [error, setError] = useState('');
     const [visiblePasswords, setVisiblePasswords] = useState({});
+    const [revealedPasswords, setRevealedPasswords] = useState({});
     const [copiedId, setCopiedId] = useState(null);
     const [editingPassword, setEditingPassword] = useState(null);
     const router = useRouter();
@@ -42,6 +43,8 @@ export default function PasswordsPage() {
             const response = await vaultAPI.getPasswords();
             setPasswords(response.data);
             setFilteredPasswords(response.data);
+            setRevealedPasswords({});
+            setVisiblePasswords({});
         } catch (error) {
             console.error('Failed to fetch passwords:', error);
         }
@@ -101,15 +104,28 @@ export default function PasswordsPage() {
         setError('');
     };
 
-    const openEditModal = (pwd) => {
-        setEditingPassword(pwd);
-        setFormData({
-            name: pwd.name,
-            website: pwd.website || '',
-            username: pwd.username,
-            password: pwd.password
-        });
-        setShowModal(true);
+    // The list only carries metadata; secrets are decrypted on demand
+    const revealPassword = async (id) => {
+        if (revealedPasswords[id] !== undefined) return revealedPasswords[id];
+        const response = await vaultAPI.revealPassword(id);
+        setRevealedPasswords(prev => ({ ...prev, [id]: response.data.password }));
+        return response.data.password;
+    };
+
+    const openEditModal = async (pwd) => {
+        try {
+            const password = await revealPassword(pwd.id);
+            setEditingPassword(pwd);
+            setFormData({
+                name: pwd.name,
+                website: pwd.website || '',
+                username: pwd.username,
+                password
+            });
+            setShowModal(true);
+        } catch (error) {
+            console.error('Failed to reveal password:', error);
+        }
     };
 
     const handleDelete = async (id) => {
@@ -123,12 +139,21 @@ export default function PasswordsPage() {
         }
     };
 
-    const togglePasswordVisibility = (id) => {
+    const togglePasswordVisibility = async (id) => {
+        if (!visiblePasswords[id]) {
+            try {
+                await revealPassword(id);
+            } catch (error) {
+                console.error('Failed to reveal password:', error);
+                return;
+            }
+        }
         setVisiblePasswords(prev => ({ ...prev, [id]: !prev[id] }));
     };
 
-    const copyToClipboard = async (text, id) => {
+    const copyToClipboard = async (id) => {
         try {
+            const text = await revealPassword(id);
             await navigator.clipboard.writeText(text);
             setCopiedId(id);
             setTimeout(() => setCopiedId(null), 2000);
@@ -240,10 +265,10 @@ export default function PasswordsPage() {
                                         <div className="flex items-center gap-2 w-full md:w-auto mt-4 md:mt-0 pl-14 md:pl-0">
                                             <div className="flex-1 md:flex-none relative">
                                                 <div className="bg-surface-elevated border border-surface-border rounded-lg px-3 py-2 min-w-[140px] font-mono text-sm text-content flex items-center justify-between gap-2">
-                                                    <span>{visiblePasswords[pwd.id] ? pwd.password : '••••••••••••'}</span>
+                                                    <span>{visiblePasswords[pwd.id] ? revealedPasswords[pwd.id] : '••••••••••••'}</span>
                                                     <div className="flex items-center gap-0.5">
                                                         <button
-                                                            onClick={() => copyToClipboard(pwd.password, pwd.id)}
+                                                            onClick={() => copyToClipboard(pwd.id)}
                                                             className="p-1.5 text-content-subtle hover:text-accent-blue transition-colors rounded"
                                                             title="Copy"
                                                         >
@@ -12,8 +12,8 @@ export default function Navbar() {
     const pathname = usePathname();
     const router = useRouter();
 
-    const handleLogout = () => {
-        logout();
+    const handleLogout = async () => {
+        await logout();
         router.push('/');
     };
 
@@ -1,7 +1,7 @@
 'use client';
 
 import { createContext, useContext, useState, useEffect } from 'react';
-import { authAPI } from '@/lib/api';
+import { authAPI, clearTokens, storeTokens } from '@/lib/api';
 
 const AuthContext = createContext(null);
 
@@ -42,7 +42,7 @@ export function AuthProvider({ children }) {
             setUser(response.data);
             setPendingUsername(null);
         } catch (error) {
-            localStorage.removeItem('token');
+            clearTokens();
             setUser(null);
         } finally {
             setLoading(false);
@@ -51,7 +51,7 @@ export function AuthProvider({ children }) {
 
     const login = async (username, password) => {
         const response = await authAPI.login(username, password);
-        localStorage.setItem('token', response.data.access_token);
+        storeTokens(response.data);
         await fetchUser();
         return response.data;
     };
@@ -68,14 +68,20 @@ export function AuthProvider({ children }) {
             throw new Error('No pending registration');
         }
         const response = await authAPI.verifyOTP(username, otp);
-        localStorage.setItem('token', response.data.access_token);
+        storeTokens(response.data);
         setPendingUsername(null);
         await fetchUser();
         return response.data;
     };
 
-    const logout = () => {
-        localStorage.removeItem('token');
+    const logout = async () => {
+        try {
+            // Revokes the session in session mode
+            await authAPI.logout();
+        } catch (error) {
+            console.log('Logout request failed');
+        }
+        clearTokens();
         setUser(null);
         setPendingUsername(null);
     };
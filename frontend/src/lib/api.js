@@ -28,12 +28,25 @@ api.interceptors.response.use(
         console.log('API Response:', response.config.url, response.status);
         return response;
     },
-    (error) => {
+    async (error) => {
         console.log('API Error:', error.config?.url, error.response?.status);
         if (error.response?.status === 401) {
             const isAuthRoute = error.config?.url?.includes('/auth/');
+            const refreshToken = localStorage.getItem('refreshToken');
+            // Session mode: rotate the session once and retry the request
+            if (!isAuthRoute && refreshToken && !error.config._retried) {
+                try {
+                    const response = await axios.post(`${API_BASE_URL}/auth/refresh`, { refresh_token: refreshToken });
+                    storeTokens(response.data);
+                    error.config._retried = true;
+                    return api(error.config);
+                } catch (refreshError) {
+                    console.log('Session refresh failed');
+                }
+            }
             if (!isAuthRoute) {
                 localStorage.removeItem('token');
+                localStorage.removeItem('refreshToken');
                 if (typeof window !== 'undefined' && !window.location.pathname.includes('/login')) {
                     window.location.href = '/login';
                 }
@@ -43,6 +56,21 @@ api.interceptors.response.use(
     }
 );
 
+// Keep the access token, and the refresh token issued in session mode
+export const storeTokens = (data) => {
+    localStorage.setItem('token', data.access_token);
+    if (data.refresh_token) {
+        localStorage.setItem('refreshToken', data.refresh_token);
+    } else {
+        localStorage.removeItem('refreshToken');
+    }
+};
+
+export const clearTokens = () => {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+};
+
 // Auth API
 export const authAPI = {
     register: (username, password) =>
@@ -62,6 +90,12 @@ export const authAPI = {
 
     resetPassword: (username, resetToken, newPassword) =>
         api.post('/auth/reset-password', { username, reset_token: resetToken, new_password: newPassword }),
+
+    logout: () =>
+        api.post('/auth/logout'),
+
+    logoutAll: () =>
+        api.post('/auth/logout-all'),
 };
 
 // Vault API
@@ -76,6 +110,12 @@ export const vaultAPI = {
     getPassword: (id) =>
         api.get(`/vault/passwords/${id}`),
 
+    revealPassword: (id) =>
+        api.post(`/vault/passwords/${id}/reveal`),
+
+    revealPasswords: (ids) =>
+        api.post('/vault/passwords/reveal', { ids }),
+
     deletePassword: (id) =>
         api.delete(`/vault/passwords/${id}`),
 
@@ -104,8 +144,8 @@ export const vaultAPI = {
     verifyFile: (id) =>
         api.get(`/vault/files/${id}/verify`),
 
-    previewFile: (id) =>
-        api.get(`/vault/files/${id}/preview`, { responseType: 'blob' }),
+    previewFile: (id, size) =>
+        api.get(`/vault/files/${id}/preview`, { responseType: 'blob', params: size ? { size } : undefined }),
 
     // Notes
     getNotes: () =>
@@ -120,12 +160,38 @@ export const vaultAPI = {
     updateNote: (id, title, content) =>
         api.put(`/vault/notes/${id}`, { title, content }),
 
+    patchNote: (id, operations, title) =>
+        api.patch(`/vault/notes/${id}`, { title, operations }),
+
     deleteNote: (id) =>
         api.delete(`/vault/notes/${id}`),
 
     // All items
     getAllItems: () =>
         api.get('/vault/items'),
+
+    importItems: (passwords, notes) =>
+        api.post('/vault/import', { passwords, notes }),
+
+    // Version history
+    replaceFile: (id, file) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        return api.put(`/vault/files/${id}`, formData, {
+            headers: {
+                'Content-Type': 'multipart/form-data',
+            },
+        });
+    },
+
+    getVersions: (id) =>
+        api.get(`/vault/items/${id}/versions`),
+
+    getVersion: (id, version) =>
+        api.get(`/vault/items/${id}/versions/${version}`),
+
+    restoreVersion: (id, version) =>
+        api.post(`/vault/items/${id}/versions/${version}/restore`),
 };
 
 // Utils API